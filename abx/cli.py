@@ -364,6 +364,41 @@ def extract(
         sys.exit(0)
 
 
+@cli.command()
+@click.option("--db", required=True, type=click.Path(exists=True, path_type=Path), help="Path to SQLite database")
+@click.option("--out", required=True, type=click.Path(dir_okay=False, path_type=Path), help="Published database path")
+@click.option(
+    "--page-size",
+    default="16384",
+    type=click.Choice(["4096", "8192", "16384", "32768", "65536"]),
+    help="SQLite page size of the published database (default: 16384)",
+)
+def publish(db: Path, out: Path, page_size: str):
+    """
+    Write a compact read-only copy of the database for the map server.
+
+    Copies a consistent snapshot with VACUUM INTO (safe while extraction is
+    running), drops raw chapter text, the geocoding cache, LLM run logs and
+    columns the map never reads, and adds the denormalized map_points table,
+    a covering index for cluster lookups and ANALYZE statistics. OUT is
+    replaced atomically, so a running server can be pointed at it and reload.
+
+    Example:
+
+        abx publish --db full_book.sqlite --out serve.sqlite
+    """
+    from abxgeo.publish import publish_db
+
+    try:
+        stats = publish_db(db, out, int(page_size))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--out")
+    console.print(f"[green]Published {out}: {stats['map_points']:,} map points[/green]")
+    console.print(
+        f"[green]Size: {stats['source_bytes'] / 1e6:.1f} MB -> {stats['published_bytes'] / 1e6:.1f} MB[/green]"
+    )
+
+
 def main():
     """Entry point."""
     cli()
@@ -0,0 +1,94 @@
+"""Prefix index over people, company and product line names for search-as-you-type.
+
+Names are normalized like facet values (see abxgeo.snapshot.facet_key) and kept
+in one sorted list, together with every word-suffix of each name, so "cook"
+finds "Tim Cook". A lookup is two binary searches for the range of terms
+starting with the query, then a sort of that range's names by story count.
+"""
+
+import bisect
+import sqlite3
+
+import numpy as np
+
+from abxgeo.snapshot import FACET_SQL, facet_key
+
+# Facet kinds suggested by default
+AUTOCOMPLETE_KINDS = ("person", "company", "product_line")
+
+# Sorts after every character a term can contain: upper bound of a prefix range
+_PREFIX_END = "\U0010ffff"
+
+
+class PrefixIndex:
+    """Sorted name terms of (kind, name, story count) entries, for prefix lookups."""
+
+    def __init__(self, entries: list[tuple[str, str, int]]):
+        """
+        Args:
+            entries: (facet kind, display name, story count) per distinct name
+        """
+        entries = sorted(entries, key=lambda entry: (facet_key(entry[1]), entry[0]))
+        self.kinds = [kind for kind, _, _ in entries]
+        self.kind_names = sorted(set(self.kinds))
+        self.kind_codes = np.array([self.kind_names.index(kind) for kind in self.kinds], dtype=np.int8)
+        self.names = [name for _, name, _ in entries]
+        self.counts = np.array([count for _, _, count in entries], dtype=np.int64)
+
+        terms = []
+        for entry, (_, name, _) in enumerate(entries):
+            words = facet_key(name).split(" ")
+            terms.extend((" ".join(words[start:]), entry) for start in range(len(words)))
+        terms.sort()
+        self.terms = [term for term, _ in terms]
+        self.entry_of = np.array([entry for _, entry in terms], dtype=np.int64)
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, kinds: tuple[str, ...] = AUTOCOMPLETE_KINDS) -> "PrefixIndex":
+        """
+        Index every name in the facet tables (see FACET_SQL).
+
+        Unlike the snapshot's facet values, this includes stories without resolved
+        locations, so every name is suggested and counted.
+        """
+        entries = []
+        for kind in kinds:
+            # Same normalization as LocationSnapshot._build_facets: first spelling seen is displayed
+            names: dict[str, str] = {}
+            stories: dict[str, set[str]] = {}
+            for story_id, value in conn.execute(FACET_SQL[kind]):
+                if not isinstance(value, str) or not value.strip():
+                    continue
+                key = facet_key(value)
+                names.setdefault(key, value.strip())
+                stories.setdefault(key, set()).add(story_id)
+            entries.extend((kind, names[key], len(members)) for key, members in stories.items())
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 10, kind: str | None = None) -> list[dict[str, object]]:
+        """
+        Names with a word starting with the query, most stories first (then alphabetically).
+
+        Returns:
+            [{"kind", "value", "story_count"}, ...], at most `limit`
+        """
+        prefix = facet_key(query)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.terms, prefix)
+        stop = bisect.bisect_left(self.terms, prefix + _PREFIX_END, lo=start)
+
+        # A name matching by several words is listed once
+        entries = np.unique(self.entry_of[start:stop])
+        if kind is not None:
+            code = self.kind_names.index(kind) if kind in self.kind_names else -1
+            entries = entries[self.kind_codes[entries] == code]
+        # Entries are numbered alphabetically, so the entry number breaks count ties
+        entries = entries[np.lexsort((entries, -self.counts[entries]))][:limit]
+        return [
+            {"kind": self.kinds[entry], "value": self.names[entry], "story_count": int(self.counts[entry])}
+            for entry in entries.tolist()
+        ]
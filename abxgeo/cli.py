@@ -414,6 +414,9 @@ def clear_cache(db: Path, older_than: str):
     "--city-eps", default=5000, type=float, help="DBSCAN epsilon for city-level locations in meters (default: 5000)"
 )
 @click.option("--force", is_flag=True, help="Regenerate all clusters (skip existing)")
+@click.option(
+    "--pyramid-only", is_flag=True, help="Only rebuild the map cluster pyramid and heatmap (no LLM summaries)"
+)
 @click.option("--verbose", is_flag=True, help="Verbose output")
 def cluster(
     db: Path,
@@ -421,21 +424,51 @@ def cluster(
     address_eps: float,
     city_eps: float,
     force: bool,
+    pyramid_only: bool,
     verbose: bool,
 ):
     """
     Generate geographic clusters and LLM summaries for story visualization.
 
-    This command groups nearby locations using DBSCAN clustering and generates
-    narrative summaries using GPT-5-mini via BAML. Results are stored in the
-    location_clusters table.
+    This command first rebuilds the zoom-banded cluster pyramid and the density
+    heatmap used by the map server, then groups nearby locations using DBSCAN
+    clustering and generates narrative summaries using GPT-5-mini via BAML.
+    Results are stored in the location_clusters table.
 
     Examples:
 
         abxgeo cluster --db library.sqlite
 
         abxgeo cluster --db library.sqlite --address-eps 300 --force
+
+        abxgeo cluster --db library.sqlite --pyramid-only
     """
+    from abxgeo.heatmap import build_location_heatmap
+    from abxgeo.pyramid import build_cluster_pyramid
+
+    console.print("[bold cyan]ABXGeo - Cluster Generation[/bold cyan]\n")
+
+    # Rebuild the map cluster pyramid (cheap, deterministic - always refreshed)
+    console.print("[cyan]Building map cluster pyramid...[/cyan]")
+    conn = sqlite3.connect(db)
+    nodes = build_cluster_pyramid(conn)
+    heatmap = build_location_heatmap(conn)
+    conn.close()
+
+    levels: dict[int, int] = {}
+    for node in nodes:
+        levels[node["zoom_level"]] = levels.get(node["zoom_level"], 0) + 1
+    console.print(f"[green]Stored {len(nodes)} pyramid nodes across {len(levels)} zoom bands[/green]")
+    if verbose:
+        for zoom_level, count in sorted(levels.items()):
+            console.print(f"[dim]  zoom <= {zoom_level}: {count} nodes[/dim]")
+    cells = sum(len(level_cells) for _, _, level_cells, _ in heatmap)
+    console.print(f"[green]Stored {len(heatmap)} heatmap levels ({cells} non-empty cells)[/green]")
+    console.print()
+
+    if pyramid_only:
+        sys.exit(0)
+
     from abxgeo.cluster import (
         cluster_locations,
         create_clusters_table,
@@ -444,20 +477,18 @@ def cluster(
         summarize_cluster,
     )
 
-    console.print("[bold cyan]ABXGeo - Cluster Generation[/bold cyan]\n")
-
     # Create table if needed
     create_clusters_table(db)
 
     # Check if clusters already exist (unless --force)
     conn = sqlite3.connect(db)
-    cursor = conn.execute("SELECT COUNT(*) FROM location_clusters")
+    cursor = conn.execute("SELECT COUNT(*) FROM location_clusters WHERE kind = 'summary'")
     existing_count = cursor.fetchone()[0]
 
     if force and existing_count > 0:
         # Clear existing clusters when forcing regeneration
         console.print(f"[yellow]Clearing {existing_count} existing clusters...[/yellow]")
-        conn.execute("DELETE FROM location_clusters")
+        conn.execute("DELETE FROM location_clusters WHERE kind = 'summary'")
         conn.commit()
     elif existing_count > 0:
         conn.close()
@@ -532,6 +563,30 @@ def cluster(
     console.print(f"[dim]Run map server to visualize clusters[/dim]")
 
 
+@cli.command()
+@click.option("--db", required=True, type=click.Path(exists=True, path_type=Path), help="Path to SQLite database")
+@click.option("--k", "k", default=10, type=click.IntRange(1, 100), help="Related stories kept per story (default: 10)")
+def related(db: Path, k: int):
+    """
+    Precompute related stories for the map's /api/story/{id}/related.
+
+    Stories are compared by the people, companies, product lines and themes they
+    share (IDF-weighted cosine similarity); the top K of each story are stored in
+    the story_neighbors table, replacing any previous run.
+
+    Example:
+
+        abxgeo related --db library.sqlite --k 10
+    """
+    from abxgeo.neighbors import build_story_neighbors
+
+    console.print("[bold cyan]ABXGeo - Related Stories[/bold cyan]\n")
+    conn = sqlite3.connect(db)
+    stored = build_story_neighbors(conn, k)
+    conn.close()
+    console.print(f"[green]Stored {stored} related-story links (top {k} per story)[/green]")
+
+
 def main():
     """Entry point."""
     cli()
@@ -21,6 +21,7 @@ from rich.console import Console  # noqa: E402
 from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn, TimeElapsedColumn  # noqa: E402
 from sklearn.cluster import DBSCAN  # noqa: E402
 
+from abxgeo.db_migrate import ensure_location_clusters  # noqa: E402
 from baml_client import b  # noqa: E402
 
 console = Console()
@@ -48,25 +49,7 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
 def create_clusters_table(db_path: Path) -> None:
     """Create location_clusters table if it doesn't exist."""
     conn = sqlite3.connect(db_path)
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS location_clusters (
-            cluster_id TEXT PRIMARY KEY,
-            center_lat REAL NOT NULL,
-            center_lon REAL NOT NULL,
-            zoom_level INTEGER,
-            story_ids_json TEXT NOT NULL,
-            summary TEXT NOT NULL,
-            key_themes_json TEXT,
-            story_count INTEGER NOT NULL,
-            date_range TEXT,
-            created_at TEXT DEFAULT (datetime('now'))
-        )
-    """
-    )
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_location ON location_clusters(center_lat, center_lon)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_zoom ON location_clusters(zoom_level)")
-    conn.commit()
+    ensure_location_clusters(conn)
     conn.close()
 
 
@@ -458,7 +441,7 @@ def cluster(
     # Check if clusters already exist (unless --force)
     if not force:
         conn = sqlite3.connect(db)
-        cursor = conn.execute("SELECT COUNT(*) FROM location_clusters")
+        cursor = conn.execute("SELECT COUNT(*) FROM location_clusters WHERE kind = 'summary'")
         existing_count = cursor.fetchone()[0]
         conn.close()
 
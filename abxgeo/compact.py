@@ -0,0 +1,125 @@
+"""Compact columnar encoding of map viewport payloads.
+
+The default /api/locations payload is a list of dicts per marker and cluster,
+repeating every key and every story title. The compact form stores parallel
+arrays instead, with precision names and repeated strings (titles, place names,
+dates) replaced by indices into small tables.
+"""
+
+from typing import Any
+
+# Marker fields carried by the compact form, in output order
+COMPACT_LOCATION_FIELDS = ("story_id", "lat", "lon", "precision", "confidence", "title", "place_name", "date")
+
+# Cluster header fields carried by the compact form
+COMPACT_CLUSTER_FIELDS = ("cluster_id", "center_lat", "center_lon", "story_count", "date_range", "summary")
+
+
+class StringTable:
+    """Deduplicating string table; values are referenced by their index (None stays None)."""
+
+    def __init__(self):
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+
+    def ref(self, value: str | None) -> int | None:
+        if value is None:
+            return None
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def compact_payload(payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    Convert a viewport payload ({"locations": [...], "clusters": [...], ...}) to columns.
+
+    Returns:
+        Dict with "format": "compact", a "strings" table, a "precisions" table,
+        "locations" and "clusters" as dicts of parallel arrays, and any other
+        top-level keys of the payload unchanged. Marker addresses and summary
+        previews are left out; popups load them from /api/story.
+    """
+    strings = StringTable()
+    precisions = StringTable()
+    locations = payload["locations"]
+    clusters = payload["clusters"]
+
+    result = {key: value for key, value in payload.items() if key not in ("locations", "clusters")}
+    result.update(
+        {
+            "format": "compact",
+            "locations": {
+                "story_id": [loc["story_id"] for loc in locations],
+                "lat": [loc["lat"] for loc in locations],
+                "lon": [loc["lon"] for loc in locations],
+                "precision": [precisions.ref(loc["precision"]) for loc in locations],
+                "confidence": [loc["confidence"] for loc in locations],
+                "title": [strings.ref(loc["title"]) for loc in locations],
+                "place_name": [strings.ref(loc["place_name"]) for loc in locations],
+                "date": [strings.ref(loc["date"]) for loc in locations],
+            },
+            "clusters": {
+                "cluster_id": [cluster["cluster_id"] for cluster in clusters],
+                "center_lat": [cluster["center_lat"] for cluster in clusters],
+                "center_lon": [cluster["center_lon"] for cluster in clusters],
+                "story_count": [cluster["story_count"] for cluster in clusters],
+                "date_range": [strings.ref(cluster["date_range"]) for cluster in clusters],
+                "summary": [cluster["summary"] for cluster in clusters],
+            },
+            "strings": strings.values,
+            "precisions": precisions.values,
+        }
+    )
+    return result
+
+
+def expand_payload(compact: dict[str, Any]) -> dict[str, Any]:
+    """Inverse of compact_payload (without the dropped marker fields), for clients and tests."""
+    strings = compact["strings"]
+    precisions = compact["precisions"]
+
+    def lookup(table: list[str], index: int | None) -> str | None:
+        return None if index is None else table[index]
+
+    columns = compact["locations"]
+    locations = [
+        {
+            "story_id": story_id,
+            "lat": lat,
+            "lon": lon,
+            "precision": lookup(precisions, precision),
+            "confidence": confidence,
+            "title": lookup(strings, title),
+            "place_name": lookup(strings, place_name),
+            "date": lookup(strings, date),
+        }
+        for story_id, lat, lon, precision, confidence, title, place_name, date in zip(
+            *(columns[field] for field in COMPACT_LOCATION_FIELDS)
+        )
+    ]
+
+    columns = compact["clusters"]
+    clusters = [
+        {
+            "cluster_id": cluster_id,
+            "center_lat": center_lat,
+            "center_lon": center_lon,
+            "story_count": story_count,
+            "date_range": lookup(strings, date_range),
+            "summary": summary,
+        }
+        for cluster_id, center_lat, center_lon, story_count, date_range, summary in zip(
+            *(columns[field] for field in COMPACT_CLUSTER_FIELDS)
+        )
+    ]
+
+    result = {
+        key: value
+        for key, value in compact.items()
+        if key not in ("format", "strings", "precisions", "locations", "clusters")
+    }
+    result.update({"locations": locations, "clusters": clusters})
+    return result
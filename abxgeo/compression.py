@@ -0,0 +1,69 @@
+"""Content-Encoding negotiation and compression for cached map responses.
+
+Brotli is optional (the `brotli` package); without it clients get gzip.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings the server can produce, most preferred first at equal q-values
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Bodies shorter than this are sent uncompressed (the headers would eat the savings)
+MIN_COMPRESS_BYTES = 1024
+
+# Responses are compressed once and then served from cache, so spend more CPU than a per-request proxy would
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+def accepted_codings(accept_encoding: str) -> dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q-value}."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """
+    Pick the content coding for a request.
+
+    Returns:
+        "br" or "gzip", or None to send the body as is (identity)
+    """
+    if not accept_encoding:
+        return None
+    accepted = accepted_codings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """Encode a body with "br" or "gzip" (deterministic: no gzip timestamp)."""
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content coding: {coding}")
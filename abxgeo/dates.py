@@ -0,0 +1,135 @@
+"""Date display helpers for parsed story dates."""
+
+import calendar
+import datetime
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def format_date(date_str: str) -> str:
+    """
+    Format ISO date strings in human-friendly format.
+    Examples:
+      2020-01-23 -> Jan 23, 2020
+      2020-01 -> Jan 2020
+      2020 -> 2020
+
+    Handles edge cases like approximate dates (~), ranges (/), and unknown values (XXXX).
+    """
+    if not date_str:
+        return ""
+
+    # Return as-is for special formats that don't fit standard patterns
+    # (these are approximations or ranges that should be shown as-is)
+    if "/" in date_str or "~" in date_str or "XXXX" in date_str:
+        return date_str
+
+    try:
+        parts = date_str.split("-")
+
+        if len(parts) == 3:  # YYYY-MM-DD
+            year, month, day = parts
+            month_name = MONTH_NAMES[int(month) - 1]
+            return f"{month_name} {int(day)}, {year}"
+        elif len(parts) == 2:  # YYYY-MM
+            year, month = parts
+            month_name = MONTH_NAMES[int(month) - 1]
+            return f"{month_name} {year}"
+        else:  # Just year or other format
+            return date_str
+    except (ValueError, IndexError):
+        # If we can't parse it, return as-is
+        return date_str
+
+
+def format_date_range(dates: list[str | None]) -> str | None:
+    """
+    Format the chronological span of raw parsed dates (e.g. "Jan 1998–Mar 2001").
+
+    Unknown dates (XXXX) are ignored; returns None when nothing is dated.
+    """
+    # Only include dates that don't have unknown components (XXXX)
+    valid_dates = sorted(d for d in dates if d and "XXXX" not in d)
+    if not valid_dates:
+        return None
+
+    min_date = valid_dates[0]
+    max_date = valid_dates[-1]
+    if min_date == max_date:
+        return format_date(min_date)
+    return f"{format_date(min_date)}–{format_date(max_date)}"
+
+
+# Day numbers count days since 1970-01-01
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def _day_number(year: int, month: int, day: int) -> int:
+    return datetime.date(year, month, day).toordinal() - EPOCH_ORDINAL
+
+
+def day_range(date_str: str | None) -> tuple[int, int] | None:
+    """
+    Span of a parsed date as inclusive day numbers (days since 1970-01-01).
+
+    Examples:
+      1984 -> Jan 1 to Dec 31, 1984
+      1984-03 / 1984-03~ -> Mar 1 to Mar 31, 1984
+      2016-XX -> the whole of 2016
+      1998/2001 -> Jan 1, 1998 to Dec 31, 2001
+
+    Returns None when the year is unknown (XXXX) or the date cannot be parsed.
+    """
+    if not date_str:
+        return None
+
+    if "/" in date_str:
+        start_str, _, end_str = date_str.partition("/")
+        start, end = day_range(start_str), day_range(end_str)
+        if start is None or end is None:
+            return start or end
+        return start[0], end[1]
+
+    parts = date_str.strip().rstrip("~?").lstrip("~").split("-")
+    try:
+        year = int(parts[0])
+        if len(parts) < 2 or "X" in parts[1]:
+            return _day_number(year, 1, 1), _day_number(year, 12, 31)
+
+        month = int(parts[1])
+        last_day = calendar.monthrange(year, month)[1]
+        if len(parts) < 3 or "X" in parts[2]:
+            return _day_number(year, month, 1), _day_number(year, month, last_day)
+
+        day = _day_number(year, month, int(parts[2]))
+        return day, day
+    except (ValueError, IndexError):
+        # Unknown year (XXXX) or other unparseable value
+        return None
+
+
+def window_days(date_from: str | None, date_to: str | None) -> tuple[int, int] | None:
+    """
+    Inclusive day-number window for from/to filter values (e.g. "1998", "2001-06").
+
+    The window starts at the first day of `date_from` and ends at the last day of
+    `date_to`; either side may be open. Returns None when neither is given.
+
+    Raises:
+        ValueError: If a value is not a parseable date
+    """
+    if not date_from and not date_to:
+        return None
+
+    start, end = -(2**31), 2**31 - 1
+    if date_from:
+        span = day_range(date_from)
+        if span is None:
+            raise ValueError(f"Invalid date: {date_from}")
+        start = span[0]
+    if date_to:
+        span = day_range(date_to)
+        if span is None:
+            raise ValueError(f"Invalid date: {date_to}")
+        end = span[1]
+    return start, end
@@ -70,6 +70,125 @@ def migrate_v1_0_to_v1_1(conn: sqlite3.Connection) -> None:
     console.print("[green]Migration to v1.1 complete![/green]")
 
 
+def ensure_location_clusters(conn: sqlite3.Connection) -> None:
+    """
+    Create the location_clusters table, or add the cluster pyramid columns to an existing one.
+
+    Pyramid rows (kind = 'pyramid') hold one level per zoom band and link to the
+    coarser level through parent_cluster_id. LLM-summarized clusters keep kind = 'summary'.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS location_clusters (
+            cluster_id TEXT PRIMARY KEY,
+            center_lat REAL NOT NULL,
+            center_lon REAL NOT NULL,
+            zoom_level INTEGER,
+            story_ids_json TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            key_themes_json TEXT,
+            story_count INTEGER NOT NULL,
+            date_range TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """
+    )
+
+    cursor = conn.execute("PRAGMA table_info(location_clusters)")
+    columns = {row[1] for row in cursor.fetchall()}
+
+    new_columns = [
+        ("kind", "TEXT NOT NULL DEFAULT 'summary'"),
+        ("parent_cluster_id", "TEXT"),
+        ("point_count", "INTEGER"),
+        ("location_keys_json", "TEXT"),
+    ]
+
+    for col_name, col_type in new_columns:
+        if col_name not in columns:
+            conn.execute(f"ALTER TABLE location_clusters ADD COLUMN {col_name} {col_type}")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_location ON location_clusters(center_lat, center_lon)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_zoom ON location_clusters(zoom_level)")
+    # Bbox lookups into one pyramid level
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_clusters_pyramid "
+        "ON location_clusters(kind, zoom_level, center_lat, center_lon)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_parent ON location_clusters(parent_cluster_id)")
+    conn.commit()
+
+
+def ensure_location_heatmap(conn: sqlite3.Connection) -> None:
+    """
+    Create the location_heatmap table: one sparse density histogram per zoom level.
+
+    cells and counts are little-endian uint32 arrays: row-major cell indices
+    (y * resolution + x over the Web-Mercator world) and the locations in each.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS location_heatmap (
+            zoom_level INTEGER PRIMARY KEY,
+            resolution INTEGER NOT NULL,
+            cells BLOB NOT NULL,
+            counts BLOB NOT NULL
+        )
+    """
+    )
+    conn.commit()
+
+
+def ensure_story_neighbors(conn: sqlite3.Connection) -> None:
+    """
+    Create the story_neighbors table: the most similar stories of each story, best first.
+
+    Keyed by (story_id, rank) without a rowid, so one story's neighbors are a
+    single range read of the table.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS story_neighbors (
+            story_id TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            neighbor_id TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (story_id, rank)
+        ) WITHOUT ROWID
+    """
+    )
+    conn.commit()
+
+
+def ensure_map_points(conn: sqlite3.Connection) -> None:
+    """
+    Create the map_points table of a published database: one row per resolved location.
+
+    Denormalized from story_locations and stories, with the popup summary preview
+    and display date already formatted. Rows are stored in the order the map
+    server loads them, so loading is a sequential scan of the table.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS map_points (
+            story_id TEXT NOT NULL,
+            loc_idx INTEGER NOT NULL,
+            place_name TEXT,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            address TEXT,
+            precision TEXT,
+            confidence REAL,
+            title TEXT,
+            summary_preview TEXT,
+            date TEXT,
+            parsed_date TEXT
+        )
+    """
+    )
+    conn.commit()
+
+
 def migrate_db(db_path: Path) -> None:
     """
     Run all necessary migrations to bring database to latest schema.
@@ -0,0 +1,156 @@
+"""Precomputed location density heatmap for the story map.
+
+One 2D histogram per zoom level over Web-Mercator coordinates, with
+CELLS_PER_TILE x CELLS_PER_TILE cells per slippy-map tile (16px cells at 256px
+tiles). Levels are stored sparsely as sorted row-major cell indices and counts,
+so the map server answers a heatmap viewport with a few binary searches instead
+of shipping every point.
+"""
+
+import math
+import sqlite3
+
+import numpy as np
+
+from abxgeo.db_migrate import ensure_location_heatmap
+from abxgeo.zoom import MAX_TILE_LAT, precision_visible
+
+# Highest zoom level with a stored histogram; closer zooms reuse it
+HEATMAP_MAX_ZOOM = 7
+
+# Histogram cells per tile side
+CELLS_PER_TILE = 16
+
+
+def mercator_fractions(lat: np.ndarray, lon: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """World Web-Mercator coordinates (x east, y south) in [0, 1] of lat/lon arrays."""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -MAX_TILE_LAT, MAX_TILE_LAT)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / math.pi) / 2.0
+    return x, y
+
+
+def build_heatmap(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    precision: list[str | None],
+    max_zoom: int = HEATMAP_MAX_ZOOM,
+    cells_per_tile: int = CELLS_PER_TILE,
+) -> list[tuple[int, int, np.ndarray, np.ndarray]]:
+    """
+    Build the histogram of every zoom level 0..max_zoom.
+
+    Locations hidden at a zoom (country-level pins past world view) are left out
+    of that level, matching the markers the map shows.
+
+    Returns:
+        [(zoom, resolution, cells, counts), ...]: resolution cells per side, cells as
+        sorted uint32 row-major indices (y * resolution + x) of non-empty cells, counts
+        as uint32.
+    """
+    x, y = mercator_fractions(lat, lon)
+    country = np.array([p == "country" for p in precision], dtype=bool)
+
+    levels = []
+    for zoom in range(max_zoom + 1):
+        resolution = 2**zoom * cells_per_tile
+        visible = np.ones(len(x), dtype=bool) if precision_visible("country", zoom) else ~country
+        # histogram2d bins y (rows) by x (columns); the range keeps edge points in the last cell
+        histogram, _, _ = np.histogram2d(
+            y[visible], x[visible], bins=resolution, range=[[0.0, 1.0], [0.0, 1.0]]
+        )
+        cells = np.flatnonzero(histogram).astype(np.uint32)
+        levels.append((zoom, resolution, cells, histogram.ravel()[cells].astype(np.uint32)))
+    return levels
+
+
+def save_heatmap(conn: sqlite3.Connection, levels: list[tuple[int, int, np.ndarray, np.ndarray]]) -> None:
+    """Replace the stored heatmap levels."""
+    ensure_location_heatmap(conn)
+    conn.execute("DELETE FROM location_heatmap")
+    conn.executemany(
+        "INSERT INTO location_heatmap (zoom_level, resolution, cells, counts) VALUES (?, ?, ?, ?)",
+        [
+            (zoom, resolution, cells.astype("<u4").tobytes(), counts.astype("<u4").tobytes())
+            for zoom, resolution, cells, counts in levels
+        ],
+    )
+    conn.commit()
+
+
+def load_heatmap_level(conn: sqlite3.Connection, zoom: int) -> tuple[int, int, np.ndarray, np.ndarray] | None:
+    """
+    Read the stored level for a zoom (the finest stored level past it).
+
+    Returns:
+        (level zoom, resolution, cells, counts), or None when no heatmap is stored.
+    """
+    row = conn.execute(
+        """
+        SELECT zoom_level, resolution, cells, counts FROM location_heatmap
+        WHERE zoom_level <= ? ORDER BY zoom_level DESC LIMIT 1
+        """,
+        (zoom,),
+    ).fetchone()
+    if row is None:
+        return None
+    level, resolution, cells, counts = row
+    return level, resolution, np.frombuffer(cells, dtype="<u4"), np.frombuffer(counts, dtype="<u4")
+
+
+def slice_heatmap(
+    resolution: int, cells: np.ndarray, counts: np.ndarray, bounds: tuple[float, float, float, float]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Non-empty cells of a level inside (south, west, north, east) bounds.
+
+    Each cell row of the bbox is one contiguous range of the sorted indices, found
+    by binary search. Bounds crossing the antimeridian (west > east) wrap around.
+
+    Returns:
+        (cells, counts) of the cells touching the bounds.
+    """
+    south, west, north, east = bounds
+    (x_west, x_east), (y_north, y_south) = mercator_fractions(np.array([north, south]), np.array([west, east]))
+
+    def cell(fraction: float) -> int:
+        return min(max(int(fraction * resolution), 0), resolution - 1)
+
+    if west <= east:
+        column_ranges = [(cell(x_west), cell(x_east))]
+    else:
+        column_ranges = [(cell(x_west), resolution - 1), (0, cell(x_east))]
+
+    rows = np.arange(cell(y_north), cell(y_south) + 1, dtype=np.int64) * resolution
+    found = []
+    for first, last in column_ranges:
+        starts = np.searchsorted(cells, rows + first, side="left")
+        ends = np.searchsorted(cells, rows + last, side="right")
+        found.extend(np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start)
+
+    positions = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    return cells[positions], counts[positions]
+
+
+def cell_centers(resolution: int, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Latitude and longitude of the centers of row-major cell indices."""
+    y, x = np.divmod(cells.astype(np.int64), resolution)
+    lon = (x + 0.5) / resolution * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * (y + 0.5) / resolution))))
+    return lat, lon
+
+
+def build_location_heatmap(conn: sqlite3.Connection) -> list[tuple[int, int, np.ndarray, np.ndarray]]:
+    """Build the heatmap levels from all resolved locations and store them. Returns the levels."""
+    rows = conn.execute(
+        """
+        SELECT resolved_lat, resolved_lon, resolved_precision
+        FROM story_locations
+        WHERE resolved_lat IS NOT NULL
+        """
+    ).fetchall()
+    lat = np.array([row[0] for row in rows], dtype=np.float64)
+    lon = np.array([row[1] for row in rows], dtype=np.float64)
+    levels = build_heatmap(lat, lon, [row[2] for row in rows])
+    save_heatmap(conn, levels)
+    return levels
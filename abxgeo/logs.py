@@ -0,0 +1,94 @@
+"""Structured, level-gated logging for the map server.
+
+Log records are written as one JSON object per line (or plain text) by a
+background thread: request handlers only enqueue the record, so slow stdout
+never blocks the event loop or the worker pools. Extra fields passed with
+``logger.info("...", extra={...})`` become top-level JSON keys.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON with the `extra` fields inlined."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable "[LEVEL] message key=value ..." lines for local development."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        line = f"[{record.levelname}] {record.getMessage()}" + (f" {fields}" if fields else "")
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records with only the message and traceback resolved; formatting happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(name: str, level: str = "INFO", fmt: str = "json") -> logging.Logger:
+    """
+    Set up a logger whose records are formatted and written to stderr off the calling thread.
+
+    Args:
+        name: Logger name (its children share the handler)
+        level: Minimum level; records below it cost only a level check
+        fmt: "json" or "text"
+
+    Returns:
+        The configured logger. Calling again replaces the previous handler.
+    """
+    logger = logging.getLogger(name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            atexit.unregister(handler.listener.stop)
+            handler.listener.stop()
+        logger.removeHandler(handler)
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+    handler.listener.start()
+    atexit.register(handler.listener.stop)
+
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    # Don't duplicate records through the root logger (e.g. uvicorn's handlers)
+    logger.propagate = False
+    return logger
@@ -0,0 +1,123 @@
+"""Precomputed "related stories" for the story map.
+
+Each story is a row of a sparse story x feature matrix: the people, companies,
+product lines and themes it mentions (the map's facets), weighted by inverse
+document frequency so a shared rare person counts for more than a shared common
+theme. Rows are L2-normalized, so multiplying the matrix by its transpose gives
+every cosine similarity at once; the product is taken in row blocks to bound
+memory, and the top k of each row are stored in story_neighbors.
+"""
+
+import sqlite3
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from abxgeo.db_migrate import ensure_story_neighbors
+from abxgeo.snapshot import FACET_SQL, facet_key
+
+# Neighbors stored per story
+NEIGHBORS_K = 10
+
+# Dense similarity cells computed per block (block rows x stories): 64 MB of float32
+BLOCK_CELLS = 2**24
+
+
+def story_features(conn: sqlite3.Connection) -> tuple[list[str], sparse.csr_matrix]:
+    """
+    Binary story x feature matrix of the facet values of every story.
+
+    Features are (kind, normalized value) pairs, e.g. ("person", "tim cook").
+
+    Returns:
+        (story IDs in row order, CSR matrix with 1.0 where a story has a feature)
+    """
+    story_ids = [row[0] for row in conn.execute("SELECT story_id FROM stories ORDER BY story_id")]
+    story_index = {story_id: i for i, story_id in enumerate(story_ids)}
+
+    features: dict[tuple[str, str], int] = {}
+    rows, columns = [], []
+    for kind, sql in FACET_SQL.items():
+        for story_id, value in conn.execute(sql):
+            story = story_index.get(story_id)
+            key = facet_key(value) if isinstance(value, str) else ""
+            if story is None or not key:
+                continue
+            rows.append(story)
+            columns.append(features.setdefault((kind, key), len(features)))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(story_ids), len(features))
+    )
+    # The same value listed twice in a story (summed on construction) still counts once
+    matrix.data[:] = 1.0
+    return story_ids, matrix
+
+
+def story_vectors(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """IDF-weighted, L2-normalized rows of a binary story x feature matrix."""
+    stories = matrix.shape[0]
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + stories) / (1 + document_frequency)) + 1.0
+    return normalize(matrix @ sparse.diags(idf.astype(np.float32)), norm="l2", axis=1).tocsr()
+
+
+def top_neighbors(vectors: sparse.csr_matrix, k: int = NEIGHBORS_K) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The k most cosine-similar other rows of every row.
+
+    Returns:
+        (neighbors, scores): (rows x k) arrays, best first; ties go to the lower row
+        index. Slots without a similar row (score 0) hold neighbor -1.
+    """
+    count = vectors.shape[0]
+    k = min(k, max(count - 1, 0))
+    neighbors = np.full((count, k), -1, dtype=np.int64)
+    scores = np.zeros((count, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+
+    transposed = vectors.T.tocsr()
+    block = max(1, BLOCK_CELLS // count)
+    for start in range(0, count, block):
+        stop = min(start + block, count)
+        similarity = (vectors[start:stop] @ transposed).toarray()
+        # A story is not its own neighbor
+        similarity[np.arange(stop - start), np.arange(start, stop)] = 0.0
+
+        # Exactly k per row: everything above the k-th largest score, then the lowest
+        # row indices among the ties at it (argpartition alone breaks ties arbitrarily)
+        kth = -np.partition(-similarity, k - 1, axis=1)[:, k - 1 : k]
+        above = similarity > kth
+        ties = similarity == kth
+        needed = k - above.sum(axis=1, keepdims=True)
+        selected = above | (ties & (np.cumsum(ties, axis=1) <= needed))
+        top = np.nonzero(selected)[1].reshape(stop - start, k)
+
+        top_scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.lexsort((top, -top_scores), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        neighbors[start:stop] = np.where(top_scores > 0, top, -1)
+        scores[start:stop] = np.where(top_scores > 0, top_scores, 0.0)
+    return neighbors, scores
+
+
+def build_story_neighbors(conn: sqlite3.Connection, k: int = NEIGHBORS_K) -> int:
+    """Compute the top-k related stories of every story and replace story_neighbors. Returns the rows stored."""
+    story_ids, matrix = story_features(conn)
+    neighbors, scores = top_neighbors(story_vectors(matrix), k)
+
+    rows = [
+        (story_ids[story], rank, story_ids[neighbor], float(score))
+        for story, (row_neighbors, row_scores) in enumerate(zip(neighbors.tolist(), scores.tolist()))
+        for rank, (neighbor, score) in enumerate(zip(row_neighbors, row_scores))
+        if neighbor >= 0
+    ]
+    ensure_story_neighbors(conn)
+    conn.execute("DELETE FROM story_neighbors")
+    conn.executemany("INSERT INTO story_neighbors (story_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    return len(rows)
@@ -0,0 +1,160 @@
+"""Publish a compact read-only copy of the story database for the map server.
+
+The ingest database carries raw chapter HTML and its full-text index, the
+geocoding page cache, LLM run logs and columns only the pipeline reads. The map
+server reads none of it, but those pages still sit between the ones it does
+read. Publishing copies a consistent snapshot with VACUUM INTO (safe while
+ingest is writing), drops everything the server never reads, adds the
+denormalized map_points table and a covering index for pyramid bbox lookups,
+stores ANALYZE statistics and rewrites the file at a larger page size. The
+finished file is moved into place atomically.
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+from abxgeo.dates import format_date
+from abxgeo.db_migrate import ensure_map_points
+from abxgeo.snapshot import LOCATION_ROWS_SQL, summary_preview
+
+# Page size of the published file. The server reads it memory-mapped, so a page
+# costs no copy and larger pages mean shallower B-trees and fewer page lookups
+# per scan. 16 KiB is a whole number of OS pages on x86 (4 KiB) and Apple silicon (16 KiB).
+PUBLISH_PAGE_SIZE = 16384
+PAGE_SIZES = (4096, 8192, 16384, 32768, 65536)
+
+# Tables only the ingest and geocoding pipeline reads
+INGEST_TABLES = ("chapter_fts", "geocode_cache", "llm_runs", "chapter_llm")
+
+# Columns kept in tables the server reads only partly (other tables are kept whole)
+SERVED_COLUMNS = {
+    "chapters": ("chapter_id", "book_id", "idx", "title", "href"),
+    "stories": ("story_id", "chapter_id", "title", "summary", "confidence", "parsed_date", "themes_json"),
+    "story_locations": (
+        "story_id",
+        "loc_idx",
+        "place_name",
+        "resolved_address",
+        "resolved_lat",
+        "resolved_lon",
+        "resolved_precision",
+        "resolution_confidence",
+    ),
+}
+
+# The only secondary indexes the server's queries use (primary keys cover the rest)
+SERVED_INDEXES = {
+    # PYRAMID_LEVEL_SQL reads every selected column from the index, never the table
+    "location_clusters": (
+        "CREATE INDEX idx_clusters_pyramid_covering ON location_clusters("
+        "kind, zoom_level, center_lat, center_lon, "
+        "cluster_id, point_count, story_count, location_keys_json, summary, date_range)"
+    ),
+}
+
+
+def _tables(conn: sqlite3.Connection) -> set[str]:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def drop_ingest_data(conn: sqlite3.Connection) -> None:
+    """Drop triggers, ingest-only tables, secondary indexes and unread columns."""
+    # Triggers keep FTS and cache tables in step with writes; the published copy is never written
+    triggers = conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for (name,) in triggers:
+        conn.execute(f'DROP TRIGGER "{name}"')
+
+    tables = _tables(conn)
+    for table in INGEST_TABLES:
+        if table in tables:
+            conn.execute(f'DROP TABLE "{table}"')
+
+    # Explicit indexes (not primary key or UNIQUE autoindexes); a column can't be dropped while indexed
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    for (name,) in indexes:
+        conn.execute(f'DROP INDEX "{name}"')
+
+    tables = _tables(conn)
+    for table, keep in SERVED_COLUMNS.items():
+        if table not in tables:
+            continue
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        for column in columns:
+            if column not in keep:
+                conn.execute(f'ALTER TABLE "{table}" DROP COLUMN "{column}"')
+    conn.commit()
+
+
+def build_map_points(conn: sqlite3.Connection) -> int:
+    """Fill map_points from the ingest tables, in the order the map server loads them. Returns the rows stored."""
+    ensure_map_points(conn)
+    conn.execute("DELETE FROM map_points")
+    rows = [
+        (*row[:9], summary_preview(summary), format_date(parsed_date) if parsed_date else None, parsed_date)
+        for row in conn.execute(LOCATION_ROWS_SQL)
+        for summary, parsed_date in [row[9:11]]
+    ]
+    conn.executemany("INSERT INTO map_points VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return len(rows)
+
+
+def create_served_indexes(conn: sqlite3.Connection) -> None:
+    """Create the covering indexes of the server's queries on the tables present."""
+    tables = _tables(conn)
+    for table, sql in SERVED_INDEXES.items():
+        if table in tables:
+            conn.execute(sql)
+    if "story_fts" in tables:
+        # Merge the full-text index into one B-tree per column set
+        conn.execute("INSERT INTO story_fts(story_fts) VALUES ('optimize')")
+    conn.commit()
+
+
+def publish_db(source: Path, out: Path, page_size: int = PUBLISH_PAGE_SIZE) -> dict[str, int]:
+    """
+    Write a serving-optimized copy of the story database.
+
+    Args:
+        source: Ingest database (opened read-only; may be in use)
+        out: Published database, replaced atomically if it exists
+        page_size: SQLite page size of the published file (one of PAGE_SIZES)
+
+    Returns:
+        {"source_bytes", "published_bytes", "map_points"}
+    """
+    if page_size not in PAGE_SIZES:
+        raise ValueError(f"page_size must be one of {PAGE_SIZES}, got {page_size}")
+    if out.resolve() == source.resolve():
+        raise ValueError("The published database must not replace its source")
+
+    partial = out.with_name(f"{out.name}.partial")
+    partial.unlink(missing_ok=True)
+    try:
+        conn = sqlite3.connect(f"{source.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            # Pending page size of the source connection applies to the copy
+            conn.execute(f"PRAGMA page_size = {page_size}")
+            conn.execute("VACUUM INTO ?", (str(partial),))
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(partial)
+        try:
+            drop_ingest_data(conn)
+            points = build_map_points(conn)
+            create_served_indexes(conn)
+            conn.execute("ANALYZE")
+            conn.commit()
+            # Reclaim the pages freed above; VACUUM INTO left the journal mode at DELETE,
+            # so read-only connections need no -wal or -shm file next to it
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.replace(partial, out)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+    return {"source_bytes": source.stat().st_size, "published_bytes": out.stat().st_size, "map_points": points}
@@ -0,0 +1,200 @@
+"""Hierarchical cluster pyramid for the story map.
+
+Precomputes one clustering level per zoom band (see zoom_bands) so the map server
+can answer viewport requests with an indexed lookup instead of running DBSCAN
+per request. Levels are built bottom-up: each band clusters the nodes of the next
+finer band, so every node links to exactly one parent in the coarser level.
+"""
+
+import hashlib
+import json
+import sqlite3
+from collections import defaultdict
+from typing import Any
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+from abxgeo.dates import format_date_range
+from abxgeo.db_migrate import ensure_location_clusters
+from abxgeo.zoom import precision_visible, zoom_bands
+
+
+def load_resolved_locations(conn: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Fetch all resolved locations with the story fields needed for cluster headers."""
+    cursor = conn.execute(
+        """
+        SELECT
+            sl.story_id,
+            sl.loc_idx,
+            sl.place_name,
+            sl.resolved_lat,
+            sl.resolved_lon,
+            sl.resolved_precision,
+            sl.resolution_confidence,
+            s.parsed_date
+        FROM story_locations sl
+        JOIN stories s ON sl.story_id = s.story_id
+        WHERE sl.resolved_lat IS NOT NULL
+        ORDER BY sl.resolution_confidence DESC, sl.story_id, sl.loc_idx
+    """
+    )
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def cluster_summary(place_names: list[str | None], story_count: int) -> str:
+    """Build a short "N stories in X" label from the leading place names of a cluster."""
+    location_names: dict[str, None] = {}
+    for place_name in place_names[:5]:  # Sample first 5 for location names
+        if place_name:
+            # Extract city/area from place name
+            location_names[place_name.split(",")[0].strip()] = None
+
+    location_str = ", ".join(list(location_names)[:3]) if location_names else "this area"
+    return f"{story_count} stories in {location_str}"
+
+
+def content_cluster_id(prefix: str, location_keys: list) -> str:
+    """
+    Deterministic cluster ID: the same member locations always get the same ID.
+
+    Args:
+        prefix: Identifies the clustering level (e.g. "pyr7")
+        location_keys: (story_id, loc_idx) pairs of the member locations, in any order
+    """
+    key_str = json.dumps(sorted(f"{sid}:{idx}" for sid, idx in location_keys))
+    return f"{prefix}_{hashlib.sha256(key_str.encode()).hexdigest()[:16]}"
+
+
+def _make_node(band_zoom: int, members: list[int], lat: float, lon: float, locations: list[dict]) -> dict[str, Any]:
+    """Build a pyramid node from member location indices (ordered by confidence)."""
+    location_keys = [[locations[i]["story_id"], locations[i]["loc_idx"]] for i in members]
+
+    # Deduplicate stories by story_id (same story can have multiple locations)
+    first_by_story: dict[str, dict] = {}
+    for i in members:
+        first_by_story.setdefault(locations[i]["story_id"], locations[i])
+    unique_stories = list(first_by_story.values())
+
+    return {
+        "cluster_id": content_cluster_id(f"pyr{band_zoom}", location_keys),
+        "zoom_level": band_zoom,
+        "parent_cluster_id": None,
+        "center_lat": float(lat),
+        "center_lon": float(lon),
+        "point_count": len(members),
+        "location_keys": location_keys,
+        "story_ids": list(first_by_story),
+        "story_count": len(unique_stories),
+        "date_range": format_date_range([loc["parsed_date"] for loc in unique_stories]),
+        "summary": cluster_summary([loc["place_name"] for loc in unique_stories], len(unique_stories)),
+    }
+
+
+def build_pyramid(locations: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Build the cluster pyramid from resolved locations.
+
+    Args:
+        locations: Location dicts from load_resolved_locations (ordered by confidence)
+
+    Returns:
+        List of node dicts across all bands. Nodes with point_count == 1 are
+        unclustered markers at that band.
+    """
+    nodes: list[dict[str, Any]] = []
+    if not locations:
+        return nodes
+
+    # Nodes of the previous (finer) level; raw leaves have no cluster_id
+    current: list[dict[str, Any]] = []
+    added = [False] * len(locations)
+
+    for band_zoom, epsilon in reversed(zoom_bands()):
+        # Add leaves for locations that become visible at this band (country-level at world view)
+        for i, loc in enumerate(locations):
+            if not added[i] and precision_visible(loc["resolved_precision"], band_zoom):
+                current.append(
+                    {
+                        "cluster_id": None,
+                        "center_lat": loc["resolved_lat"],
+                        "center_lon": loc["resolved_lon"],
+                        "members": [i],
+                    }
+                )
+                added[i] = True
+
+        if not current:
+            continue
+
+        # min_samples=1 turns DBSCAN into single-linkage grouping, so singletons become their own node
+        coords = np.radians([[node["center_lat"], node["center_lon"]] for node in current])
+        labels = DBSCAN(eps=epsilon, min_samples=1, metric="haversine").fit(coords).labels_
+
+        groups = defaultdict(list)
+        for node, label in zip(current, labels):
+            groups[label].append(node)
+
+        level = []
+        for children in groups.values():
+            members = sorted(i for child in children for i in child["members"])
+            weights = [len(child["members"]) for child in children]
+            lat = np.average([child["center_lat"] for child in children], weights=weights)
+            lon = np.average([child["center_lon"] for child in children], weights=weights)
+
+            node = _make_node(band_zoom, members, lat, lon, locations)
+            for child in children:
+                if child["cluster_id"]:
+                    child["parent_cluster_id"] = node["cluster_id"]
+
+            node["members"] = members
+            level.append(node)
+
+        nodes.extend(level)
+        current = level
+
+    for node in nodes:
+        del node["members"]
+    return nodes
+
+
+def save_pyramid(conn: sqlite3.Connection, nodes: list[dict[str, Any]]) -> None:
+    """Replace the stored pyramid levels with the given nodes."""
+    ensure_location_clusters(conn)
+    conn.execute("DELETE FROM location_clusters WHERE kind = 'pyramid'")
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO location_clusters (
+            cluster_id, kind, center_lat, center_lon, zoom_level, parent_cluster_id,
+            story_ids_json, location_keys_json, summary, point_count, story_count, date_range
+        ) VALUES (?, 'pyramid', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        [
+            (
+                node["cluster_id"],
+                node["center_lat"],
+                node["center_lon"],
+                node["zoom_level"],
+                node["parent_cluster_id"],
+                json.dumps(node["story_ids"]),
+                json.dumps(node["location_keys"]),
+                node["summary"],
+                node["point_count"],
+                node["story_count"],
+                node["date_range"],
+            )
+            for node in nodes
+        ],
+    )
+
+    # Markers come from the server's in-memory snapshot; drop the bbox index earlier runs created
+    conn.execute("DROP INDEX IF EXISTS idx_story_locations_resolved_latlon")
+    conn.commit()
+
+
+def build_cluster_pyramid(conn: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Load resolved locations, build the pyramid and store it. Returns the stored nodes."""
+    nodes = build_pyramid(load_resolved_locations(conn))
+    save_pyramid(conn, nodes)
+    return nodes
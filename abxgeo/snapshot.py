@@ -0,0 +1,611 @@
+"""In-memory columnar snapshot of resolved story locations for the map server.
+
+All resolved locations are loaded once into NumPy column arrays, sorted by
+latitude, so viewport and precision filters become a binary search plus boolean
+masks instead of a SQL scan with a Python dict per row. Story facets (people,
+companies, product lines, themes) are packed per-value bitsets over the stories,
+so facet filters are a few bitwise operations and one gather per viewport.
+
+A snapshot can be saved as a directory of .npy columns plus a string blob and
+reopened memory-mapped, so several server processes share one copy of it
+through the OS page cache instead of each parsing SQLite into its own heap.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from abxgeo.dates import day_range, format_date
+from abxgeo.metrics import ROWS_SCANNED
+from abxgeo.zoom import MAX_TILE_LAT, precision_visible
+
+# Characters of story summary shown in map popups
+SUMMARY_PREVIEW_CHARS = 100
+
+# Day range of undated stories: never overlaps a time window
+UNDATED_DAYS = (np.iinfo(np.int32).max, np.iinfo(np.int32).min)
+
+# (story_id, value) pairs of each story facet the map can filter by
+FACET_SQL = {
+    "person": "SELECT story_id, name FROM story_people WHERE name IS NOT NULL",
+    "company": "SELECT story_id, name FROM story_companies WHERE name IS NOT NULL",
+    "product_line": "SELECT story_id, product_line FROM story_products WHERE product_line IS NOT NULL",
+    "theme": """
+        SELECT s.story_id, t.value
+        FROM stories s, json_each(CASE WHEN json_valid(s.themes_json) THEN s.themes_json ELSE '[]' END) t
+        WHERE t.type = 'text'
+    """,
+}
+
+# Every resolved location with its story, highest confidence first (ties in key order)
+LOCATION_ROWS_SQL = """
+    SELECT
+        sl.story_id,
+        sl.loc_idx,
+        sl.place_name,
+        sl.resolved_lat,
+        sl.resolved_lon,
+        sl.resolved_address,
+        sl.resolved_precision,
+        sl.resolution_confidence,
+        s.title,
+        s.summary,
+        s.parsed_date
+    FROM story_locations sl
+    JOIN stories s ON sl.story_id = s.story_id
+    WHERE sl.resolved_lat IS NOT NULL
+    ORDER BY sl.resolution_confidence DESC, sl.story_id, sl.loc_idx
+"""
+
+# The same rows from the denormalized map_points table of a published database
+# (see abxgeo.publish): stored in load order with the preview and date pre-formatted
+MAP_POINTS_SQL = """
+    SELECT story_id, loc_idx, place_name, lat, lon, address, precision, confidence,
+           title, summary_preview, date, parsed_date
+    FROM map_points
+    ORDER BY rowid
+"""
+
+# Normalized facet filter: ((kind, (value key, ...)), ...) sorted, hashable for cache keys
+Facets = tuple[tuple[str, tuple[str, ...]], ...]
+
+
+def facet_key(value: str) -> str:
+    """Case- and whitespace-insensitive key of a facet value."""
+    return " ".join(value.split()).casefold()
+
+
+def facet_filter(selected: dict[str, list[str] | None]) -> Facets | None:
+    """
+    Normalize requested facet values into a Facets filter.
+
+    Values of one facet are alternatives (any of them matches); different facets
+    must all match. Returns None when nothing is selected.
+    """
+    facets = tuple(
+        (kind, tuple(sorted({facet_key(value) for value in values if value.strip()})))
+        for kind, values in sorted(selected.items())
+        if values and any(value.strip() for value in values)
+    )
+    return facets or None
+
+
+# Bump when the on-disk index layout changes; part of the index directory name
+INDEX_FORMAT = 1
+
+# Numeric per-row columns saved as .npy files
+INDEX_COLUMNS = ("rank", "lat", "lon", "confidence", "precision", "story_idx", "day_start", "day_end", "loc_idx")
+
+# String columns saved as references into the string blob (per story, then per row)
+INDEX_STRING_COLUMNS = ("story_ids", "titles", "summary_previews", "dates", "parsed_dates", "place_names", "addresses")
+
+
+def db_version(db_path: Path) -> str:
+    """Identify the database file contents by a short hash of its inode, size and modification time."""
+    stat = os.stat(db_path)
+    return hashlib.sha1(f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+def summary_preview(summary: str | None) -> str:
+    """Truncate a story summary for popups."""
+    preview = (summary or "")[:SUMMARY_PREVIEW_CHARS]
+    if len(summary or "") > SUMMARY_PREVIEW_CHARS:
+        preview += "..."
+    return preview
+
+
+class StringColumn:
+    """Read-only string column backed by a UTF-8 blob; refs index into it (-1 is None)."""
+
+    def __init__(self, refs: np.ndarray, blob: np.ndarray, offsets: np.ndarray):
+        self.refs = refs
+        self.offsets = offsets
+        self._blob = memoryview(blob)
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def __getitem__(self, i: int) -> str | None:
+        ref = self.refs.item(i)
+        if ref < 0:
+            return None
+        return str(self._blob[self.offsets.item(ref) : self.offsets.item(ref + 1)], "utf-8")
+
+
+def _load_column(path: Path) -> np.ndarray:
+    # Plain ndarray view of the memory map (np.memmap results would leak into every computation)
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+def index_path(index_dir: Path, version: str) -> Path:
+    """Directory holding the saved snapshot of a database version."""
+    return Path(index_dir) / f"{version}-v{INDEX_FORMAT}"
+
+
+def prune_indexes(index_dir: Path, keep: int = 2) -> None:
+    """Delete all but the `keep` most recently written snapshot directories (mapped files stay readable)."""
+    saved = sorted(
+        (path for path in Path(index_dir).glob(f"*-v{INDEX_FORMAT}") if path.is_dir()),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for path in saved[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class LocationSnapshot:
+    """Column arrays of all resolved locations, sorted by latitude."""
+
+    def __init__(
+        self,
+        version: str,
+        rows: list[tuple],
+        has_pyramid: bool = False,
+        facets: dict[str, list[tuple[str, str]]] | None = None,
+        preformatted: bool = False,
+    ):
+        """
+        Build the snapshot from location rows.
+
+        Args:
+            version: Database version the rows were read from (see db_version)
+            rows: Tuples of (story_id, loc_idx, place_name, lat, lon, address, precision,
+                  confidence, title, summary, parsed_date) ordered by confidence DESC
+            has_pyramid: Whether the database holds a cluster pyramid
+            facets: (story_id, value) pairs per facet kind (see FACET_SQL)
+            preformatted: Rows carry (..., title, summary preview, display date, parsed_date)
+                instead, as stored in map_points
+        """
+        self.version = version
+        self.has_pyramid = has_pyramid
+
+        # Per-story columns (deduplicated string tables)
+        story_index: dict[str, int] = {}
+        self.story_ids: list[str] = []
+        self.titles: list[str | None] = []
+        self.summary_previews: list[str] = []
+        self.dates: list[str | None] = []
+        self.parsed_dates: list[str | None] = []
+
+        # Precision string table
+        precision_index: dict[str | None, int] = {}
+        self.precision_names: list[str | None] = []
+
+        # Story time spans as day numbers (see abxgeo.dates.day_range)
+        story_days: list[tuple[int, int]] = []
+
+        n = len(rows)
+        story_idx = np.empty(n, dtype=np.int32)
+        precision = np.empty(n, dtype=np.int8)
+        for i, row in enumerate(rows):
+            story_id, prec, title = row[0], row[6], row[8]
+            if story_id not in story_index:
+                if preformatted:
+                    preview, date, parsed_date = row[9:12]
+                else:
+                    summary, parsed_date = row[9:11]
+                    preview = summary_preview(summary)
+                    date = format_date(parsed_date) if parsed_date else None
+                story_index[story_id] = len(self.story_ids)
+                self.story_ids.append(story_id)
+                self.titles.append(title)
+                self.summary_previews.append(preview)
+                self.dates.append(date)
+                self.parsed_dates.append(parsed_date)
+                story_days.append(day_range(parsed_date) or UNDATED_DAYS)
+            if prec not in precision_index:
+                precision_index[prec] = len(self.precision_names)
+                self.precision_names.append(prec)
+            story_idx[i] = story_index[story_id]
+            precision[i] = precision_index[prec]
+
+        lat = np.array([row[3] for row in rows], dtype=np.float64)
+        order = np.argsort(lat, kind="stable")
+
+        # Rows arrive by confidence DESC; keep that rank to restore result ordering
+        self.rank = np.arange(n, dtype=np.int32)[order]
+        self.lat = lat[order]
+        self.lon = np.array([row[4] for row in rows], dtype=np.float64)[order]
+        # Missing confidences become NaN
+        self.confidence = np.array([row[7] for row in rows], dtype=np.float64)[order]
+        self.precision = precision[order]
+        self.story_idx = story_idx[order]
+        days = np.array(story_days, dtype=np.int32).reshape(-1, 2)
+        self.day_start = days[self.story_idx, 0]
+        self.day_end = days[self.story_idx, 1]
+        self.loc_idx = np.array([row[1] for row in rows], dtype=np.int32)[order]
+        self.place_names = np.array([row[2] for row in rows], dtype=object)[order]
+        self.addresses = np.array([row[5] for row in rows], dtype=object)[order]
+
+        self.story_index = story_index
+        self.country_code = precision_index.get("country", -1)
+        self._build_facets(facets or {})
+        self._key_index: dict[tuple[str, int], int] | None = None
+        self._story_rows: tuple[np.ndarray, np.ndarray] | None = None
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def save(self, directory: Path) -> None:
+        """
+        Write the snapshot as .npy columns, a string blob and a meta.json.
+
+        The files are written to a temporary sibling directory that is renamed
+        into place, so readers never see a partial snapshot; when another process
+        got there first, its copy is kept.
+        """
+        directory = Path(directory)
+        tmp = directory.with_name(f".{directory.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        for name in INDEX_COLUMNS:
+            np.save(tmp / f"{name}.npy", getattr(self, name))
+
+        # One deduplicated UTF-8 blob for all string columns
+        string_index: dict[str, int] = {}
+        chunks: list[bytes] = []
+        offsets = [0]
+        for name in INDEX_STRING_COLUMNS:
+            column = getattr(self, name)
+            refs = np.empty(len(column), dtype=np.int32)
+            for i in range(len(column)):
+                value = column[i]
+                if value is None:
+                    refs[i] = -1
+                    continue
+                ref = string_index.get(value)
+                if ref is None:
+                    ref = string_index[value] = len(chunks)
+                    chunks.append(value.encode())
+                    offsets.append(offsets[-1] + len(chunks[-1]))
+                refs[i] = ref
+            np.save(tmp / f"{name}.npy", refs)
+        np.save(tmp / "strings.npy", np.frombuffer(b"".join(chunks), dtype=np.uint8))
+        np.save(tmp / "string_offsets.npy", np.array(offsets, dtype=np.int64))
+
+        facets = {}
+        for kind, values in self.facet_values.items():
+            keys = list(values)
+            bits = self.facet_bits[kind]
+            packed = np.zeros((len(keys), (len(self.story_ids) + 7) // 8), dtype=np.uint8)
+            for row, key in enumerate(keys):
+                packed[row] = bits[key]
+            np.save(tmp / f"facet_{kind}.npy", packed)
+            facets[kind] = [[key, *values[key]] for key in keys]
+
+        meta = {
+            "version": self.version,
+            "has_pyramid": self.has_pyramid,
+            "precision_names": self.precision_names,
+            "country_code": self.country_code,
+            "facets": facets,
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta))
+
+        try:
+            tmp.rename(directory)
+        except OSError:
+            if not directory.is_dir():
+                raise
+            # Saved concurrently by another process
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def open(cls, directory: Path) -> "LocationSnapshot":
+        """
+        Open a saved snapshot with its columns memory-mapped read-only.
+
+        Raises:
+            FileNotFoundError: No snapshot saved at this path
+        """
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text())
+
+        snapshot = cls.__new__(cls)
+        snapshot.version = meta["version"]
+        snapshot.has_pyramid = meta["has_pyramid"]
+        snapshot.precision_names = meta["precision_names"]
+        snapshot.country_code = meta["country_code"]
+        for name in INDEX_COLUMNS:
+            setattr(snapshot, name, _load_column(directory / f"{name}.npy"))
+
+        blob = _load_column(directory / "strings.npy")
+        offsets = _load_column(directory / "string_offsets.npy")
+        for name in INDEX_STRING_COLUMNS:
+            setattr(snapshot, name, StringColumn(_load_column(directory / f"{name}.npy"), blob, offsets))
+        snapshot.story_index = {snapshot.story_ids[i]: i for i in range(len(snapshot.story_ids))}
+
+        snapshot.facet_bits = {}
+        snapshot.facet_values = {}
+        for kind, values in meta["facets"].items():
+            packed = _load_column(directory / f"facet_{kind}.npy")
+            snapshot.facet_bits[kind] = {key: packed[row] for row, (key, _, _) in enumerate(values)}
+            snapshot.facet_values[kind] = {key: (name, count) for key, name, count in values}
+
+        snapshot._key_index = None
+        snapshot._story_rows = None
+        return snapshot
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, version: str = "") -> "LocationSnapshot":
+        """Read all resolved locations from the database (from map_points when it was published)."""
+        try:
+            rows = [tuple(row) for row in conn.execute(MAP_POINTS_SQL).fetchall()]
+            preformatted = True
+        except sqlite3.OperationalError:
+            # Not a published database: join the ingest tables
+            rows = [tuple(row) for row in conn.execute(LOCATION_ROWS_SQL).fetchall()]
+            preformatted = False
+
+        try:
+            has_pyramid = conn.execute("SELECT 1 FROM location_clusters WHERE kind = 'pyramid' LIMIT 1").fetchone()
+        except sqlite3.OperationalError:
+            # No location_clusters table, or one created before the pyramid columns existed
+            has_pyramid = None
+
+        facets = {}
+        for kind, sql in FACET_SQL.items():
+            try:
+                facets[kind] = [tuple(row) for row in conn.execute(sql).fetchall()]
+            except sqlite3.OperationalError:
+                # Pivot table missing from this database
+                facets[kind] = []
+
+        return cls(version, rows, has_pyramid=has_pyramid is not None, facets=facets, preformatted=preformatted)
+
+    def _build_facets(self, facets: dict[str, list[tuple[str, str]]]) -> None:
+        """Pack one bitset over the stories per distinct facet value."""
+        n_stories = len(self.story_ids)
+        # kind -> value key -> packed bits (np.packbits of a per-story bool array)
+        self.facet_bits: dict[str, dict[str, np.ndarray]] = {}
+        # kind -> value key -> (display name, story count)
+        self.facet_values: dict[str, dict[str, tuple[str, int]]] = {}
+
+        for kind, pairs in facets.items():
+            members: dict[str, set[int]] = {}
+            names: dict[str, str] = {}
+            for story_id, value in pairs:
+                story = self.story_index.get(story_id)
+                if story is None or not isinstance(value, str) or not value.strip():
+                    # Story without resolved locations, or an empty value
+                    continue
+                key = facet_key(value)
+                names.setdefault(key, value.strip())
+                members.setdefault(key, set()).add(story)
+
+            self.facet_bits[kind] = {}
+            self.facet_values[kind] = {}
+            for key, stories in members.items():
+                bits = np.zeros(n_stories, dtype=bool)
+                bits[list(stories)] = True
+                self.facet_bits[kind][key] = np.packbits(bits)
+                self.facet_values[kind][key] = (names[key], len(stories))
+
+    def story_mask(self, facets: Facets) -> np.ndarray:
+        """Per-story bool array: True for stories matching the facet filter."""
+        n_stories = len(self.story_ids)
+        empty = np.zeros((n_stories + 7) // 8, dtype=np.uint8)
+        matched = None
+        for kind, keys in facets:
+            bits = self.facet_bits.get(kind, {})
+            any_of = empty.copy()
+            for key in keys:
+                np.bitwise_or(any_of, bits.get(key, empty), out=any_of)
+            matched = any_of if matched is None else np.bitwise_and(matched, any_of)
+        if matched is None:
+            return np.ones(n_stories, dtype=bool)
+        return np.unpackbits(matched, count=n_stories).astype(bool)
+
+    def viewport(
+        self,
+        sw_lat: float,
+        sw_lon: float,
+        ne_lat: float,
+        ne_lon: float,
+        zoom: int,
+        half_open: bool = False,
+        window: tuple[int, int] | None = None,
+        facets: Facets | None = None,
+    ) -> np.ndarray:
+        """
+        Indices of locations inside the viewport that are visible at this zoom.
+
+        Args:
+            half_open: Exclude the north and east edges, so adjacent tiles never share a location
+            window: Inclusive (first, last) day numbers; keep only stories whose date overlaps it
+            facets: Keep only stories matching this facet filter (see facet_filter)
+
+        Returns:
+            Row indices in latitude (storage) order; callers that show rows by
+            confidence order them with by_rank, after any sampling.
+        """
+        lo = int(np.searchsorted(self.lat, sw_lat, side="left"))
+        hi = int(np.searchsorted(self.lat, ne_lat, side="left" if half_open else "right"))
+        ROWS_SCANNED.inc(hi - lo, source="snapshot")
+        lon = self.lon[lo:hi]
+        east = (lon < ne_lon) if half_open else (lon <= ne_lon)
+        if sw_lon <= ne_lon:
+            mask = (lon >= sw_lon) & east
+        else:
+            # Viewport crosses the antimeridian
+            mask = (lon >= sw_lon) | east
+
+        if not precision_visible("country", zoom):
+            mask &= self.precision[lo:hi] != self.country_code
+
+        if window is not None:
+            mask &= (self.day_end[lo:hi] >= window[0]) & (self.day_start[lo:hi] <= window[1])
+
+        if facets:
+            mask &= self.story_mask(facets)[self.story_idx[lo:hi]]
+
+        return lo + np.flatnonzero(mask)
+
+    def by_rank(self, indices: np.ndarray) -> np.ndarray:
+        """The given rows ordered by resolution confidence (highest first, ties in key order)."""
+        return indices[np.argsort(self.rank[indices], kind="stable")]
+
+    def index_of(self, story_id: str, loc_idx: int) -> int | None:
+        """Row index of a (story_id, loc_idx) location, if resolved."""
+        if self._key_index is None:
+            self._key_index = {
+                (self.story_ids[s], loc): i for i, (s, loc) in enumerate(zip(self.story_idx.tolist(), self.loc_idx.tolist()))
+            }
+        return self._key_index.get((story_id, loc_idx))
+
+    def story_rows(self, story_id: str) -> np.ndarray:
+        """Row indices of a story's resolved locations, highest confidence first (empty if none)."""
+        story = self.story_index.get(story_id)
+        if story is None:
+            return np.empty(0, dtype=np.int64)
+        if self._story_rows is None:
+            # Rows grouped by story, by confidence within each story; offsets index the groups
+            order = np.lexsort((self.rank, self.story_idx))
+            offsets = np.searchsorted(self.story_idx[order], np.arange(len(self.story_ids) + 1))
+            self._story_rows = order, offsets
+        order, offsets = self._story_rows
+        return order[offsets[story] : offsets[story + 1]]
+
+    def matching(
+        self, indices: np.ndarray, window: tuple[int, int] | None = None, facets: Facets | None = None
+    ) -> np.ndarray:
+        """The given rows whose story date overlaps the day window and that match the facet filter."""
+        if window is not None:
+            indices = indices[(self.day_end[indices] >= window[0]) & (self.day_start[indices] <= window[1])]
+        if facets:
+            indices = indices[self.story_mask(facets)[self.story_idx[indices]]]
+        return indices
+
+    def key(self, i: int) -> tuple[str, int]:
+        """(story_id, loc_idx) of one row."""
+        return self.story_ids[self.story_idx[i]], int(self.loc_idx[i])
+
+    def first_per_story(self, indices: np.ndarray) -> np.ndarray:
+        """The given rows, keeping only the first location of each story (order preserved)."""
+        _, first = np.unique(self.story_idx[indices], return_index=True)
+        return indices[np.sort(first)]
+
+    def by_date(self, indices: np.ndarray) -> np.ndarray:
+        """The given rows ordered by story start date, undated stories last (ties keep their order)."""
+        return indices[np.argsort(self.day_start[indices], kind="stable")]
+
+    def date_histogram(self, indices: np.ndarray, unit: str = "year") -> tuple[str, list[int]] | None:
+        """
+        Count the given rows (one per story) per year or month of their story's start date.
+
+        Args:
+            unit: "year" or "month"
+
+        Returns:
+            (first period as "YYYY" or "YYYY-MM", counts of every period from it to the
+            last dated one), or None when no row is dated.
+        """
+        start = self.day_start[indices]
+        start = start[start != UNDATED_DAYS[0]]
+        if len(start) == 0:
+            return None
+        code = "Y" if unit == "year" else "M"
+        periods = start.astype("datetime64[D]").astype(f"datetime64[{code}]").astype(np.int64)
+        first = int(periods.min())
+        return str(np.datetime64(first, code)), np.bincount(periods - first).tolist()
+
+    def top_per_cell(
+        self, indices: np.ndarray, bounds: tuple[float, float, float, float], grid: int, per_cell: int
+    ) -> tuple[np.ndarray, list[dict[str, Any]]]:
+        """
+        Level-of-detail sample: split the bounds into a grid x grid Web-Mercator (screen) grid
+        and keep the `per_cell` highest-confidence rows of each cell.
+
+        Args:
+            bounds: (south, west, north, east); west > east crosses the antimeridian
+
+        Returns:
+            Tuple of (kept rows by confidence, [{"lat", "lon", "count"}, ...] per cell with
+            hidden rows: their centroid and count).
+        """
+        if len(indices) == 0:
+            return indices, []
+        south, west, north, east = bounds
+
+        def mercator_y(lat: np.ndarray) -> np.ndarray:
+            return np.arcsinh(np.tan(np.radians(np.clip(lat, -MAX_TILE_LAT, MAX_TILE_LAT))))
+
+        lon = self.lon[indices]
+        if west > east:
+            east += 360.0
+            lon = np.where(lon < west, lon + 360.0, lon)
+        top, bottom = mercator_y(np.array([north, south]))
+        cx = (lon - west) / max(east - west, 1e-12) * grid
+        cy = (top - mercator_y(self.lat[indices])) / max(top - bottom, 1e-12) * grid
+        cell = np.clip(cy.astype(np.int64), 0, grid - 1) * grid + np.clip(cx.astype(np.int64), 0, grid - 1)
+
+        # Rows grouped by cell, by confidence within a cell; the first per_cell of each group are kept
+        order = np.lexsort((self.rank[indices], cell))
+        sorted_cells = cell[order]
+        starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        position = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        keep = position < per_cell
+
+        kept = self.by_rank(indices[order[keep]])
+
+        hidden_positions = order[~keep]
+        hidden = []
+        if len(hidden_positions):
+            _, first, counts = np.unique(sorted_cells[~keep], return_index=True, return_counts=True)
+            lats = np.add.reduceat(self.lat[indices[hidden_positions]], first) / counts
+            # Shifted longitudes, so a cell straddling the antimeridian is averaged correctly
+            lons = np.add.reduceat(lon[hidden_positions], first) / counts
+            lons = np.where(lons > 180.0, lons - 360.0, lons)
+            hidden = [
+                {"lat": cell_lat, "lon": cell_lon, "count": count}
+                for cell_lat, cell_lon, count in zip(lats.tolist(), lons.tolist(), counts.tolist())
+            ]
+        return kept, hidden
+
+    def location(self, i: int) -> dict[str, Any]:
+        """Marker dict for one row."""
+        story = self.story_idx[i]
+        confidence = self.confidence[i]
+        return {
+            "story_id": self.story_ids[story],
+            "place_name": self.place_names[i],
+            "lat": float(self.lat[i]),
+            "lon": float(self.lon[i]),
+            "address": self.addresses[i],
+            "precision": self.precision_names[self.precision[i]],
+            "confidence": None if np.isnan(confidence) else float(confidence),
+            "title": self.titles[story],
+            "summary_preview": self.summary_previews[story],
+            "date": self.dates[story],
+        }
+
+    def locations(self, indices: np.ndarray) -> list[dict[str, Any]]:
+        """Marker dicts for the given rows, in order."""
+        return [self.location(i) for i in indices.tolist()]
@@ -0,0 +1,153 @@
+"""Zoom-level and slippy-map tile helpers shared by the cluster builder and the map server."""
+
+import math
+
+# Convert km to radians: radians = km / earth_radius_km
+EARTH_RADIUS_KM = 6371
+
+# Highest zoom level that still clusters (17+ shows individual markers)
+MAX_CLUSTER_ZOOM = 16
+
+# Country-level locations are only shown at world view (zoom 1-3)
+COUNTRY_MAX_ZOOM = 3
+
+
+def zoom_to_epsilon(zoom: int) -> float:
+    """
+    Map zoom level to DBSCAN epsilon (in radians for haversine metric).
+
+    Zoom levels (Google Maps):
+    1-4: World view (separate continents/countries)
+    5-7: Regional view (states/regions within country)
+    8-10: City view
+    11-13: Neighborhood view
+    14-16: Street/building view (tight clustering for overlapping markers)
+    17+: Individual markers
+
+    Returns epsilon in radians for haversine distance.
+    """
+    if zoom <= 3:
+        return 2000 / EARTH_RADIUS_KM  # ~2000km - cluster country-level locations
+    elif zoom <= 4:
+        return 500 / EARTH_RADIUS_KM  # ~500km - separate coasts/regions
+    elif zoom <= 7:
+        return 100 / EARTH_RADIUS_KM  # ~100km - regional clusters
+    elif zoom <= 9:
+        return 20 / EARTH_RADIUS_KM  # ~20km - city clusters
+    elif zoom <= 11:
+        return 5 / EARTH_RADIUS_KM  # ~5km - neighborhood clusters
+    elif zoom <= 13:
+        return 1 / EARTH_RADIUS_KM  # ~1km - block-level clusters
+    elif zoom <= 14:
+        return 0.1 / EARTH_RADIUS_KM  # ~100m - building clusters
+    elif zoom <= 15:
+        return 0.05 / EARTH_RADIUS_KM  # ~50m - tight building clusters
+    elif zoom <= 16:
+        return 0.01 / EARTH_RADIUS_KM  # ~10m - same-location clusters
+    else:
+        return 0.0  # No clustering, show individual markers
+
+
+def zoom_bands() -> list[tuple[int, float]]:
+    """
+    Group zoom levels that share an epsilon into bands.
+
+    Returns:
+        List of (band_zoom, epsilon) tuples ordered coarsest first, where band_zoom
+        is the highest zoom level in the band (e.g. zoom 5-7 -> band 7).
+    """
+    bands: list[tuple[int, float]] = []
+    for zoom in range(1, MAX_CLUSTER_ZOOM + 1):
+        epsilon = zoom_to_epsilon(zoom)
+        if bands and bands[-1][1] == epsilon:
+            bands[-1] = (zoom, epsilon)
+        else:
+            bands.append((zoom, epsilon))
+    return bands
+
+
+def zoom_band(zoom: int) -> int | None:
+    """Return the band zoom for a zoom level, or None when markers are shown individually."""
+    for band_zoom, _ in zoom_bands():
+        if zoom <= band_zoom:
+            return band_zoom
+    return None
+
+
+def precision_visible(precision: str | None, zoom: int) -> bool:
+    """Whether a location with this resolved precision is shown at the given zoom."""
+    # At regional view and closer (4+): hide country-level (too vague)
+    return precision != "country" or zoom <= COUNTRY_MAX_ZOOM
+
+
+# Web-Mercator latitude limit of slippy-map tiles
+MAX_TILE_LAT = 85.0511287798066
+
+# Tolerance (in tile units) so viewports already snapped to tile edges map back to the same tiles
+TILE_EDGE_EPSILON = 1e-6
+
+
+def tile_fraction(lat: float, lon: float, zoom: int) -> tuple[float, float]:
+    """Fractional slippy-map tile coordinates (x, y) of a point at a zoom level."""
+    n = 2**zoom
+    lat = max(-MAX_TILE_LAT, min(MAX_TILE_LAT, lat))
+    lat_rad = math.radians(lat)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Return (south, west, north, east) of a slippy-map tile in degrees."""
+    n = 2**zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tile_ranges(
+    sw_lat: float, sw_lon: float, ne_lat: float, ne_lon: float, zoom: int
+) -> tuple[list[range], range]:
+    """
+    Column and row ranges of the tiles at a zoom level that cover a viewport.
+
+    Returns:
+        Tuple of (x ranges, y range); a viewport crossing the antimeridian
+        (sw_lon > ne_lon) wraps around into two x ranges.
+    """
+    n = 2**zoom
+    fx_west, fy_south = tile_fraction(sw_lat, sw_lon, zoom)
+    fx_east, fy_north = tile_fraction(ne_lat, ne_lon, zoom)
+
+    def clamp(value: int) -> int:
+        return max(0, min(n - 1, value))
+
+    x0 = clamp(math.floor(fx_west + TILE_EDGE_EPSILON))
+    x1 = clamp(math.ceil(fx_east - TILE_EDGE_EPSILON) - 1)
+    y0 = clamp(math.floor(fy_north + TILE_EDGE_EPSILON))
+    y1 = clamp(math.ceil(fy_south - TILE_EDGE_EPSILON) - 1)
+    y1 = max(y0, y1)
+
+    if sw_lon <= ne_lon:
+        xs = [range(x0, max(x0, x1) + 1)]
+    else:
+        xs = [range(x0, n), range(0, x1 + 1)]
+    return xs, range(y0, y1 + 1)
+
+
+def count_tiles_covering(sw_lat: float, sw_lon: float, ne_lat: float, ne_lon: float, zoom: int) -> int:
+    """Number of tiles tiles_covering would list, without building the list."""
+    xs, ys = tile_ranges(sw_lat, sw_lon, ne_lat, ne_lon, zoom)
+    return sum(len(r) for r in xs) * len(ys)
+
+
+def tiles_covering(sw_lat: float, sw_lon: float, ne_lat: float, ne_lon: float, zoom: int) -> list[tuple[int, int]]:
+    """
+    List the (x, y) tiles at a zoom level that cover a viewport.
+
+    Viewports crossing the antimeridian (sw_lon > ne_lon) wrap around.
+    """
+    xs, ys = tile_ranges(sw_lat, sw_lon, ne_lat, ne_lon, zoom)
+    return [(x, y) for r in xs for x in r for y in ys]
@@ -0,0 +1,273 @@
+"""Replay pan/zoom viewport traces against the map API and report latency per endpoint.
+
+Each virtual user replays the traces in turn, like a browser panning and
+zooming the map: one /api/locations request per viewport step (or, with
+--mode tiles, the covering /api/tiles requests at once, as the frontend does),
+optionally opening the first clusters of each response via /api/cluster. By
+default map.server.app is driven in-process through httpx's ASGI transport;
+--url targets a live server instead.
+
+Reports p50/p95/p99 latency, throughput and response bytes (as sent, i.e.
+compressed when the server compresses) per endpoint.
+
+Usage:
+    python benchmarks/map_load.py --db full_book.sqlite
+    python benchmarks/map_load.py --db full_book.sqlite --mode tiles --concurrency 16 --rounds 5
+    python benchmarks/map_load.py --db full_book.sqlite --no-cache --open-clusters 2
+    python benchmarks/map_load.py --db full_book.sqlite --no-cache --only world-overview
+    python benchmarks/map_load.py --url http://localhost:8000 --trace my_traces.json
+
+Trace files are JSON: {"trace name": [{"zoom": 12, "lat": 22.6, "lon": 114.0}, ...], ...},
+each step the map center and zoom; --width/--height give the screen size in pixels.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+# map/ is not an installed package: import the server from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from abxgeo.zoom import tile_fraction, tiles_covering  # noqa: E402
+
+# Recorded sessions: (zoom, center lat, center lon) per step
+TRACES: dict[str, list[dict[str, float]]] = {
+    # Zooming from world view down to street level at One Infinite Loop
+    "cupertino-zoom": [{"zoom": zoom, "lat": 37.3318, "lon": -122.0312} for zoom in range(3, 18)],
+    # Panning east across Shenzhen at city zoom
+    "shenzhen-sweep": [{"zoom": 12, "lat": 22.60, "lon": 113.75 + 0.05 * step} for step in range(13)],
+    # Zooming into Zhengzhou, then panning back out over China
+    "zhengzhou-zoom-out": [{"zoom": zoom, "lat": 34.7466, "lon": 113.6253} for zoom in range(4, 15)]
+    + [{"zoom": 6, "lat": 34.7466 - 2.0 * step, "lon": 113.6253 - 3.0 * step} for step in range(1, 6)],
+    # Large viewports: the whole world, then continent- and country-sized views, where the
+    # viewport filter matches most locations (run with --no-cache to time it on every step)
+    "world-overview": [
+        {"zoom": 1, "lat": 20.0, "lon": 0.0},
+        {"zoom": 2, "lat": 30.0, "lon": 100.0},
+        {"zoom": 3, "lat": 35.0, "lon": 105.0},
+        {"zoom": 3, "lat": 40.0, "lon": -100.0},
+        {"zoom": 4, "lat": 30.0, "lon": 110.0},
+        {"zoom": 5, "lat": 35.0, "lon": 105.0},
+    ],
+}
+
+
+def viewport(lat: float, lon: float, zoom: int, width: int, height: int) -> dict[str, float]:
+    """sw/ne bounds of a width x height pixel map (256px tiles) centered on lat/lon."""
+    n = 2**zoom
+    cx, cy = tile_fraction(lat, lon, zoom)
+    half_x, half_y = width / 512, height / 512
+
+    def tile_lat(y: float) -> float:
+        y = min(max(y, 0.0), float(n))
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    def tile_lon(x: float) -> float:
+        return (x / n * 360.0) % 360.0 - 180.0
+
+    if 2 * half_x >= n:
+        west, east = -180.0, 180.0
+    else:
+        # west > east when the screen crosses the antimeridian
+        west, east = tile_lon(cx - half_x), tile_lon(cx + half_x)
+    return {"sw_lat": tile_lat(cy + half_y), "sw_lon": west, "ne_lat": tile_lat(cy - half_y), "ne_lon": east}
+
+
+class EndpointStats:
+    """Latencies, bytes and errors of one endpoint."""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.bytes = 0
+        self.errors = 0
+        # Error responses by status code, e.g. 503 when the server sheds load
+        self.error_statuses: dict[int, int] = {}
+
+    def record(self, seconds: float, size: int, status: int) -> None:
+        self.latencies.append(seconds)
+        self.bytes += size
+        if status >= 400:
+            self.errors += 1
+            self.error_statuses[status] = self.error_statuses.get(status, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile of the latencies, in milliseconds."""
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))] * 1000
+
+    def summary(self, wall_seconds: float) -> dict[str, Any]:
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "req_per_s": round(count / wall_seconds, 1) if wall_seconds else 0.0,
+            "avg_bytes": round(self.bytes / count) if count else 0,
+            "total_bytes": self.bytes,
+            "error_statuses": {str(status): n for status, n in sorted(self.error_statuses.items())},
+        }
+
+
+class LoadTest:
+    """Replays traces with a number of concurrent virtual users."""
+
+    def __init__(self, client: httpx.AsyncClient, traces: dict[str, list[dict[str, float]]], args: argparse.Namespace):
+        self.client = client
+        self.traces = list(traces.items())
+        self.args = args
+        self.params = dict(param.split("=", 1) for param in args.param)
+        self.stats: dict[str, EndpointStats] = {}
+        self.db_version: str | None = None
+
+    async def get(self, endpoint: str, url: str, params: dict[str, Any] | None = None) -> httpx.Response | None:
+        """GET a URL and record it under an endpoint name; None on transport errors."""
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(url, params=params)
+        except httpx.HTTPError:
+            stats.errors += 1
+            return None
+        stats.record(time.perf_counter() - start, response.num_bytes_downloaded, response.status_code)
+        return response
+
+    async def step(self, step: dict[str, float]) -> None:
+        """Load one viewport and open its first clusters."""
+        zoom = int(step["zoom"])
+        bounds = viewport(step["lat"], step["lon"], zoom, self.args.width, self.args.height)
+        if self.args.mode == "tiles":
+            tiles = tiles_covering(bounds["sw_lat"], bounds["sw_lon"], bounds["ne_lat"], bounds["ne_lon"], zoom)
+            responses = await asyncio.gather(
+                *(self.get("/api/tiles", f"/api/tiles/{self.db_version}/{zoom}/{x}/{y}", self.params) for x, y in tiles)
+            )
+        else:
+            responses = [await self.get("/api/locations", "/api/locations", {"zoom": zoom, **bounds, **self.params})]
+
+        if not self.args.open_clusters:
+            return
+        cluster_ids = [
+            cluster["cluster_id"]
+            for response in responses
+            if response is not None and response.status_code == 200
+            for cluster in response.json().get("clusters", [])
+        ]
+        for cluster_id in cluster_ids[: self.args.open_clusters]:
+            await self.get("/api/cluster", f"/api/cluster/{cluster_id}")
+
+    async def user(self, number: int) -> None:
+        """One virtual user: every trace per round, starting at a different trace than the other users."""
+        for _ in range(self.args.rounds):
+            for offset in range(len(self.traces)):
+                _, steps = self.traces[(number + offset) % len(self.traces)]
+                for step in steps:
+                    await self.step(step)
+
+    async def run(self) -> float:
+        """Replay with all users; returns the wall time in seconds."""
+        if self.args.mode == "tiles":
+            response = await self.get("/api/version", "/api/version")
+            self.db_version = response.json()["db_version"]
+        start = time.perf_counter()
+        await asyncio.gather(*(self.user(number) for number in range(self.args.concurrency)))
+        return time.perf_counter() - start
+
+
+def in_process_client(db: Path | None, no_cache: bool) -> httpx.AsyncClient:
+    """Client driving map.server.app through the ASGI transport (the snapshot is loaded before timing)."""
+    if db is not None:
+        os.environ["DB_PATH"] = str(db)
+    from map import server
+
+    server.get_snapshot()
+    if no_cache:
+        # Every request recomputes its tiles, clusters and body
+        for cache in (server.locations_cache, server.body_cache, server.pyramid_members_cache):
+            cache.clear()
+            cache.maxsize = 0
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://map", follow_redirects=True)
+
+
+def print_report(summaries: dict[str, dict[str, Any]], wall_seconds: float) -> None:
+    print(f"{wall_seconds:.2f} s wall time")
+    print(
+        f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'req/s':>8} {'avg bytes':>10} {'total MB':>9}"
+    )
+    for endpoint, row in summaries.items():
+        print(
+            f"{endpoint:<16} {row['requests']:>9,} {row['errors']:>7,} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+            f"{row['p99_ms']:>8.2f} {row['req_per_s']:>8.1f} {row['avg_bytes']:>10,} {row['total_bytes'] / 1e6:>9.2f}"
+        )
+    for endpoint, row in summaries.items():
+        if row["error_statuses"] and endpoint != "all":
+            statuses = ", ".join(f"{n:,} x {status}" for status, n in row["error_statuses"].items())
+            print(f"{endpoint} errors: {statuses}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    traces = json.loads(Path(args.trace).read_text()) if args.trace else TRACES
+    if args.only:
+        traces = {name: steps for name, steps in traces.items() if name in args.only}
+    if not traces:
+        raise SystemExit("No traces to replay")
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, follow_redirects=True, timeout=args.timeout)
+    else:
+        client = in_process_client(args.db, args.no_cache)
+
+    async with client:
+        test = LoadTest(client, traces, args)
+        wall_seconds = await test.run()
+
+    summaries = {endpoint: stats.summary(wall_seconds) for endpoint, stats in sorted(test.stats.items())}
+    total = EndpointStats()
+    for stats in test.stats.values():
+        total.latencies.extend(stats.latencies)
+        total.bytes += stats.bytes
+        total.errors += stats.errors
+        for status, n in stats.error_statuses.items():
+            total.error_statuses[status] = total.error_statuses.get(status, 0) + n
+    summaries["all"] = total.summary(wall_seconds)
+
+    print(f"{len(traces)} traces x {args.rounds} rounds x {args.concurrency} users, mode {args.mode}")
+    print_report(summaries, wall_seconds)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"wall_seconds": wall_seconds, "endpoints": summaries}, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--db", type=Path, help="Story database for the in-process server (default: DB_PATH)")
+    target.add_argument("--url", help="Base URL of a live server (e.g. http://localhost:8000)")
+    parser.add_argument("--trace", help="JSON file of traces to replay (default: built-in traces)")
+    parser.add_argument("--only", nargs="+", help="Replay only these trace names")
+    parser.add_argument("--mode", choices=("locations", "tiles"), default="locations", help="Viewport endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each user replays every trace")
+    parser.add_argument("--open-clusters", type=int, default=0, help="Clusters opened per viewport step")
+    parser.add_argument("--param", action="append", default=[], help="Extra viewport query parameter (k=v)")
+    parser.add_argument("--width", type=int, default=1280, help="Screen width in pixels")
+    parser.add_argument("--height", type=int, default=800, help="Screen height in pixels")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response caches (in-process only)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout for --url, in seconds")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
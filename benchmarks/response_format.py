@@ -0,0 +1,129 @@
+"""Compare bytes and serialization time of /api/locations response formats.
+
+Builds a viewport payload either from a story database (all resolved locations
+as individual markers) or from synthetic markers, then serializes it as:
+
+- json:     stdlib json, as FastAPI's default JSONResponse does
+- orjson:   the full list-of-dicts payload via orjson
+- compact:  abxgeo.compact columns via orjson (includes conversion time)
+- msgpack:  full and compact payloads via MessagePack (if installed)
+
+Usage:
+    python benchmarks/response_format.py --db full_book.sqlite
+    python benchmarks/response_format.py --markers 5000 --clusters 200
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sqlite3
+import time
+from collections.abc import Callable
+from typing import Any
+
+import orjson
+
+from abxgeo.compact import compact_payload
+from abxgeo.snapshot import LocationSnapshot
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def payload_from_db(db_path: str, limit: int) -> dict[str, Any]:
+    """Markers for up to `limit` resolved locations of a story database."""
+    conn = sqlite3.connect(db_path)
+    snapshot = LocationSnapshot.load(conn)
+    conn.close()
+    indices = snapshot.by_rank(snapshot.viewport(-90, -180, 90, 180, zoom=18))[:limit]
+    return {"locations": snapshot.locations(indices), "clusters": []}
+
+
+def synthetic_payload(markers: int, clusters: int, stories: int, seed: int = 0) -> dict[str, Any]:
+    """Random markers around a few cities, with multi-location stories and shared titles."""
+    rng = random.Random(seed)
+    cities = [("Cupertino", 37.32, -122.03), ("Shenzhen", 22.54, 114.06), ("Zhengzhou", 34.75, 113.63)]
+    titles = [f"Story {i}: supplier visit and production ramp" for i in range(stories)]
+    locations = []
+    for i in range(markers):
+        story = rng.randrange(stories)
+        city, lat, lon = rng.choice(cities)
+        locations.append(
+            {
+                "story_id": f"story_{story:06d}",
+                "place_name": f"Plant {i % 50}, {city}",
+                "lat": lat + rng.uniform(-0.5, 0.5),
+                "lon": lon + rng.uniform(-0.5, 0.5),
+                "address": f"{i % 900} Industrial Road, {city}, Province, Country",
+                "precision": rng.choice(["address", "city", "region"]),
+                "confidence": round(rng.uniform(0.5, 1.0), 2),
+                "title": titles[story],
+                "summary_preview": f"{titles[story]} - a story about manufacturing. " * 2,
+                "date": f"Jan {rng.randint(1976, 2018)}",
+            }
+        )
+    cluster_list = [
+        {
+            "cluster_id": f"pyr7_{i:016x}",
+            "center_lat": rng.uniform(-60, 60),
+            "center_lon": rng.uniform(-180, 180),
+            "story_count": rng.randint(2, 500),
+            "date_range": f"Jan {rng.randint(1976, 1990)}–Mar {rng.randint(1991, 2018)}",
+            "summary": f"{rng.randint(2, 500)} stories in {rng.choice(cities)[0]}",
+        }
+        for i in range(clusters)
+    ]
+    return {"locations": locations, "clusters": cluster_list}
+
+
+def stdlib_json(content: Any) -> bytes:
+    # Same settings as starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def time_encoder(encode: Callable[[], bytes], repeat: int) -> tuple[bytes, float]:
+    """Encoded bytes and best-of-`repeat` wall time in milliseconds."""
+    best = float("inf")
+    body = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode()
+        best = min(best, time.perf_counter() - start)
+    return body, best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="Story database to take markers from (default: synthetic markers)")
+    parser.add_argument("--markers", type=int, default=5000, help="Number of markers")
+    parser.add_argument("--clusters", type=int, default=200, help="Number of synthetic cluster headers")
+    parser.add_argument("--stories", type=int, default=1500, help="Distinct synthetic stories")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    if args.db:
+        payload = payload_from_db(args.db, args.markers)
+    else:
+        payload = synthetic_payload(args.markers, args.clusters, args.stories)
+
+    encoders: dict[str, Callable[[], bytes]] = {
+        "json (stdlib)": lambda: stdlib_json(payload),
+        "orjson": lambda: orjson.dumps(payload),
+        "compact + orjson": lambda: orjson.dumps(compact_payload(payload)),
+    }
+    if msgpack is not None:
+        encoders["msgpack"] = lambda: msgpack.packb(payload)
+        encoders["compact + msgpack"] = lambda: msgpack.packb(compact_payload(payload))
+
+    print(f"{len(payload['locations'])} markers, {len(payload['clusters'])} clusters")
+    print(f"{'format':<20} {'bytes':>10} {'gzip bytes':>11} {'ms':>8}")
+    for name, encode in encoders.items():
+        body, ms = time_encoder(encode, args.repeat)
+        print(f"{name:<20} {len(body):>10,} {len(gzip.compress(body, 6)):>11,} {ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
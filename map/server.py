@@ -1,28 +1,109 @@
 """FastAPI server for story map visualization."""
 
+import asyncio
+import hashlib
+import heapq
+import html
 import json
+import math
 import os
+import re
 import sqlite3
 import sys
-from contextlib import contextmanager
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
 from pathlib import Path
-from typing import Any, Generator
+from typing import Any
 
 import numpy as np
-from fastapi import FastAPI, HTTPException, Query
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sklearn.cluster import DBSCAN
 
+from abxgeo.autocomplete import AUTOCOMPLETE_KINDS, PrefixIndex
+from abxgeo.compact import compact_payload
+from abxgeo.compression import MIN_COMPRESS_BYTES, compress, negotiate
+from abxgeo.dates import format_date, format_date_range, window_days
+from abxgeo.heatmap import cell_centers, load_heatmap_level, mercator_fractions, slice_heatmap
+from abxgeo.logs import configure_logging
+from abxgeo.metrics import REGISTRY, ROWS_SCANNED, MetricsMiddleware
+from abxgeo.pyramid import cluster_summary, content_cluster_id
+from abxgeo.snapshot import (
+    FACET_SQL,
+    Facets,
+    LocationSnapshot,
+    db_version,
+    facet_filter,
+    index_path,
+    prune_indexes,
+    summary_preview,
+)
+from abxgeo.zoom import count_tiles_covering, tile_bounds, tiles_covering, zoom_band, zoom_to_epsilon
+
+try:
+    import msgpack
+except ImportError:
+    # MessagePack responses are optional; clients then get JSON
+    msgpack = None
+
+# Structured logs (LOG_FORMAT=json|text); DEBUG adds a line per request
+logger = configure_logging("map.server", os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "json"))
+
 # Database path - configurable via environment variable for easy swapping
 DB_PATH = Path(os.getenv("DB_PATH", Path(__file__).parent.parent / "full_book.sqlite"))
 
 # Validate environment on startup
 if not DB_PATH.exists():
-    print(f"ERROR: Database not found at {DB_PATH}", file=sys.stderr)
-    print(f"Please ensure the database exists before starting the server.", file=sys.stderr)
+    logger.critical(
+        "Database not found; please ensure it exists before starting the server", extra={"db_path": str(DB_PATH)}
+    )
     sys.exit(1)
 
-app = FastAPI(title="Story Map API", description="API for visualizing geocoded stories on a map", version="1.0.0")
+
+class OrjsonResponse(Response):
+    """JSON response serialized with orjson (NumPy scalars and arrays allowed)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the location snapshot before serving requests, then watch the database file for replacements."""
+    get_snapshot()
+    watcher = asyncio.create_task(watch_database()) if DB_WATCH_SECONDS > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+
+
+app = FastAPI(
+    title="Story Map API",
+    description="API for visualizing geocoded stories on a map",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=OrjsonResponse,
+)
+
+# Prometheus metrics (served at /metrics)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "map_request_duration_seconds", "Request latency by route", ("endpoint", "method", "status")
+)
+DB_OPENS = REGISTRY.counter("map_db_opens_total", "SQLite connections opened")
+SNAPSHOT_LOADS = REGISTRY.counter("map_snapshot_loads_total", "Location snapshot (re)loads")
+CLUSTERS_COMPUTED = REGISTRY.counter(
+    "map_clusters_computed_total", "Clusters produced for viewport responses", ("method",)
+)
+
+app.add_middleware(MetricsMiddleware, histogram=REQUEST_SECONDS)
 
 # Enable CORS for frontend dev server and production
 app.add_middleware(
@@ -39,177 +120,570 @@ app.add_middleware(
 )
 
 
-@contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """Get database connection with automatic cleanup."""
-    if not DB_PATH.exists():
-        raise HTTPException(status_code=500, detail=f"Database not found at {DB_PATH}")
+# Read-only connection tuning. DB_IMMUTABLE=1 skips file locking and change detection;
+# the database is swapped by replacing the file, which changes its db_version.
+DB_IMMUTABLE = os.getenv("DB_IMMUTABLE", "1") != "0"
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024)))
+DB_CACHED_STATEMENTS = 256
+
+# Pooled connections per worker thread (sqlite3 connections are not shared across threads),
+# one per database version: the served one, and the previous one while requests that
+# started before a swap finish
+_local = threading.local()
+DB_VERSIONS_PER_THREAD = 2
+
+# One shared connection per recently served version, opened when the version is loaded. After
+# the file is replaced it is the only way left to read the old version, so threads without
+# their own pooled connection to it fall back to this one (one request at a time).
+_pinned: OrderedDict[str, tuple[sqlite3.Connection, threading.Lock]] = OrderedDict()
+_pinned_lock = threading.Lock()
+
+
+def open_db(check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Open a tuned read-only connection and prepare the hot statements.
+
+    Args:
+        check_same_thread: False for connections handed between threads (streamed exports)
+    """
+    uri = f"{DB_PATH.resolve().as_uri()}?mode=ro"
+    if DB_IMMUTABLE:
+        uri += "&immutable=1"
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(uri, uri=True, cached_statements=DB_CACHED_STATEMENTS, check_same_thread=check_same_thread)
+    DB_OPENS.inc()
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+
+    # Compile the per-request queries once so requests hit the statement cache
+    for sql in WARM_STATEMENTS:
+        try:
+            conn.execute(sql, (None,) * sql.count("?")).fetchall()
+        except sqlite3.DatabaseError:
+            # Table or column missing in this database (e.g. no cluster pyramid),
+            # or a parameter that can't be NULL (e.g. LIMIT); the statement is compiled either way
+            pass
+    return conn
+
+
+def file_version() -> str | None:
+    """Version of the file at DB_PATH now, or None between unlink and rename of a replacement."""
     try:
-        yield conn
-    finally:
+        return db_version(DB_PATH)
+    except FileNotFoundError:
+        return None
+
+
+def open_version(version: str, check_same_thread: bool = True) -> sqlite3.Connection | None:
+    """Open a connection to a database version, or None when DB_PATH no longer holds it."""
+    if file_version() != version:
+        return None
+    conn = open_db(check_same_thread=check_same_thread)
+    # The file may have been replaced between the check and the open
+    if file_version() != version:
         conn.close()
+        return None
+    return conn
+
+
+def pin_version(version: str) -> None:
+    """Keep a shared connection to a version open so it stays readable after the file is replaced."""
+    with _pinned_lock:
+        if version in _pinned:
+            _pinned.move_to_end(version)
+            return
+    conn = open_version(version, check_same_thread=False)
+    if conn is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database replaced while loading",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    with _pinned_lock:
+        _pinned[version] = (conn, threading.Lock())
+        while len(_pinned) > DB_VERSIONS_PER_THREAD:
+            old_conn, lock = _pinned.popitem(last=False)[1]
+            with lock:
+                old_conn.close()
 
 
-def format_date(date_str: str) -> str:
+@contextmanager
+def get_db(version: str | None = None) -> Generator[sqlite3.Connection, None, None]:
     """
-    Format ISO date strings in human-friendly format.
-    Examples:
-      2020-01-23 -> Jan 23, 2020
-      2020-01 -> Jan 2020
-      2020 -> 2020
+    Get this thread's pooled read-only connection for a database version.
 
-    Handles edge cases like approximate dates (~), ranges (/), and unknown values (XXXX).
+    Args:
+        version: Version the caller's snapshot was loaded from (default: the served
+            version). A connection opened before the file was replaced keeps reading
+            the old file, so requests that started on the old snapshot stay consistent.
+    """
+    if version is None:
+        snapshot = _snapshot
+        try:
+            version = snapshot.version if snapshot is not None else db_version(DB_PATH)
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail=f"Database not found at {DB_PATH}")
+
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = OrderedDict()
+    key = (DB_PATH, version)
+    conn = conns.get(key)
+    if conn is None:
+        # Only pool connections that really read this version: during a pending swap
+        # DB_PATH already holds the next one
+        conn = open_version(version)
+        if conn is None:
+            with _pinned_lock:
+                pinned = _pinned.get(version)
+            if pinned is None:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Database version no longer available",
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+                )
+            with pinned[1]:
+                yield pinned[0]
+            return
+        conns[key] = conn
+        while len(conns) > DB_VERSIONS_PER_THREAD:
+            conns.popitem(last=False)[1].close()
+    conns.move_to_end(key)
+    yield conn
+
+
+# In-process columnar snapshot of all resolved locations (see abxgeo.snapshot)
+_snapshot: LocationSnapshot | None = None
+_snapshot_lock = threading.Lock()
+
+
+# Seconds between checks of the database file for a replacement (0 disables the watcher)
+DB_WATCH_SECONDS = float(os.getenv("DB_WATCH_SECONDS", "2"))
+
+# Tiles of zoom 0 to DB_WARM_ZOOM holding locations are computed before a new database is served
+DB_WARM_ZOOM = int(os.getenv("DB_WARM_ZOOM", "4"))
+
+# Directory of memory-mapped snapshots shared by all worker processes ("" = keep snapshots in process memory)
+SNAPSHOT_INDEX_DIR = os.getenv("SNAPSHOT_INDEX_DIR", os.path.join(tempfile.gettempdir(), "abx-map-index"))
+
+
+def load_snapshot(version: str) -> LocationSnapshot:
     """
-    if not date_str:
-        return ""
+    Get the snapshot of a database version, preferring the shared on-disk index.
 
-    # Return as-is for special formats that don't fit standard patterns
-    # (these are approximations or ranges that should be shown as-is)
-    if "/" in date_str or "~" in date_str or "XXXX" in date_str:
-        return date_str
+    The first worker to see a version reads it from SQLite and saves it under
+    SNAPSHOT_INDEX_DIR; every worker then maps the same files read-only, so the
+    snapshot's pages are shared through the OS page cache.
+    """
+    if not SNAPSHOT_INDEX_DIR:
+        with get_db(version) as conn:
+            return LocationSnapshot.load(conn, version)
 
+    path = index_path(SNAPSHOT_INDEX_DIR, version)
     try:
-        parts = date_str.split("-")
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-
-        if len(parts) == 3:  # YYYY-MM-DD
-            year, month, day = parts
-            month_name = month_names[int(month) - 1]
-            return f"{month_name} {int(day)}, {year}"
-        elif len(parts) == 2:  # YYYY-MM
-            year, month = parts
-            month_name = month_names[int(month) - 1]
-            return f"{month_name} {year}"
-        else:  # Just year or other format
-            return date_str
-    except (ValueError, IndexError):
-        # If we can't parse it, return as-is
-        return date_str
-
-
-def zoom_to_epsilon(zoom: int) -> float:
-    """
-    Map zoom level to DBSCAN epsilon (in radians for haversine metric).
-
-    Zoom levels (Google Maps):
-    1-4: World view (separate continents/countries)
-    5-7: Regional view (states/regions within country)
-    8-10: City view
-    11-13: Neighborhood view
-    14-16: Street/building view (tight clustering for overlapping markers)
-    17+: Individual markers
-
-    Returns epsilon in radians for haversine distance.
-    """
-    # Convert km to radians: radians = km / earth_radius_km
-    EARTH_RADIUS_KM = 6371
-
-    if zoom <= 3:
-        return 2000 / EARTH_RADIUS_KM  # ~2000km - cluster country-level locations
-    elif zoom <= 4:
-        return 500 / EARTH_RADIUS_KM  # ~500km - separate coasts/regions
-    elif zoom <= 7:
-        return 100 / EARTH_RADIUS_KM  # ~100km - regional clusters
-    elif zoom <= 9:
-        return 20 / EARTH_RADIUS_KM  # ~20km - city clusters
-    elif zoom <= 11:
-        return 5 / EARTH_RADIUS_KM  # ~5km - neighborhood clusters
-    elif zoom <= 13:
-        return 1 / EARTH_RADIUS_KM  # ~1km - block-level clusters
-    elif zoom <= 14:
-        return 0.1 / EARTH_RADIUS_KM  # ~100m - building clusters
-    elif zoom <= 15:
-        return 0.05 / EARTH_RADIUS_KM  # ~50m - tight building clusters
-    elif zoom <= 16:
-        return 0.01 / EARTH_RADIUS_KM  # ~10m - same-location clusters
-    else:
-        return 0.0  # No clustering, show individual markers
+        return LocationSnapshot.open(path)
+    except FileNotFoundError:
+        pass
+
+    with get_db(version) as conn:
+        snapshot = LocationSnapshot.load(conn, version)
+    try:
+        snapshot.save(path)
+        prune_indexes(SNAPSHOT_INDEX_DIR)
+        return LocationSnapshot.open(path)
+    except OSError:
+        logger.warning("Could not save the snapshot index; keeping it in memory", exc_info=True)
+        return snapshot
+
+
+def get_snapshot() -> LocationSnapshot:
+    """Get the served location snapshot, loading the database on first use."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    return swap_database()
+
+
+def swap_database() -> LocationSnapshot:
+    """
+    Load the database file as it is now, warm the caches for it, then serve it.
+
+    The cutover is a single reference swap: requests that already hold the old
+    snapshot finish on it (and on their pooled connections to the old file),
+    later requests get the new one with its low-zoom tiles already cached.
+    Blocks while loading; the watcher runs it on a background thread.
+    """
+    global _snapshot
+
+    with _snapshot_lock:
+        try:
+            version = db_version(DB_PATH)
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail=f"Database not found at {DB_PATH}")
+        previous = _snapshot
+        if previous is not None and previous.version == version:
+            return previous
+
+        pin_version(version)
+        snapshot = load_snapshot(version)
+        SNAPSHOT_LOADS.inc()
+        warmed = warm_caches(snapshot)
+        autocomplete_index(snapshot)
+        _snapshot = snapshot
+
+    logger.info(
+        "Serving database",
+        extra={
+            "db_version": version,
+            "previous_version": previous.version if previous is not None else None,
+            "locations": len(snapshot),
+            "warm_tiles": warmed,
+        },
+    )
+    return snapshot
+
+
+async def watch_database() -> None:
+    """
+    Poll the database file and swap in a replacement in the background.
+
+    A new version is loaded once it is unchanged for two consecutive checks, so a
+    file still being copied is not picked up half-written. A version that fails to
+    load is skipped (the previous one stays served) until the file changes again.
+    """
+    pending = failed = None
+    while True:
+        await asyncio.sleep(DB_WATCH_SECONDS)
+        try:
+            version = db_version(DB_PATH)
+        except FileNotFoundError:
+            # Between unlink and rename of a replacement
+            continue
+        if version == getattr(_snapshot, "version", None) or version == failed:
+            pending = None
+            continue
+        if version != pending:
+            pending = version
+            continue
+
+        try:
+            await asyncio.to_thread(swap_database)
+        except Exception:
+            failed = version
+            logger.exception("Database swap failed; still serving the previous version", extra={"db_version": version})
+        pending = None
+
+
+class BoundedExecutor:
+    """Thread pool for blocking work that rejects new work instead of queueing without limit."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int | None = None):
+        """
+        Args:
+            name: Thread name prefix
+            max_workers: Worker threads
+            max_queue: Jobs allowed to wait for a worker before run() answers 503 (None = unbounded)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.rejected = 0
+        self.timeouts = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue) if max_queue is not None else None
+
+    async def run(self, fn: Callable[..., Any], *args: Any, deadline: float) -> Any:
+        """
+        Run fn(*args) on the pool and await its result.
+
+        Args:
+            deadline: Event-loop time (see request_deadline) after which the request fails with a 504
+
+        Raises:
+            HTTPException: 503 with Retry-After when the pool is saturated, 504 when the deadline passes
+        """
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy ({self.name} pool saturated)",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            if self._slots is not None:
+                self._slots.release()
+            raise
+        if self._slots is not None:
+            future.add_done_callback(lambda _: self._slots.release())
+
+        timeout = deadline - asyncio.get_running_loop().time()
+        try:
+            # On timeout the job is cancelled if it has not started yet
+            return await asyncio.wait_for(asyncio.wrap_future(future), max(timeout, 0))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+
+    def stats(self) -> dict[str, Any]:
+        return {"max_workers": self.max_workers, "rejected": self.rejected, "timeouts": self.timeouts}
+
+
+# Seconds a request may take before it fails with a 504
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "10"))
+
+# Retry-After sent with 503s when the compute pool is saturated
+RETRY_AFTER_SECONDS = 1
+
+# SQLite reads (story details, pyramid lookups, snapshot reloads) and CPU-bound
+# clustering run on separate pools, so slow DBSCAN never blocks cheap lookups
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+io_executor = BoundedExecutor("map-io", int(os.getenv("IO_WORKERS", "16")))
+cpu_executor = BoundedExecutor("map-cpu", CPU_WORKERS, int(os.getenv("CPU_QUEUE", str(2 * CPU_WORKERS))))
+
+
+def request_deadline() -> float:
+    """Event-loop time by which the current request must finish."""
+    return asyncio.get_running_loop().time() + REQUEST_TIMEOUT_SECONDS
+
+
+async def current_snapshot(deadline: float) -> LocationSnapshot:
+    """Get the served location snapshot without blocking the event loop on the first load."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    # Requests arriving during the first load wait on it instead of each holding a map-io thread
+    return await snapshot_flight.do("snapshot", lambda: io_executor.run(get_snapshot, deadline=deadline), deadline)
+
+
+# Recently coalesced keys kept with their wait statistics, per SingleFlight
+SINGLEFLIGHT_KEY_STATS = int(os.getenv("SINGLEFLIGHT_KEY_STATS", "256"))
+
+COALESCED_WAIT_SECONDS = REGISTRY.histogram(
+    "map_coalesced_wait_seconds", "Time requests waited on an identical in-flight computation", ("flight",)
+)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical computations into one (event loop only, not thread-safe).
+
+    The first caller of a key starts the computation as a task; callers arriving
+    while it runs await the same task and get its result or exception. Nothing
+    is kept once it finishes: the callers' caches hold results. The task is
+    shielded, so a cancelled caller never cancels it for the others.
+    """
+
+    def __init__(self, name: str, max_key_stats: int = SINGLEFLIGHT_KEY_STATS):
+        self.name = name
+        self.max_key_stats = max_key_stats
+        self.leaders = 0
+        self.followers = 0
+        self._tasks: dict[Any, asyncio.Future] = {}
+        self._waiting: dict[Any, int] = {}
+        # key -> [followers, total wait seconds, longest wait seconds], most recently coalesced last
+        self._key_stats: OrderedDict[Any, list] = OrderedDict()
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]], deadline: float) -> Any:
+        """
+        Await fn() once for all concurrent callers with this key.
+
+        Args:
+            deadline: Event-loop time after which a caller waiting on another's computation gets a 504
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+            return await asyncio.shield(task)
+
+        self.followers += 1
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(deadline - start, 0))
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+        finally:
+            self._waited(key, loop.time() - start)
+
+    @property
+    def in_flight(self) -> int:
+        """Computations currently running."""
+        return len(self._tasks)
+
+    def _finished(self, key: Any, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller was cancelled
+            task.exception()
+
+    def _waited(self, key: Any, seconds: float) -> None:
+        COALESCED_WAIT_SECONDS.observe(seconds, flight=self.name)
+        self._waiting[key] -= 1
+        if not self._waiting[key]:
+            del self._waiting[key]
+        stats = self._key_stats.pop(key, None) or [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        self._key_stats[key] = stats
+        while len(self._key_stats) > self.max_key_stats:
+            self._key_stats.popitem(last=False)
+
+    def stats(self, top: int = 10) -> dict[str, Any]:
+        """Leader/follower counts, computations in flight and the keys that coalesced the most requests."""
+        hot = sorted(self._key_stats.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": self.in_flight,
+            "waiting": sum(self._waiting.values()),
+            "hot_keys": [
+                {
+                    "key": str(key),
+                    "followers": followers,
+                    "mean_wait_ms": round(total / followers * 1000, 2),
+                    "max_wait_ms": round(longest * 1000, 2),
+                }
+                for key, (followers, total, longest) in hot
+            ],
+        }
+
+
+# Identical concurrent requests share one computation: the first snapshot load,
+# viewport and tile bodies (keyed by ETag) and each compressed encoding of a body
+snapshot_flight = SingleFlight("snapshot")
+viewport_flight = SingleFlight("locations")
+tile_flight = SingleFlight("tiles")
+compress_flight = SingleFlight("compress")
+FLIGHTS = (snapshot_flight, viewport_flight, tile_flight, compress_flight)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Any, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any | None:
+        """Return the cached value (marking it recently used), or None."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
 
+# Per-tile /api/locations results keyed by (db_version, zoom, x, y, time window, facets, lod)
+locations_cache = LRUCache(int(os.getenv("LOCATIONS_CACHE_SIZE", "4096")))
 
-def cluster_locations(locations: list[dict], epsilon_radians: float, min_samples: int = 2) -> tuple[list[dict], list[dict]]:
+# Viewports covering more tiles than this at their zoom are computed directly, uncached
+MAX_VIEWPORT_TILES = 256
+
+# Highest zoom served by the viewport, tile and heatmap endpoints
+MAX_TILE_ZOOM = 22
+
+# Level-of-detail sampling: (markers kept per grid cell, grid cells per side), see LocationSnapshot.top_per_cell
+Lod = tuple[int, int]
+
+
+def cluster_rows(
+    snapshot: LocationSnapshot, indices: np.ndarray, epsilon_radians: float, min_samples: int = 2
+) -> tuple[list[np.ndarray], np.ndarray]:
     """
-    Cluster locations using DBSCAN.
+    Cluster snapshot rows using DBSCAN.
 
     Args:
-        locations: List of dicts with 'lat', 'lon', 'story_id', etc.
+        indices: Snapshot row indices
         epsilon_radians: DBSCAN epsilon in radians (for haversine metric)
         min_samples: Minimum samples per cluster
 
     Returns:
         Tuple of (clusters, noise_points):
-        - clusters: List of cluster dicts with center_lat, center_lon, stories, etc.
-        - noise_points: List of individual locations that didn't cluster
+        - clusters: Member row indices of each cluster, highest confidence first
+        - noise_points: Row indices of individual locations that didn't cluster, in the input order
     """
-    if not locations:
-        return [], []
-
-    # Extract coordinates
-    coords = np.array([[loc["lat"], loc["lon"]] for loc in locations])
+    if len(indices) == 0:
+        return [], indices
 
     # Run DBSCAN (using haversine metric with radians)
-    clustering = DBSCAN(eps=epsilon_radians, min_samples=min_samples, metric="haversine").fit(np.radians(coords))
-
-    # Group locations by cluster
-    clusters = {}
-    noise_points = []
-    for idx, label in enumerate(clustering.labels_):
-        if label == -1:  # Noise point - treat as individual location
-            noise_points.append(locations[idx])
-            continue
-        if label not in clusters:
-            clusters[label] = []
-        clusters[label].append(locations[idx])
-
-    # Build cluster objects
-    result = []
-    for label, cluster_locs in clusters.items():
-        # Calculate center
-        center_lat = np.mean([loc["lat"] for loc in cluster_locs])
-        center_lon = np.mean([loc["lon"] for loc in cluster_locs])
-
-        # Deduplicate stories by story_id (same story can have multiple locations)
-        seen_ids = set()
-        unique_stories = []
-        for loc in cluster_locs:
-            if loc["story_id"] not in seen_ids:
-                seen_ids.add(loc["story_id"])
-                unique_stories.append(loc)
-
-        # Extract date range efficiently (single pass)
-        # Filter out invalid/unknown dates (XXXX), then sort to get min/max chronologically
-        all_dates = [loc.get("date") for loc in unique_stories if loc.get("date")]
-        # Only include dates that don't have unknown components (XXXX)
-        valid_dates = sorted([d for d in all_dates if d and "XXXX" not in d])
-
-        if valid_dates:
-            min_date = valid_dates[0]
-            max_date = valid_dates[-1]
-
-            # Format date range in human-friendly way
-            if min_date == max_date:
-                date_range = format_date(min_date)
-            else:
-                date_range = f"{format_date(min_date)}–{format_date(max_date)}"
-            print(f"[DEBUG] Cluster date range: {date_range} (from {len(valid_dates)} dated stories out of {len(unique_stories)} total)")
-        else:
-            date_range = None
+    coords = np.radians(np.column_stack([snapshot.lat[indices], snapshot.lon[indices]]))
+    labels = DBSCAN(eps=epsilon_radians, min_samples=min_samples, metric="haversine").fit(coords).labels_
+
+    # Noise points (label -1) are treated as individual locations
+    clusters = [snapshot.by_rank(indices[labels == label]) for label in range(labels.max() + 1)]
+    return clusters, indices[labels == -1]
+
+
+def stories_header(snapshot: LocationSnapshot, members: np.ndarray) -> dict[str, Any]:
+    """Story count, date range and summary of a cluster's member rows."""
+    # Deduplicate stories by story_id (same story can have multiple locations)
+    stories = snapshot.first_per_story(members)
+    story_rows = snapshot.story_idx[stories].tolist()
+
+    return {
+        "story_count": len(stories),
+        "date_range": format_date_range([snapshot.parsed_dates[story] for story in story_rows]),
+        # Generate meaningful summary with location context
+        "summary": cluster_summary([snapshot.place_names[i] for i in stories.tolist()], len(stories)),
+    }
 
-        result.append({
-            "center_lat": float(center_lat),
-            "center_lon": float(center_lon),
-            "story_count": len(unique_stories),
-            "stories": unique_stories,
-            "date_range": date_range,
-        })
 
-    return result, noise_points
+def cluster_header(snapshot: LocationSnapshot, prefix: str, members: np.ndarray) -> dict[str, Any]:
+    """
+    Cluster header (ID, center, counts, date range, summary) for dynamically clustered rows.
+
+    The ID is content-derived (see content_cluster_id), so /api/cluster can find the
+    cluster again by recomputing it.
+    """
+    return {
+        "cluster_id": content_cluster_id(prefix, [snapshot.key(i) for i in members.tolist()]),
+        "center_lat": float(snapshot.lat[members].mean()),
+        "center_lon": float(snapshot.lon[members].mean()),
+        **stories_header(snapshot, members),
+    }
 
 
 @app.get("/")
-def root():
+async def root():
     """Root endpoint."""
     return {
         "name": "Story Map API",
@@ -217,128 +691,1092 @@ def root():
         "endpoints": {
             "/api/locations": "Get locations and clusters for current viewport",
             "/api/story/{story_id}": "Get full story details",
+            "/api/story/{story_id}/related": "Stories sharing the most people, companies, products and themes",
+            "/api/stories?ids=...": "Get full details for several stories",
+            "/api/search?q=...": "Full-text search over story titles and summaries",
             "/api/cluster/{cluster_id}": "Get cluster details with stories",
+            "/api/cluster/{cluster_id}/timeline": "Date histogram and paged stories of a cluster",
+            "/api/facets": "People, companies, product lines and themes to filter the map by",
+            "/api/autocomplete?q=...": "People, companies and product lines whose name starts with q",
+            "/api/heatmap?z=...&bbox=...": "Precomputed location density cells for a viewport",
+            "/api/export.geojson": "All resolved locations with story metadata as a GeoJSON FeatureCollection",
+            "/api/export.ndjson": "All resolved locations with story metadata, one GeoJSON Feature per line",
+            "/api/version": "Current database version (prefix of tile URLs)",
+            "/api/tiles/{version}/{z}/{x}/{y}": "Get clusters and markers for one Web-Mercator tile",
+            "/api/cache/stats": "Response cache hit/miss counters",
         },
     }
 
 
+# Pyramid nodes of one band inside a bbox, keyed by half_open (exclusive north/east edges)
+PYRAMID_LEVEL_SQL = {
+    half_open: f"""
+        SELECT cluster_id, center_lat, center_lon, point_count, story_count,
+               location_keys_json, summary, date_range
+        FROM location_clusters
+        WHERE kind = 'pyramid'
+          AND zoom_level = ?
+          AND center_lat >= ? AND center_lat {upper} ?
+          AND center_lon >= ? AND center_lon {upper} ?
+    """
+    for half_open, upper in ((False, "<="), (True, "<"))
+}
+
+
+# Resolved member rows of pyramid nodes, keyed by (db_version, cluster_id)
+pyramid_members_cache = LRUCache(int(os.getenv("PYRAMID_MEMBERS_CACHE_SIZE", "8192")))
+
+
+def pyramid_members(snapshot: LocationSnapshot, node: sqlite3.Row) -> np.ndarray:
+    """Snapshot rows of a pyramid node's member locations, highest confidence first (cached)."""
+    key = (snapshot.version, node["cluster_id"])
+    members = pyramid_members_cache.get(key)
+    if members is None:
+        rows = [snapshot.index_of(story_id, loc_idx) for story_id, loc_idx in json.loads(node["location_keys_json"])]
+        members = np.array([i for i in rows if i is not None], dtype=np.int64)
+        # Same order as snapshot.viewport results
+        members = members[np.argsort(snapshot.rank[members], kind="stable")]
+        pyramid_members_cache.put(key, members)
+    return members
+
+
+def fetch_pyramid_level(
+    conn: sqlite3.Connection,
+    snapshot: LocationSnapshot,
+    band_zoom: int,
+    sw_lat: float,
+    sw_lon: float,
+    ne_lat: float,
+    ne_lon: float,
+    half_open: bool = False,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+) -> tuple[list[dict], np.ndarray]:
+    """
+    Look up the precomputed pyramid nodes of one zoom band inside the viewport.
+
+    Clusters are returned as headers; unclustered markers are resolved from the
+    snapshot by (story_id, loc_idx). With a time window or facet filter, each node
+    keeps only the members whose story matches it (the cluster layout itself is
+    unchanged); nodes left with a single location become markers.
+
+    Returns:
+        Tuple of (cluster headers, marker rows) in the same shape as the dynamic clustering path.
+    """
+    nodes = conn.execute(PYRAMID_LEVEL_SQL[half_open], (band_zoom, sw_lat, ne_lat, sw_lon, ne_lon)).fetchall()
+    ROWS_SCANNED.inc(len(nodes), source="pyramid")
+
+    clusters = []
+    markers = []
+    for node in nodes:
+        if node["point_count"] > 1 and window is None and not facets:
+            clusters.append(pyramid_header(node))
+            continue
+
+        members = pyramid_members(snapshot, node)
+        members = snapshot.matching(members, window, facets)
+        if len(members) == 1:
+            markers.append(int(members[0]))
+        elif len(members) > 1:
+            clusters.append({**pyramid_header(node), **stories_header(snapshot, members)})
+
+    CLUSTERS_COMPUTED.inc(len(clusters), method="pyramid")
+    return clusters, np.array(markers, dtype=np.int64)
+
+
+def pyramid_header(node: sqlite3.Row) -> dict[str, Any]:
+    """Cluster header for a stored pyramid node."""
+    return {
+        "cluster_id": node["cluster_id"],
+        "center_lat": node["center_lat"],
+        "center_lon": node["center_lon"],
+        "story_count": node["story_count"],
+        "date_range": node["date_range"],
+        "summary": node["summary"],
+    }
+
+
+def dynamic_clusters(
+    snapshot: LocationSnapshot,
+    zoom: int,
+    sw_lat: float,
+    sw_lon: float,
+    ne_lat: float,
+    ne_lon: float,
+    half_open: bool = False,
+    cluster_prefix: str = "",
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+) -> tuple[list[tuple[dict, np.ndarray]], np.ndarray]:
+    """
+    Cluster the snapshot rows in a bounding box with zoom-appropriate DBSCAN.
+
+    Returns:
+        Tuple of ([(header, member rows), ...], noise rows).
+    """
+    # Viewport, precision, time and facet filters over the snapshot columns
+    # (country-level locations are hidden at regional view and closer)
+    indices = snapshot.viewport(
+        sw_lat, sw_lon, ne_lat, ne_lon, zoom, half_open=half_open, window=window, facets=facets
+    )
+    groups, noise = cluster_rows(snapshot, indices, zoom_to_epsilon(zoom), min_samples=2)
+    CLUSTERS_COMPUTED.inc(len(groups), method="dbscan")
+    return [(cluster_header(snapshot, cluster_prefix, members), members) for members in groups], noise
+
+
+def viewport_payload(
+    conn: sqlite3.Connection | None,
+    snapshot: LocationSnapshot,
+    zoom: int,
+    sw_lat: float,
+    sw_lon: float,
+    ne_lat: float,
+    ne_lon: float,
+    half_open: bool = False,
+    cluster_prefix: str = "",
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+    lod: Lod | None = None,
+) -> dict[str, list[dict]]:
+    """
+    Compute clusters and markers for a bounding box.
+
+    Args:
+        conn: Open connection for pyramid lookups (None when the snapshot has no pyramid)
+        half_open: Exclude the north and east edges (used for tiles)
+        cluster_prefix: Prefix for dynamic cluster IDs (identifies the tile or viewport)
+        window: Inclusive (first, last) day numbers; only stories dated within it are shown
+        facets: Only stories matching this facet filter are shown (see abxgeo.snapshot.facet_filter)
+        lod: (per_cell, grid): keep at most per_cell markers in each cell of a grid x grid
+            split of the bounding box, highest confidence first
+
+    Returns:
+        Dict with "clusters" and "locations" lists, and with lod a "hidden" list of
+        {"lat", "lon", "count"} for the markers left out of each cell.
+    """
+    band_zoom = zoom_band(zoom)
+
+    if band_zoom is not None and snapshot.has_pyramid:
+        clusters, markers = fetch_pyramid_level(
+            conn, snapshot, band_zoom, sw_lat, sw_lon, ne_lat, ne_lon, half_open=half_open, window=window, facets=facets
+        )
+    elif zoom_to_epsilon(zoom) <= 0:
+        # Show individual markers (zoom >= 17)
+        clusters = []
+        markers = snapshot.viewport(
+            sw_lat, sw_lon, ne_lat, ne_lon, zoom, half_open=half_open, window=window, facets=facets
+        )
+    else:
+        groups, markers = dynamic_clusters(
+            snapshot,
+            zoom,
+            sw_lat,
+            sw_lon,
+            ne_lat,
+            ne_lon,
+            half_open=half_open,
+            cluster_prefix=cluster_prefix,
+            window=window,
+            facets=facets,
+        )
+        clusters = [header for header, _ in groups]
+
+    if lod is None:
+        # Markers are listed most confident first (the viewport filter returns them by latitude)
+        return {"clusters": clusters, "locations": snapshot.locations(snapshot.by_rank(markers))}
+
+    per_cell, grid = lod
+    markers, hidden = snapshot.top_per_cell(markers, (sw_lat, sw_lon, ne_lat, ne_lon), grid, per_cell)
+    return {"clusters": clusters, "locations": snapshot.locations(markers), "hidden": hidden}
+
+
+def executor_for(snapshot: LocationSnapshot, zoom: int) -> BoundedExecutor:
+    """Pool for computing viewport payloads: DBSCAN is CPU-bound, pyramid lookups and markers are not."""
+    dynamic = zoom_band(zoom) is not None and not snapshot.has_pyramid
+    return cpu_executor if dynamic else io_executor
+
+
+def tile_viewport(zoom: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Bounds (south, west, north, east) a tile's payload is computed over (half-open)."""
+    # The outermost rows extend to the poles so nothing is dropped
+    south, west, north, east = tile_bounds(zoom, x, y)
+    if y == 0:
+        north = 90.0
+    if y == 2**zoom - 1:
+        south = -90.0
+    return south, west, north, east
+
+
+def compute_tiles(
+    snapshot: LocationSnapshot,
+    zoom: int,
+    tiles: list[tuple[int, int]],
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+    lod: Lod | None = None,
+) -> dict[tuple[int, int], dict]:
+    """Compute and cache payloads for tiles missing from the LRU cache."""
+    payloads = {}
+    with get_db(snapshot.version) if snapshot.has_pyramid else nullcontext() as conn:
+        for x, y in tiles:
+            bounds = tile_viewport(zoom, x, y)
+            payload = viewport_payload(
+                conn,
+                snapshot,
+                zoom,
+                *bounds,
+                half_open=True,
+                cluster_prefix=f"dynamic_{zoom}_{x}_{y}",
+                window=window,
+                facets=facets,
+                lod=lod,
+            )
+            locations_cache.put((snapshot.version, zoom, x, y, window, facets, lod), payload)
+            payloads[(x, y)] = payload
+    return payloads
+
+
+def viewport_cluster_prefix(zoom: int, sw_lat: float, sw_lon: float, ne_lat: float, ne_lon: float) -> str:
+    """Dynamic cluster ID prefix of an unsnapped viewport: its bounds, so find_dynamic_cluster can recompute it."""
+    return f"dynamic_{zoom}_{sw_lat!r}_{sw_lon!r}_{ne_lat!r}_{ne_lon!r}"
+
+
+def compute_viewport(
+    snapshot: LocationSnapshot,
+    zoom: int,
+    sw_lat: float,
+    sw_lon: float,
+    ne_lat: float,
+    ne_lon: float,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+    lod: Lod | None = None,
+) -> dict:
+    """Compute an unsnapped viewport payload (uncached)."""
+    with get_db(snapshot.version) if snapshot.has_pyramid else nullcontext() as conn:
+        return viewport_payload(
+            conn,
+            snapshot,
+            zoom,
+            sw_lat,
+            sw_lon,
+            ne_lat,
+            ne_lon,
+            cluster_prefix=viewport_cluster_prefix(zoom, sw_lat, sw_lon, ne_lat, ne_lon),
+            window=window,
+            facets=facets,
+            lod=lod,
+        )
+
+
+# Seconds a batch of missing tiles stays open for concurrent requests to add theirs
+TILE_BATCH_SECONDS = float(os.getenv("TILE_BATCH_MS", "5")) / 1000
+
+
+class TileBatcher:
+    """
+    Computes the missing tiles of concurrent requests as one worker-pool job (event loop only, not thread-safe).
+
+    A map view fetches each of its tiles from /api/tiles separately; computing
+    each as its own job would fill the bounded CPU queue with one viewport and
+    answer 503 to the rest of its tiles. Requests for the same zoom and filters
+    that arrive within TILE_BATCH_SECONDS share one compute_tiles call instead.
+    """
+
+    def __init__(self, batch_seconds: float = TILE_BATCH_SECONDS):
+        self.batch_seconds = batch_seconds
+        self.batches = 0
+        self.batched_tiles = 0
+        # (db_version, zoom, window, facets, lod) -> (tiles to compute, future of their payloads)
+        self._open: dict[Any, tuple[dict[tuple[int, int], None], asyncio.Future]] = {}
+
+    async def compute(
+        self,
+        snapshot: LocationSnapshot,
+        zoom: int,
+        tiles: list[tuple[int, int]],
+        deadline: float,
+        window: tuple[int, int] | None = None,
+        facets: Facets | None = None,
+        lod: Lod | None = None,
+    ) -> dict[tuple[int, int], dict]:
+        """Compute payloads for tiles, together with those of concurrent requests for the same zoom and filters."""
+        key = (snapshot.version, zoom, window, facets, lod)
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = ({}, asyncio.ensure_future(self._run(key, snapshot, deadline)))
+            # Mark the exception retrieved even if every caller was cancelled
+            batch[1].add_done_callback(lambda done: done.cancelled() or done.exception())
+        batch[0].update(dict.fromkeys(tiles))
+
+        timeout = deadline - asyncio.get_running_loop().time()
+        try:
+            payloads = await asyncio.wait_for(asyncio.shield(batch[1]), max(timeout, 0))
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+        return {tile: payloads[tile] for tile in tiles}
+
+    async def _run(self, key: Any, snapshot: LocationSnapshot, deadline: float) -> dict[tuple[int, int], dict]:
+        await asyncio.sleep(self.batch_seconds)
+        tiles, _ = self._open.pop(key)
+        _, zoom, window, facets, lod = key
+        self.batches += 1
+        self.batched_tiles += len(tiles)
+        executor = executor_for(snapshot, zoom)
+        return await executor.run(compute_tiles, snapshot, zoom, list(tiles), window, facets, lod, deadline=deadline)
+
+    def stats(self) -> dict[str, Any]:
+        return {"batches": self.batches, "tiles": self.batched_tiles, "open": len(self._open)}
+
+
+tile_batcher = TileBatcher()
+
+
+async def tile_payloads(
+    snapshot: LocationSnapshot,
+    zoom: int,
+    tiles: list[tuple[int, int]],
+    deadline: float,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+    lod: Lod | None = None,
+) -> list[dict[str, list[dict]]]:
+    """Get per-tile payloads from the LRU cache, computing any misses on a worker pool."""
+    payloads: dict[tuple[int, int], dict] = {}
+    missing = []
+    for x, y in tiles:
+        cached = locations_cache.get((snapshot.version, zoom, x, y, window, facets, lod))
+        if cached is None:
+            missing.append((x, y))
+        else:
+            payloads[(x, y)] = cached
+
+    if missing:
+        payloads.update(await tile_batcher.compute(snapshot, zoom, missing, deadline, window, facets, lod))
+
+    return [payloads[tile] for tile in tiles]
+
+
+# Level-of-detail settings warmed for a new database: none (/api/locations default) and
+# the ?lod=3 with the default grid that MapView requests its tiles with
+WARM_LODS: tuple[Lod | None, ...] = (None, (3, 8))
+
+
+def warm_caches(snapshot: LocationSnapshot) -> int:
+    """
+    Compute the unfiltered tiles of zoom 0..DB_WARM_ZOOM that hold locations; returns the tile count.
+
+    Each tile is computed for every WARM_LODS setting, and its JSON tile body is
+    serialized into body_cache, so the first map views after a swap are cache hits.
+    """
+    warmed = 0
+    fx, fy = mercator_fractions(snapshot.lat, snapshot.lon)
+    for zoom in range(DB_WARM_ZOOM + 1):
+        n = 2**zoom
+        # Occupied tiles as x * n + y codes, so they come out sorted by (x, y)
+        codes = np.unique(np.clip(fx * n, 0, n - 1).astype(np.int64) * n + np.clip(fy * n, 0, n - 1).astype(np.int64))
+        tiles = [(code // n, code % n) for code in codes.tolist()]
+        for lod in WARM_LODS:
+            payloads = compute_tiles(snapshot, zoom, tiles, lod=lod)
+            for (x, y), payload in payloads.items():
+                entry = encode_payload(tile_content(snapshot, zoom, x, y, payload), "full", False)
+                body_cache.put(tile_etag(snapshot.version, zoom, x, y, lod=lod), entry)
+        warmed += len(tiles)
+    return warmed
+
+
+def etag_for(version: str, *parts: Any) -> str:
+    """Strong ETag for a response derived from the DB version and the normalized request."""
+    digest = hashlib.sha1(repr((version, parts)).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches the ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # Compressed bodies carry the ETag with a coding suffix (see send_body); any encoding revalidates
+    tags = [CODING_ETAG_SUFFIX.sub('"', tag.strip().removeprefix("W/")) for tag in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+# Accept media types answered with MessagePack instead of JSON
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for MessagePack (and it is available)."""
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+# Viewport and tile responses are negotiated on both the media type and the content coding
+VARY = "Accept, Accept-Encoding"
+
+# Coding suffix of the ETag of a compressed body ("<etag>-br" / "<etag>-gzip")
+CODING_ETAG_SUFFIX = re.compile(r'-(br|gzip)"$')
+
+
+class EncodedBody:
+    """A serialized response body with its compressed variants, filled in as clients ask for them."""
+
+    __slots__ = ("media_type", "body", "encoded")
+
+    def __init__(self, media_type: str, body: bytes):
+        self.media_type = media_type
+        self.body = body
+        self.encoded: dict[str, bytes] = {}
+
+
+# Serialized /api/locations and tile responses keyed by ETag, with their br/gzip encodings,
+# so a hot response is serialized and compressed once instead of per request (and per proxy)
+body_cache = LRUCache(int(os.getenv("BODY_CACHE_SIZE", "2048")))
+
+BODIES_COMPRESSED = REGISTRY.counter(
+    "map_bodies_compressed_total", "Cached response bodies compressed, by content coding", ("coding",)
+)
+
+
+def encode_payload(content: dict[str, Any], response_format: str, as_msgpack: bool) -> EncodedBody:
+    """
+    Serialize a viewport payload in the requested format.
+
+    Args:
+        response_format: "full" (list of dicts) or "compact" (parallel arrays, see abxgeo.compact)
+        as_msgpack: MessagePack instead of JSON (see wants_msgpack)
+    """
+    if response_format == "compact":
+        content = compact_payload(content)
+    if as_msgpack:
+        return EncodedBody(MSGPACK_MEDIA_TYPES[0], msgpack.packb(content))
+    return EncodedBody(OrjsonResponse.media_type, orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+async def compress_body(entry: EncodedBody, coding: str, deadline: float) -> bytes:
+    """Compress a cached body on the CPU pool and keep the encoding on it."""
+    encoded = await cpu_executor.run(compress, entry.body, coding, deadline=deadline)
+    entry.encoded[coding] = encoded
+    BODIES_COMPRESSED.inc(coding=coding)
+    return encoded
+
+
+async def send_body(request: Request, entry: EncodedBody, headers: dict[str, str], deadline: float) -> Response:
+    """
+    Answer with a body in the best content coding the client accepts (br, gzip or none).
+
+    Each coding is compressed on the CPU pool the first time a client asks for it
+    (once for concurrent requests) and kept on the entry. Compressed responses get a per-coding ETag suffix and
+    Content-Encoding, which also stops nginx from gzipping them again.
+    """
+    headers = {**headers, "Vary": VARY}
+    coding = negotiate(request.headers.get("accept-encoding")) if len(entry.body) >= MIN_COMPRESS_BYTES else None
+    if coding is None:
+        return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+    encoded = entry.encoded.get(coding)
+    if encoded is None:
+        encoded = await compress_flight.do(
+            (headers["ETag"], coding), lambda: compress_body(entry, coding, deadline), deadline
+        )
+    headers["Content-Encoding"] = coding
+    headers["ETag"] = f'{headers["ETag"][:-1]}-{coding}"'
+    return Response(encoded, media_type=entry.media_type, headers=headers)
+
+
+# ?format= values of the viewport endpoints
+FORMAT_QUERY = Query("full", alias="format", pattern="^(full|compact)$", description="full or compact (columnar)")
+
+# Time window of the viewport endpoints: YYYY, YYYY-MM or YYYY-MM-DD, inclusive
+FROM_QUERY = Query(None, alias="from", description="Only stories dated on or after this (YYYY[-MM[-DD]])")
+TO_QUERY = Query(None, alias="to", description="Only stories dated on or before this (YYYY[-MM[-DD]])")
+
+
+# Level-of-detail sampling of the viewport endpoints: at most `lod` markers per cell
+# of a lod_grid x lod_grid split of each tile (or of an unsnapped viewport)
+LOD_QUERY = Query(None, alias="lod", ge=1, le=100, description="Keep at most this many markers per grid cell")
+LOD_GRID_QUERY = Query(8, ge=1, le=64, description="Grid cells per side of each tile for ?lod=")
+
+
+def parse_window(date_from: str | None, date_to: str | None) -> tuple[int, int] | None:
+    """Day-number window for the from/to query parameters (see abxgeo.dates.window_days)."""
+    try:
+        return window_days(date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def parse_facets(
+    person: list[str] | None = Query(None, description="Only stories involving this person (repeatable)"),
+    company: list[str] | None = Query(None, description="Only stories involving this company"),
+    product_line: list[str] | None = Query(None, description="Only stories about this product line"),
+    theme: list[str] | None = Query(None, description="Only stories with this theme"),
+) -> Facets | None:
+    """Facet filter for the person/company/product_line/theme query parameters (case-insensitive)."""
+    return facet_filter({"person": person, "company": company, "product_line": product_line, "theme": theme})
+
+
 @app.get("/api/locations")
-def get_locations(
-    zoom: int = Query(..., description="Current zoom level (1-18)"),
+async def get_locations(
+    request: Request,
+    zoom: int = Query(..., ge=0, le=MAX_TILE_ZOOM, description="Current zoom level (1-18)"),
     sw_lat: float = Query(..., description="Southwest latitude"),
     sw_lon: float = Query(..., description="Southwest longitude"),
     ne_lat: float = Query(..., description="Northeast latitude"),
     ne_lon: float = Query(..., description="Northeast longitude"),
-) -> dict[str, Any]:
+    response_format: str = FORMAT_QUERY,
+    date_from: str | None = FROM_QUERY,
+    date_to: str | None = TO_QUERY,
+    facets: Facets | None = Depends(parse_facets),
+    lod_per_cell: int | None = LOD_QUERY,
+    lod_grid: int = LOD_GRID_QUERY,
+) -> Any:
     """
     Get locations and clusters for current viewport and zoom level.
 
-    Dynamic clustering approach:
-    - Zoom 1-16: Cluster locations with zoom-appropriate epsilon
+    Clustering approach:
+    - Zoom 1-16: Precomputed cluster pyramid level for the zoom band (built by
+      `abxgeo cluster`), falling back to per-request DBSCAN with zoom-appropriate
+      epsilon when the pyramid has not been built
     - Zoom 17+: Return individual location markers
 
-    All filtered by viewport bounds.
-    """
-    response: dict[str, Any] = {"locations": [], "clusters": []}
+    The viewport is snapped to the slippy-map tiles covering it at this zoom;
+    each tile's result is cached per (db_version, zoom, tile). Responses carry an
+    ETag derived from the DB version, so unchanged repeat requests get a 304.
+
+    ?format=compact returns parallel arrays instead of dicts; clients sending
+    Accept: application/msgpack get MessagePack instead of JSON.
 
-    print(f"[DEBUG] /api/locations: zoom={zoom}, bounds=({sw_lat}, {sw_lon}) to ({ne_lat}, {ne_lon})")
+    ?from= and ?to= (YYYY, YYYY-MM or YYYY-MM-DD) keep only stories whose date
+    overlaps the window; undated stories are left out. With a pyramid the cluster
+    layout stays fixed and each cluster's counts shrink to the window.
 
+    ?person=, ?company=, ?product_line= and ?theme= filter the same way by story
+    facets (see /api/facets); repeat a parameter to match any of several values.
+
+    ?lod=K bounds the markers: each tile is split into a lod_grid x lod_grid grid
+    (default 8, i.e. 32px cells) and each cell keeps its K highest-confidence
+    markers; "hidden" lists the centroid and count of the rest per cell.
+    """
+    window = parse_window(date_from, date_to)
+    lod = (lod_per_cell, lod_grid) if lod_per_cell is not None else None
+    deadline = request_deadline()
     try:
-        with get_db() as conn:
-            # Determine minimum precision based on zoom level
-            # At world view (1-3): show all precisions
-            # At regional view and closer (4+): hide country-level (too vague)
-            precision_condition = "" if zoom <= 3 else "AND sl.resolved_precision != 'country'"
-
-            # Fetch all locations in viewport
-            query = f"""
-                SELECT
-                    sl.story_id,
-                    sl.place_name,
-                    sl.resolved_lat,
-                    sl.resolved_lon,
-                    sl.resolved_address,
-                    sl.resolved_precision,
-                    sl.resolution_confidence,
-                    s.title,
-                    s.summary,
-                    s.parsed_date
-                FROM story_locations sl
-                JOIN stories s ON sl.story_id = s.story_id
-                WHERE sl.resolved_lat IS NOT NULL
-                  AND sl.resolved_lat BETWEEN ? AND ?
-                  AND sl.resolved_lon BETWEEN ? AND ?
-                  {precision_condition}
-                ORDER BY sl.resolution_confidence DESC
-            """
-
-            cursor = conn.execute(query, (sw_lat, ne_lat, sw_lon, ne_lon))
-
-            locations = []
-            for row in cursor.fetchall():
-                # Truncate summary for popup
-                summary_preview = (row["summary"] or "")[:100]
-                if len(row["summary"] or "") > 100:
-                    summary_preview += "..."
-
-                locations.append({
-                    "story_id": row["story_id"],
-                    "place_name": row["place_name"],
-                    "lat": row["resolved_lat"],
-                    "lon": row["resolved_lon"],
-                    "address": row["resolved_address"],
-                    "precision": row["resolved_precision"],
-                    "confidence": row["resolution_confidence"],
-                    "title": row["title"],
-                    "summary_preview": summary_preview,
-                    "date": format_date(row["parsed_date"]) if row["parsed_date"] else None,
-                })
-
-            print(f"[DEBUG] Found {len(locations)} locations in viewport")
-
-            # Determine clustering strategy based on zoom
-            epsilon = zoom_to_epsilon(zoom)
-
-            if epsilon > 0:
-                # Cluster the locations
-                clusters, noise_points = cluster_locations(locations, epsilon, min_samples=2)
-                print(f"[DEBUG] Clustered into {len(clusters)} clusters and {len(noise_points)} individual markers at zoom {zoom} (epsilon={epsilon})")
-
-                # Add cluster IDs and format response
-                for i, cluster in enumerate(clusters):
-                    cluster["cluster_id"] = f"dynamic_{zoom}_{i}"
-
-                    # Generate meaningful summary with location context
-                    cluster_stories = cluster["stories"]
-                    location_names = set()
-                    for loc in cluster_stories[:5]:  # Sample first 5 for location names
-                        if loc.get("place_name"):
-                            # Extract city/area from place name
-                            parts = loc["place_name"].split(",")
-                            location_names.add(parts[0].strip())
-
-                    location_str = ", ".join(list(location_names)[:3]) if location_names else "this area"
-                    cluster["summary"] = f"{cluster['story_count']} stories in {location_str}"
-
-                response["clusters"] = clusters
-                response["locations"] = noise_points  # Include unclustered locations
-            else:
-                # Show individual markers (zoom >= 17)
-                print(f"[DEBUG] Showing {len(locations)} individual markers at zoom {zoom}")
-                response["locations"] = locations
+        snapshot = await current_snapshot(deadline)
+        # Count before listing: a world viewport at a high zoom covers millions of tiles
+        snapped = count_tiles_covering(sw_lat, sw_lon, ne_lat, ne_lon, zoom) <= MAX_VIEWPORT_TILES
+        tiles = tiles_covering(sw_lat, sw_lon, ne_lat, ne_lon, zoom) if snapped else None
+
+        etag = etag_for(
+            snapshot.version,
+            zoom,
+            tiles if snapped else (sw_lat, sw_lon, ne_lat, ne_lon),
+            window,
+            facets,
+            lod,
+            response_format,
+            wants_msgpack(request),
+        )
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={**headers, "Vary": VARY})
+
+        entry = body_cache.get(etag)
+        if entry is None:
+            # Clients opening the map at once send the same viewport: compute it once for all of them
+            viewport = (sw_lat, sw_lon, ne_lat, ne_lon)
+            entry = await viewport_flight.do(
+                etag,
+                lambda: viewport_body(
+                    request,
+                    snapshot,
+                    zoom,
+                    viewport,
+                    tiles,
+                    window,
+                    facets,
+                    lod,
+                    response_format,
+                    etag,
+                    deadline,
+                ),
+                deadline,
+            )
 
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
-        print(f"[ERROR] Database error: {e}")
+        logger.exception("Database error")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        print(f"[ERROR] Unexpected error: {e}")
+        logger.exception("Unexpected error")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-    return response
+    return await send_body(request, entry, headers, deadline)
+
+
+def marker_order(location: dict[str, Any]) -> tuple[float, str]:
+    """Sort key listing markers like the snapshot: highest confidence first, unknown last, ties by story."""
+    confidence = location["confidence"]
+    return (-confidence if confidence is not None else math.inf, location["story_id"])
+
+
+def merge_markers(tile_markers: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    """Join per-tile marker lists (each most confident first) into one list in that order."""
+    if len(tile_markers) == 1:
+        return tile_markers[0]
+    return list(heapq.merge(*tile_markers, key=marker_order))
+
+
+async def viewport_body(
+    request: Request,
+    snapshot: LocationSnapshot,
+    zoom: int,
+    viewport: tuple[float, float, float, float],
+    tiles: list[tuple[int, int]] | None,
+    window: tuple[int, int] | None,
+    facets: Facets | None,
+    lod: Lod | None,
+    response_format: str,
+    etag: str,
+    deadline: float,
+) -> EncodedBody:
+    """
+    Compute, serialize and cache an /api/locations body.
+
+    Args:
+        viewport: (sw_lat, sw_lon, ne_lat, ne_lon) as requested
+        tiles: Tiles the viewport snaps to, or None to compute the oversized viewport directly, uncached
+    """
+    if tiles is not None:
+        payloads = await tile_payloads(snapshot, zoom, tiles, deadline, window, facets, lod)
+    else:
+        executor = executor_for(snapshot, zoom)
+        payloads = [
+            await executor.run(compute_viewport, snapshot, zoom, *viewport, window, facets, lod, deadline=deadline)
+        ]
+
+    result: dict[str, Any] = {
+        "locations": merge_markers([payload["locations"] for payload in payloads]),
+        "clusters": [cluster for payload in payloads for cluster in payload["clusters"]],
+    }
+    if lod is not None:
+        result["hidden"] = [cell for payload in payloads for cell in payload["hidden"]]
+    logger.debug(
+        "Served viewport",
+        extra={
+            "zoom": zoom,
+            "bounds": list(viewport),
+            "window": window,
+            "facets": facets,
+            "tiles": len(tiles) if tiles is not None else None,
+            "clusters": len(result["clusters"]),
+            "markers": len(result["locations"]),
+        },
+    )
+
+    entry = encode_payload(result, response_format, wants_msgpack(request))
+    body_cache.put(etag, entry)
+    return entry
+
+
+@app.get("/api/version")
+async def get_version(response: Response) -> dict[str, str]:
+    """Current database version, used as the prefix of immutable tile URLs."""
+    response.headers["Cache-Control"] = "no-cache"
+    snapshot = await current_snapshot(request_deadline())
+    return {"db_version": snapshot.version}
+
+
+# Default and largest number of values listed per facet
+FACET_LIMIT = 50
+MAX_FACET_LIMIT = 1000
+
+
+@app.get("/api/facets")
+async def get_facets(
+    response: Response,
+    kind: str | None = Query(None, pattern=f"^({'|'.join(FACET_SQL)})$", description="Only list this facet"),
+    limit: int = Query(FACET_LIMIT, ge=1, le=MAX_FACET_LIMIT, description="Values per facet"),
+) -> dict[str, Any]:
+    """
+    Most frequent values of each story facet, for the map filter controls.
+
+    Returns:
+        {facet kind: [{"value", "story_count"}, ...]} ordered by story count; pass a
+        value as ?person=, ?company=, ?product_line= or ?theme= to filter the map.
+    """
+    snapshot = await current_snapshot(request_deadline())
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-DB-Version"] = snapshot.version
+    return {
+        facet: [
+            {"value": name, "story_count": count}
+            for name, count in sorted(values.values(), key=lambda item: (-item[1], item[0]))[:limit]
+        ]
+        for facet, values in snapshot.facet_values.items()
+        if kind is None or facet == kind
+    }
+
+
+# Name prefix indexes keyed by db_version: the served one and the previous one
+autocomplete_indexes = LRUCache(2)
+
+# Default and largest number of suggestions per request
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+
+def autocomplete_index(snapshot: LocationSnapshot) -> PrefixIndex:
+    """The name prefix index of a snapshot's database, built once per version (see swap_database)."""
+    index = autocomplete_indexes.get(snapshot.version)
+    if index is None:
+        with get_db(snapshot.version) as conn:
+            index = PrefixIndex.load(conn)
+        autocomplete_indexes.put(snapshot.version, index)
+    return index
+
+
+@app.get("/api/autocomplete")
+async def get_autocomplete(
+    response: Response,
+    q: str = Query(..., max_length=100, description="What the user has typed so far"),
+    kind: str | None = Query(None, pattern=f"^({'|'.join(AUTOCOMPLETE_KINDS)})$", description="Only suggest this kind"),
+    limit: int = Query(AUTOCOMPLETE_LIMIT, ge=1, le=MAX_AUTOCOMPLETE_LIMIT, description="Most suggestions"),
+) -> dict[str, Any]:
+    """
+    People, companies and product lines with a name (or a word in it) starting with q.
+
+    Answered from an in-memory sorted index of the names, built when a database
+    version is loaded, so a keystroke costs two binary searches and never touches
+    SQLite. Matching is case- and whitespace-insensitive.
+
+    Returns:
+        - query
+        - suggestions: [{"kind", "value", "story_count"}, ...], most stories first; pass
+          value as ?person=, ?company= or ?product_line= to filter the map
+    """
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+    index = autocomplete_indexes.get(snapshot.version)
+    if index is None:
+        # Normally built by swap_database; reading the names takes a SQLite scan
+        index = await io_executor.run(autocomplete_index, snapshot, deadline=deadline)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-DB-Version"] = snapshot.version
+    return {"query": q, "suggestions": index.search(q, limit, kind)}
+
+
+# Stored heatmap levels keyed by (db_version, zoom): (level zoom, resolution, cells, counts)
+heatmap_cache = LRUCache(int(os.getenv("HEATMAP_CACHE_SIZE", "64")))
+
+
+def parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    """(south, west, north, east) of a "west,south,east,north" query parameter."""
+    try:
+        west, south, east, north = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be west,south,east,north in degrees")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise HTTPException(status_code=422, detail=f"bbox out of range: {bbox}")
+    return south, west, north, east
+
+
+def fetch_heatmap_level(snapshot: LocationSnapshot, zoom: int) -> tuple[int, int, np.ndarray, np.ndarray] | None:
+    """Read a heatmap level from the database (None when no heatmap is stored)."""
+    try:
+        with get_db(snapshot.version) as conn:
+            level = load_heatmap_level(conn, zoom)
+    except sqlite3.OperationalError:
+        # No location_heatmap table in this database
+        return None
+    if level is not None:
+        heatmap_cache.put((snapshot.version, zoom), level)
+    return level
+
+
+@app.get("/api/heatmap")
+async def get_heatmap(
+    request: Request,
+    z: int = Query(..., ge=0, le=MAX_TILE_ZOOM, description="Current zoom level"),
+    bbox: str = Query(..., description="Viewport as west,south,east,north in degrees"),
+) -> Any:
+    """
+    Location density of the viewport from the precomputed heatmap (built by `abxgeo cluster`).
+
+    Each zoom level is a histogram with 16 x 16 cells per tile; zooms past the
+    finest stored level reuse it.
+
+    Returns:
+        - z, level (zoom of the stored histogram used), resolution (cells per world side)
+        - max_count: largest cell count in the viewport
+        - cells: {"lat": [...], "lon": [...], "count": [...]} cell centers and location counts
+    """
+    bounds = parse_bbox(bbox)
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+
+    etag = etag_for(snapshot.version, "heatmap", z, bounds)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    level = heatmap_cache.get((snapshot.version, z))
+    if level is None:
+        level = await io_executor.run(fetch_heatmap_level, snapshot, z, deadline=deadline)
+    if level is None:
+        raise HTTPException(status_code=404, detail="No heatmap in this database; run `abxgeo cluster --pyramid-only`")
+
+    level_zoom, resolution, cells, counts = level
+    cells, counts = slice_heatmap(resolution, cells, counts, bounds)
+    lat, lon = cell_centers(resolution, cells)
+    content = {
+        "z": z,
+        "level": level_zoom,
+        "resolution": resolution,
+        "max_count": int(counts.max()) if len(counts) else 0,
+        "cells": {"lat": lat, "lon": lon, "count": counts},
+    }
+    return OrjsonResponse(content, headers=headers)
+
+
+def tile_etag(
+    version: str,
+    z: int,
+    x: int,
+    y: int,
+    response_format: str = "full",
+    as_msgpack: bool = False,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+    lod: Lod | None = None,
+) -> str:
+    """ETag of a tile response, also its key in body_cache."""
+    variant = ("-compact" if response_format == "compact" else "") + ("-msgpack" if as_msgpack else "")
+    if window is not None:
+        variant += f"-{window[0]}-{window[1]}"
+    if facets:
+        variant += "-" + hashlib.sha1(repr(facets).encode()).hexdigest()[:12]
+    if lod is not None:
+        variant += f"-lod{lod[0]}x{lod[1]}"
+    return f'"{version}-{z}-{x}-{y}{variant}"'
+
+
+@app.get("/api/tiles/{version}/{z}/{x}/{y}")
+async def get_tile(
+    request: Request,
+    version: str,
+    z: int,
+    x: int,
+    y: int,
+    response_format: str = FORMAT_QUERY,
+    date_from: str | None = FROM_QUERY,
+    date_to: str | None = TO_QUERY,
+    facets: Facets | None = Depends(parse_facets),
+    lod_per_cell: int | None = LOD_QUERY,
+    lod_grid: int = LOD_GRID_QUERY,
+) -> Any:
+    """
+    Get clusters and markers for exactly one Web-Mercator tile.
+
+    The URL carries the DB version, so a tile response never changes and is
+    served with a long-lived immutable Cache-Control for nginx and browsers.
+    Requests for an outdated version redirect to the current one.
+    Supports ?format=compact, ?from=/?to=, facet filters, ?lod= and MessagePack like /api/locations.
+    """
+    if not (0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z):
+        raise HTTPException(status_code=404, detail=f"Tile {z}/{x}/{y} out of range")
+    window = parse_window(date_from, date_to)
+
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+    if version != snapshot.version:
+        query = f"?{request.url.query}" if request.url.query else ""
+        return RedirectResponse(
+            url=f"/api/tiles/{snapshot.version}/{z}/{x}/{y}{query}",
+            status_code=307,
+            headers={"Cache-Control": "no-store", "X-DB-Version": snapshot.version},
+        )
+
+    lod = (lod_per_cell, lod_grid) if lod_per_cell is not None else None
+    headers = {
+        "ETag": tile_etag(version, z, x, y, response_format, wants_msgpack(request), window, facets, lod),
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-DB-Version": version,
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers={**headers, "Vary": VARY})
+
+    etag = headers["ETag"]
+    entry = body_cache.get(etag)
+    if entry is None:
+        entry = await tile_flight.do(
+            etag,
+            lambda: tile_body(request, snapshot, z, x, y, window, facets, lod, response_format, etag, deadline),
+            deadline,
+        )
+    return await send_body(request, entry, headers, deadline)
+
+
+async def tile_body(
+    request: Request,
+    snapshot: LocationSnapshot,
+    z: int,
+    x: int,
+    y: int,
+    window: tuple[int, int] | None,
+    facets: Facets | None,
+    lod: Lod | None,
+    response_format: str,
+    etag: str,
+    deadline: float,
+) -> EncodedBody:
+    """Compute, serialize and cache a tile body."""
+    try:
+        (payload,) = await tile_payloads(snapshot, z, [(x, y)], deadline, window, facets, lod)
+    except sqlite3.Error as e:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    entry = encode_payload(tile_content(snapshot, z, x, y, payload), response_format, wants_msgpack(request))
+    body_cache.put(etag, entry)
+    return entry
+
+
+def tile_content(snapshot: LocationSnapshot, z: int, x: int, y: int, payload: dict) -> dict[str, Any]:
+    """Body of a tile response."""
+    return {"z": z, "x": x, "y": y, "db_version": snapshot.version, **payload}
+
+
+def cache_counts(counter: str) -> dict[tuple[str, ...], float]:
+    """Hit or miss counts of the response caches, for the metrics callbacks."""
+    caches = {
+        "locations": locations_cache,
+        "bodies": body_cache,
+        "timeline": timeline_cache,
+        "search": search_cache,
+        "heatmap": heatmap_cache,
+    }
+    return {(name,): cache.stats()[counter] for name, cache in caches.items()}
+
+
+REGISTRY.gauge("map_cache_hits_total", "Response cache hits", lambda: cache_counts("hits"), ("cache",), "counter")
+REGISTRY.gauge("map_cache_misses_total", "Response cache misses", lambda: cache_counts("misses"), ("cache",), "counter")
+REGISTRY.gauge("map_cache_hit_ratio", "Response cache hit ratio", lambda: cache_counts("hit_ratio"), ("cache",))
+REGISTRY.gauge(
+    "map_coalesced_requests_total",
+    "Requests that computed a response (leader) or shared an identical in-flight one (follower)",
+    lambda: {
+        (flight.name, role): getattr(flight, f"{role}s") for flight in FLIGHTS for role in ("leader", "follower")
+    },
+    ("flight", "role"),
+    "counter",
+)
+REGISTRY.gauge(
+    "map_coalesced_in_flight",
+    "Distinct computations currently shared by concurrent requests",
+    lambda: {(flight.name,): flight.in_flight for flight in FLIGHTS},
+    ("flight",),
+)
+REGISTRY.gauge(
+    "map_executor_rejected_total",
+    "Jobs rejected with 503 because the pool was saturated",
+    lambda: {(executor.name,): executor.rejected for executor in (io_executor, cpu_executor)},
+    ("pool",),
+    "counter",
+)
+REGISTRY.gauge(
+    "map_executor_timeouts_total",
+    "Requests that missed their deadline waiting on the pool",
+    lambda: {(executor.name,): executor.timeouts for executor in (io_executor, cpu_executor)},
+    ("pool",),
+    "counter",
+)
+
+
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """Prometheus metrics in the text exposition format."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats() -> dict[str, Any]:
+    """Hit/miss counters for the response caches, worker pool rejections/timeouts and request coalescing."""
+    return {
+        "locations": locations_cache.stats(),
+        "bodies": body_cache.stats(),
+        "timeline": timeline_cache.stats(),
+        "search": search_cache.stats(),
+        "heatmap": heatmap_cache.stats(),
+        "executors": {"io": io_executor.stats(), "cpu": cpu_executor.stats()},
+        "coalescing": {flight.name: flight.stats() for flight in FLIGHTS},
+        "tile_batches": tile_batcher.stats(),
+    }
+
+
+# Story detail in one statement: related rows are folded into JSON arrays,
+# ordered by their primary keys. {where} selects the stories.
+STORY_DETAIL_SQL = """
+    SELECT
+        s.story_id,
+        s.title,
+        s.summary,
+        s.parsed_date,
+        s.confidence,
+        (
+            SELECT json_group_array(json_object(
+                'place_name', place_name, 'lat', resolved_lat, 'lon', resolved_lon, 'address', resolved_address
+            ))
+            FROM (SELECT * FROM story_locations WHERE story_id = s.story_id ORDER BY loc_idx)
+        ) AS locations_json,
+        (
+            SELECT json_group_array(json_object(
+                'name', name, 'role', role_at_time, 'team', team, 'affiliation', affiliation
+            ))
+            FROM (SELECT * FROM story_people WHERE story_id = s.story_id ORDER BY person_idx)
+        ) AS people_json,
+        (
+            SELECT json_group_array(json_object('name', name, 'relationship', relationship))
+            FROM (SELECT * FROM story_companies WHERE story_id = s.story_id ORDER BY company_idx)
+        ) AS companies_json,
+        (
+            SELECT json_group_array(json_object(
+                'product_line', product_line, 'model', model, 'codename', codename,
+                'generation', generation, 'design_language', design_language
+            ))
+            FROM (SELECT * FROM story_products WHERE story_id = s.story_id ORDER BY product_idx)
+        ) AS products_json
+    FROM stories s
+    WHERE {where}
+"""
+STORY_SQL = STORY_DETAIL_SQL.format(where="s.story_id = ?")
+# Batch lookup takes the IDs as one JSON array, so a single prepared statement serves any batch size
+STORIES_SQL = STORY_DETAIL_SQL.format(where="s.story_id IN (SELECT value FROM json_each(?))")
+
+# Most stories returned by one /api/stories request
+MAX_BATCH_STORIES = 200
+
+# Statements prepared on every new pooled connection (see open_db)
+WARM_STATEMENTS = [*PYRAMID_LEVEL_SQL.values(), STORY_SQL, STORIES_SQL]
+
+
+def story_from_row(row: sqlite3.Row) -> dict[str, Any]:
+    """Story detail dict from a STORY_DETAIL_SQL row."""
+    return {
+        "story_id": row["story_id"],
+        "title": row["title"],
+        "summary": row["summary"],
+        "parsed_date": format_date(row["parsed_date"]) if row["parsed_date"] else None,
+        "confidence": row["confidence"],
+        "locations": json.loads(row["locations_json"]),
+        "people": json.loads(row["people_json"]),
+        "companies": json.loads(row["companies_json"]),
+        "products": json.loads(row["products_json"]),
+    }
 
 
 @app.get("/api/story/{story_id}")
-def get_story(story_id: str) -> dict[str, Any]:
+async def get_story(story_id: str) -> dict[str, Any]:
     """
     Get full story details.
 
@@ -349,142 +1787,643 @@ def get_story(story_id: str) -> dict[str, Any]:
         - companies: list of companies
         - products: list of products
     """
+    return await io_executor.run(fetch_story, story_id, deadline=request_deadline())
+
+
+def fetch_story(story_id: str) -> dict[str, Any]:
+    """Read one story with its locations, people, companies and products."""
     try:
         with get_db() as conn:
-            # Get story
-            cursor = conn.execute(
-                """
-                SELECT
-                    story_id,
-                    title,
-                    summary,
-                    parsed_date,
-                    confidence
-                FROM stories
-                WHERE story_id = ?
-            """,
-                (story_id,),
-            )
+            row = conn.execute(STORY_SQL, (story_id,)).fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail=f"Story {story_id} not found")
+        return story_from_row(row)
+
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        logger.exception("Unexpected error")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+# Precomputed neighbors of one story (built by `abxgeo related`), best first
+RELATED_SQL = """
+    SELECT n.neighbor_id, n.score, s.title, s.summary, s.parsed_date
+    FROM story_neighbors n
+    JOIN stories s ON s.story_id = n.neighbor_id
+    WHERE n.story_id = ?
+    ORDER BY n.rank
+    LIMIT ?
+"""
+WARM_STATEMENTS.append(RELATED_SQL)
 
-            story_row = cursor.fetchone()
-            if not story_row:
+STORY_EXISTS_SQL = "SELECT 1 FROM stories WHERE story_id = ?"
+WARM_STATEMENTS.append(STORY_EXISTS_SQL)
+
+# Default and largest number of related stories per request
+RELATED_LIMIT = 5
+MAX_RELATED_LIMIT = 50
+
+
+@app.get("/api/story/{story_id}/related")
+async def get_related_stories(
+    story_id: str,
+    limit: int = Query(RELATED_LIMIT, ge=1, le=MAX_RELATED_LIMIT, description="Most related stories to return"),
+) -> dict[str, Any]:
+    """
+    Stories most similar to this one by the people, companies, product lines and themes they share.
+
+    One indexed range read of the story_neighbors table built by `abxgeo related`.
+
+    Returns:
+        - story_id
+        - related: [{story_id, title, date, summary_preview, score (cosine similarity)}], best first
+    """
+    return await io_executor.run(fetch_related, story_id, limit, deadline=request_deadline())
+
+
+def fetch_related(story_id: str, limit: int) -> dict[str, Any]:
+    """Read a story's precomputed neighbors."""
+    try:
+        with get_db() as conn:
+            rows = conn.execute(RELATED_SQL, (story_id, limit)).fetchall()
+            if not rows and conn.execute(STORY_EXISTS_SQL, (story_id,)).fetchone() is None:
                 raise HTTPException(status_code=404, detail=f"Story {story_id} not found")
+    except sqlite3.OperationalError:
+        # No story_neighbors table in this database
+        raise HTTPException(status_code=404, detail="No related stories in this database; run `abxgeo related`")
+    except sqlite3.Error as e:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-            story = {
-                "story_id": story_row["story_id"],
-                "title": story_row["title"],
-                "summary": story_row["summary"],
-                "parsed_date": format_date(story_row["parsed_date"]) if story_row["parsed_date"] else None,
-                "confidence": story_row["confidence"],
+    return {
+        "story_id": story_id,
+        "related": [
+            {
+                "story_id": row["neighbor_id"],
+                "title": row["title"],
+                "date": format_date(row["parsed_date"]) if row["parsed_date"] else None,
+                "summary_preview": summary_preview(row["summary"]),
+                "score": round(row["score"], 4),
             }
+            for row in rows
+        ],
+    }
 
-            # Get locations
-            cursor = conn.execute(
-                """
-                SELECT place_name, resolved_lat, resolved_lon, resolved_address
-                FROM story_locations
-                WHERE story_id = ?
-                ORDER BY loc_idx
-            """,
-                (story_id,),
-            )
-            story["locations"] = [
-                {
-                    "place_name": row["place_name"],
-                    "lat": row["resolved_lat"],
-                    "lon": row["resolved_lon"],
-                    "address": row["resolved_address"],
-                }
-                for row in cursor.fetchall()
-            ]
-
-            # Get people
-            cursor = conn.execute(
-                """
-                SELECT name, role_at_time, team, affiliation
-                FROM story_people
-                WHERE story_id = ?
-                ORDER BY person_idx
-            """,
-                (story_id,),
-            )
-            story["people"] = [
-                {
-                    "name": row["name"],
-                    "role": row["role_at_time"],
-                    "team": row["team"],
-                    "affiliation": row["affiliation"],
-                }
-                for row in cursor.fetchall()
-            ]
-
-            # Get companies
-            cursor = conn.execute(
-                """
-                SELECT name, relationship
-                FROM story_companies
-                WHERE story_id = ?
-                ORDER BY company_idx
-            """,
-                (story_id,),
-            )
-            story["companies"] = [{"name": row["name"], "relationship": row["relationship"]} for row in cursor.fetchall()]
-
-            # Get products
-            cursor = conn.execute(
-                """
-                SELECT product_line, model, codename, generation, design_language
-                FROM story_products
-                WHERE story_id = ?
-                ORDER BY product_idx
-            """,
-                (story_id,),
-            )
-            story["products"] = [
-                {
-                    "product_line": row["product_line"],
-                    "model": row["model"],
-                    "codename": row["codename"],
-                    "generation": row["generation"],
-                    "design_language": row["design_language"],
-                }
-                for row in cursor.fetchall()
-            ]
 
-            return story
+@app.get("/api/stories")
+async def get_stories(ids: str = Query(..., description="Comma-separated story IDs")) -> dict[str, Any]:
+    """
+    Get full details for several stories in one request.
 
-    except HTTPException:
-        raise
+    Returns:
+        - stories: story details (same shape as /api/story/{story_id}) in request order
+        - missing: requested IDs that do not exist
+    """
+    story_ids = list(dict.fromkeys(story_id.strip() for story_id in ids.split(",") if story_id.strip()))
+    if not story_ids:
+        raise HTTPException(status_code=400, detail="No story IDs given")
+    if len(story_ids) > MAX_BATCH_STORIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_STORIES} stories per request")
+
+    return await io_executor.run(fetch_stories, story_ids, deadline=request_deadline())
+
+
+def fetch_stories(story_ids: list[str]) -> dict[str, Any]:
+    """Read several stories with one query, in the given order."""
+    try:
+        with get_db() as conn:
+            rows = conn.execute(STORIES_SQL, (json.dumps(story_ids),)).fetchall()
     except sqlite3.Error as e:
-        print(f"[ERROR] Database error: {e}")
+        logger.exception("Database error")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    except Exception as e:
-        print(f"[ERROR] Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    stories = {row["story_id"]: story_from_row(row) for row in rows}
+    return {
+        "stories": [stories[story_id] for story_id in story_ids if story_id in stories],
+        "missing": [story_id for story_id in story_ids if story_id not in stories],
+    }
+
+
+# One stored pyramid node
+PYRAMID_NODE_SQL = """
+    SELECT cluster_id, center_lat, center_lon, point_count, story_count,
+           location_keys_json, summary, date_range
+    FROM location_clusters
+    WHERE kind = 'pyramid' AND cluster_id = ?
+"""
+WARM_STATEMENTS.append(PYRAMID_NODE_SQL)
 
 
 @app.get("/api/cluster/{cluster_id}")
-def get_cluster(cluster_id: str) -> dict[str, Any]:
+async def get_cluster(
+    cluster_id: str,
+    date_from: str | None = FROM_QUERY,
+    date_to: str | None = TO_QUERY,
+    facets: Facets | None = Depends(parse_facets),
+) -> dict[str, Any]:
     """
     Get cluster details with all stories.
 
-    For dynamic clusters (cluster_id starts with "dynamic_"), returns the stories
-    that would be in that cluster. This is a lightweight endpoint since we don't
-    have pre-computed summaries.
+    Cluster IDs are content-derived, so the members are found again on demand:
+    - "pyr{band}_{hash}": stored pyramid node (built by `abxgeo cluster`)
+    - "dynamic_{zoom}_{x}_{y}_{hash}": per-tile DBSCAN cluster, recomputed for that tile
+    - "dynamic_{zoom}_{sw_lat}_{sw_lon}_{ne_lat}_{ne_lon}_{hash}": DBSCAN cluster of a viewport
+      too large to snap to tiles, recomputed for that viewport
+
+    Pass the same ?from=/?to= and facet filters as the /api/locations request the cluster came from.
 
     Returns:
         - cluster_id, center_lat, center_lon
-        - summary, date_range, story_count
-        - stories: list of stories with timeline data
+        - summary, date_range, story_count, point_count
+        - stories: list of stories with timeline data (one entry per story)
     """
-    # Dynamic clusters are identified by their ID format: "dynamic_{zoom}_{index}"
-    # For now, we'll return a simple error since the frontend passes the full stories
-    # in the cluster object already. This endpoint is mainly for future expansion.
+    window = parse_window(date_from, date_to)
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+    executor = cpu_executor if cluster_id.startswith("dynamic_") else io_executor
+    return await executor.run(fetch_cluster, snapshot, cluster_id, window, facets, deadline=deadline)
+
+
+def find_dynamic_cluster(
+    snapshot: LocationSnapshot,
+    cluster_id: str,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+) -> tuple[dict, np.ndarray] | None:
+    """
+    Recompute the tile or viewport a dynamic cluster came from and find it by ID.
 
-    raise HTTPException(
-        status_code=501,
-        detail="Dynamic cluster details not yet implemented. Cluster data is included in /api/locations response."
+    IDs are dynamic_{zoom}_{x}_{y}_{hash} for tile clusters and
+    dynamic_{zoom}_{sw_lat}_{sw_lon}_{ne_lat}_{ne_lon}_{hash} for clusters of
+    oversized, unsnapped viewports (see viewport_cluster_prefix).
+    """
+    parts = cluster_id.split("_")[1:-1]
+    try:
+        zoom = int(parts[0])
+        if len(parts) == 3:
+            x, y = int(parts[1]), int(parts[2])
+            bounds = None
+        elif len(parts) == 5:
+            bounds = tuple(float(part) for part in parts[1:])
+        else:
+            return None
+    except (IndexError, ValueError):
+        return None
+    if not 0 <= zoom <= MAX_TILE_ZOOM:
+        return None
+
+    if bounds is None:
+        if not (0 <= x < 2**zoom and 0 <= y < 2**zoom):
+            return None
+        bounds, half_open, prefix = tile_viewport(zoom, x, y), True, f"dynamic_{zoom}_{x}_{y}"
+    else:
+        sw_lat, sw_lon, ne_lat, ne_lon = bounds
+        if not (-90 <= sw_lat <= 90 and -90 <= ne_lat <= 90 and -180 <= sw_lon <= 180 and -180 <= ne_lon <= 180):
+            return None
+        half_open, prefix = False, viewport_cluster_prefix(zoom, *bounds)
+
+    clusters, _ = dynamic_clusters(
+        snapshot,
+        zoom,
+        *bounds,
+        half_open=half_open,
+        cluster_prefix=prefix,
+        window=window,
+        facets=facets,
     )
+    return next(((header, members) for header, members in clusters if header["cluster_id"] == cluster_id), None)
+
+
+def find_pyramid_cluster(
+    snapshot: LocationSnapshot,
+    cluster_id: str,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+) -> tuple[dict, np.ndarray] | None:
+    """Look up a stored pyramid node and resolve its members from the snapshot."""
+    with get_db(snapshot.version) as conn:
+        try:
+            node = conn.execute(PYRAMID_NODE_SQL, (cluster_id,)).fetchone()
+        except sqlite3.OperationalError:
+            # No pyramid in this database
+            return None
+    if node is None:
+        return None
+
+    members = pyramid_members(snapshot, node)
+    if window is None and not facets:
+        return pyramid_header(node), members
+
+    members = snapshot.matching(members, window, facets)
+    return {**pyramid_header(node), **stories_header(snapshot, members)}, members
+
+
+def find_cluster(
+    snapshot: LocationSnapshot,
+    cluster_id: str,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+) -> tuple[dict, np.ndarray]:
+    """
+    Header and member rows of a pyramid or dynamic cluster.
+
+    Raises:
+        HTTPException: 404 if no such cluster exists, 500 on database errors
+    """
+    try:
+        if cluster_id.startswith("dynamic_"):
+            found = find_dynamic_cluster(snapshot, cluster_id, window, facets)
+        else:
+            found = find_pyramid_cluster(snapshot, cluster_id, window, facets)
+    except sqlite3.Error as e:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Cluster {cluster_id} not found")
+    return found
+
+
+def fetch_cluster(
+    snapshot: LocationSnapshot,
+    cluster_id: str,
+    window: tuple[int, int] | None = None,
+    facets: Facets | None = None,
+) -> dict[str, Any]:
+    """Cluster header plus one marker per member story."""
+    header, members = find_cluster(snapshot, cluster_id, window, facets)
+    return {
+        **header,
+        "point_count": len(members),
+        "stories": snapshot.locations(snapshot.first_per_story(members)),
+    }
+
+
+# Default and largest page of story headers per /api/cluster/{id}/timeline request
+TIMELINE_PAGE = 20
+MAX_TIMELINE_PAGE = 200
+
+# Cluster timelines keyed by (db_version, cluster_id, time window, facets, bin):
+# (header, point_count, story rows by date, histogram), so paging never re-finds the cluster
+timeline_cache = LRUCache(int(os.getenv("TIMELINE_CACHE_SIZE", "256")))
+
+
+@app.get("/api/cluster/{cluster_id}/timeline")
+async def get_cluster_timeline(
+    cluster_id: str,
+    unit: str = Query("year", alias="bin", pattern="^(year|month)$", description="Histogram bin: year or month"),
+    offset: int = Query(0, ge=0, description="Stories to skip (from next_offset of the previous page)"),
+    limit: int = Query(TIMELINE_PAGE, ge=1, le=MAX_TIMELINE_PAGE, description="Stories per page"),
+    date_from: str | None = FROM_QUERY,
+    date_to: str | None = TO_QUERY,
+    facets: Facets | None = Depends(parse_facets),
+) -> dict[str, Any]:
+    """
+    Date histogram of a cluster's stories plus one page of story headers.
+
+    The histogram covers every story of the cluster, so a timeline can be drawn
+    from the first response; the story headers (same shape as /api/cluster
+    stories) come in date order, undated stories last, and are paged with
+    ?offset=. Accepts the same ?from=/?to= and facet filters as /api/cluster.
+
+    Returns:
+        - cluster_id, center_lat, center_lon, summary, date_range, story_count, point_count
+        - dated_count: stories with a known date
+        - histogram: {"bin", "start" ("YYYY" or "YYYY-MM"), "counts": stories per period
+          from start to the last dated story}, or null when no story is dated
+        - stories: this page of story headers
+        - next_offset: offset of the next page, or null after the last one
+    """
+    window = parse_window(date_from, date_to)
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+
+    key = (snapshot.version, cluster_id, window, facets, unit)
+    timeline = timeline_cache.get(key)
+    if timeline is None:
+        executor = cpu_executor if cluster_id.startswith("dynamic_") else io_executor
+        timeline = await executor.run(cluster_timeline, snapshot, cluster_id, window, facets, unit, deadline=deadline)
+        timeline_cache.put(key, timeline)
+
+    header, point_count, stories, histogram = timeline
+    page = stories[offset : offset + limit]
+    return {
+        **header,
+        "point_count": point_count,
+        "dated_count": sum(histogram["counts"]) if histogram else 0,
+        "histogram": histogram,
+        "stories": snapshot.locations(page),
+        "next_offset": offset + limit if offset + limit < len(stories) else None,
+    }
+
+
+def cluster_timeline(
+    snapshot: LocationSnapshot,
+    cluster_id: str,
+    window: tuple[int, int] | None,
+    facets: Facets | None,
+    unit: str,
+) -> tuple[dict, int, np.ndarray, dict[str, Any] | None]:
+    """Header, point count, one row per member story in date order, and the date histogram of a cluster."""
+    header, members = find_cluster(snapshot, cluster_id, window, facets)
+    stories = snapshot.by_date(snapshot.first_per_story(members))
+    histogram = snapshot.date_histogram(stories, unit)
+    if histogram is not None:
+        histogram = {"bin": unit, "start": histogram[0], "counts": histogram[1]}
+    return header, len(members), stories, histogram
+
+
+# Ranked full-text matches. bm25 weights per story_fts column (story_id, title, summary):
+# title hits count more than summary hits. Highlights are delimited by \x02/\x03 and
+# turned into <mark> tags after HTML-escaping the text.
+SEARCH_SQL = """
+    SELECT
+        s.story_id,
+        s.title,
+        s.parsed_date,
+        highlight(story_fts, 1, char(2), char(3)) AS title_highlight,
+        snippet(story_fts, 2, char(2), char(3), '…', 16) AS snippet,
+        bm25(story_fts, 0.0, 10.0, 1.0) AS score
+    FROM story_fts
+    JOIN stories s ON s.rowid = story_fts.rowid
+    WHERE story_fts MATCH ?
+    ORDER BY score
+    LIMIT ?
+"""
+WARM_STATEMENTS.append(SEARCH_SQL)
+
+# Default and largest number of stories per search
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Most story locations returned across all results of one search
+MAX_SEARCH_LOCATIONS = 200
+
+# Longest accepted query string
+MAX_QUERY_CHARS = 200
+
+# Search results keyed by (db_version, match expression, limit)
+search_cache = LRUCache(int(os.getenv("SEARCH_CACHE_SIZE", "1024")))
+
+
+def match_expression(query: str) -> str | None:
+    """
+    FTS5 MATCH expression for a user query: every word must match as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the query are taken
+    literally. Returns None when the query has no words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def marked(text: str | None) -> str | None:
+    """HTML-escape an FTS5 highlight, turning its \x02/\x03 delimiters into <mark> tags."""
+    if text is None:
+        return None
+    return html.escape(text).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+@app.get("/api/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_CHARS, description="Search words (prefix match)"),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT, description="Most stories returned"),
+) -> dict[str, Any]:
+    """
+    Full-text search over story titles and summaries (story_fts).
+
+    Every word of the query must match a word prefix ("foxc assem" finds
+    "Foxconn assembly"). Stories are ranked by bm25, title matches first.
+
+    Returns:
+        - query: the query as received
+        - results: stories with title, date, title_highlight and snippet (HTML with
+          <mark> around matches), score (lower is better) and their resolved locations
+        - bounds: [sw_lat, sw_lon, ne_lat, ne_lon] around all returned locations, or null
+        - truncated: whether locations were left out to stay under the location cap
+    """
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+    expression = match_expression(q)
+    if expression is None:
+        return {"query": q, "results": [], "bounds": None, "truncated": False}
+
+    key = (snapshot.version, expression, limit)
+    result = search_cache.get(key)
+    if result is None:
+        result = await io_executor.run(fetch_search, snapshot, expression, limit, deadline=deadline)
+        search_cache.put(key, result)
+    return {"query": q, **result}
+
+
+def fetch_search(snapshot: LocationSnapshot, expression: str, limit: int) -> dict[str, Any]:
+    """Run a search and attach each story's locations from the snapshot."""
+    try:
+        with get_db(snapshot.version) as conn:
+            rows = conn.execute(SEARCH_SQL, (expression, limit)).fetchall()
+    except sqlite3.Error as e:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    results = []
+    remaining = MAX_SEARCH_LOCATIONS
+    truncated = False
+    lats: list[float] = []
+    lons: list[float] = []
+    for row in rows:
+        story_rows = snapshot.story_rows(row["story_id"])
+        if len(story_rows) > remaining:
+            truncated = True
+            story_rows = story_rows[:remaining]
+        remaining -= len(story_rows)
+        lats.extend(snapshot.lat[story_rows].tolist())
+        lons.extend(snapshot.lon[story_rows].tolist())
+        results.append(
+            {
+                "story_id": row["story_id"],
+                "title": row["title"],
+                "date": format_date(row["parsed_date"]) if row["parsed_date"] else None,
+                "title_highlight": marked(row["title_highlight"]),
+                "snippet": marked(row["snippet"]),
+                "score": row["score"],
+                "locations": [
+                    {
+                        "place_name": snapshot.place_names[i],
+                        "lat": float(snapshot.lat[i]),
+                        "lon": float(snapshot.lon[i]),
+                        "precision": snapshot.precision_names[snapshot.precision[i]],
+                    }
+                    for i in story_rows.tolist()
+                ],
+            }
+        )
+
+    bounds = [min(lats), min(lons), max(lats), max(lons)] if lats else None
+    return {"results": results, "bounds": bounds, "truncated": truncated}
+
+
+# Every resolved location with its story, in primary-key order: SQLite walks the
+# story_locations key index and looks up each story, so rows come back without a sort
+EXPORT_SQL = """
+    SELECT
+        sl.story_id,
+        sl.loc_idx,
+        sl.place_name,
+        sl.resolved_address,
+        sl.resolved_lat,
+        sl.resolved_lon,
+        sl.resolved_precision,
+        sl.resolution_confidence,
+        s.title,
+        s.summary,
+        s.parsed_date,
+        CASE WHEN json_valid(s.themes_json) THEN s.themes_json ELSE '[]' END AS themes_json
+    FROM story_locations sl
+    JOIN stories s ON s.story_id = sl.story_id
+    WHERE sl.resolved_lat IS NOT NULL AND sl.resolved_lon IS NOT NULL
+    ORDER BY sl.story_id, sl.loc_idx
+"""
+
+# Rows fetched from the export cursor (and encoded) per streamed chunk
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+# Media type and framing of each export format: (media type, prefix, feature separator, suffix)
+EXPORT_FORMATS = {
+    "geojson": ("application/geo+json", b'{"type":"FeatureCollection","features":[\n', b",\n", b"\n]}\n"),
+    "ndjson": ("application/x-ndjson", b"", b"\n", b"\n"),
+}
+
+
+def export_feature(row: sqlite3.Row) -> bytes:
+    """GeoJSON Feature of one EXPORT_SQL row."""
+    return orjson.dumps(
+        {
+            "type": "Feature",
+            "id": f"{row['story_id']}/{row['loc_idx']}",
+            "geometry": {"type": "Point", "coordinates": [row["resolved_lon"], row["resolved_lat"]]},
+            "properties": {
+                "story_id": row["story_id"],
+                "loc_idx": row["loc_idx"],
+                "place_name": row["place_name"],
+                "address": row["resolved_address"],
+                "precision": row["resolved_precision"],
+                "confidence": row["resolution_confidence"],
+                "title": row["title"],
+                "summary": row["summary"],
+                "date": format_date(row["parsed_date"]) if row["parsed_date"] else None,
+                "parsed_date": row["parsed_date"],
+                "themes": orjson.loads(row["themes_json"]) if row["themes_json"] else [],
+            },
+        }
+    )
+
+
+def open_export_cursor(version: str) -> sqlite3.Cursor:
+    """
+    Open a dedicated connection to a database version and start the export query on it.
+
+    Raises:
+        HTTPException: 503 with Retry-After when the file has been replaced by a newer version
+    """
+    conn = open_version(version, check_same_thread=False)
+    if conn is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database replaced since the request started",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    try:
+        return conn.execute(EXPORT_SQL)
+    except BaseException:
+        conn.close()
+        raise
+
+
+def export_chunks(cursor: sqlite3.Cursor, fmt: str) -> Generator[bytes, None, None]:
+    """
+    Encode the export cursor EXPORT_BATCH_ROWS rows at a time.
+
+    Starlette pulls each chunk on its own threadpool, possibly on different
+    threads, so the cursor's connection is opened with check_same_thread=False;
+    chunks are pulled one after another, never concurrently. At most one batch
+    is in memory, and a slow client holds no map-io worker between chunks.
+    """
+    _, prefix, separator, suffix = EXPORT_FORMATS[fmt]
+    try:
+        chunk = prefix
+        first = True
+        while rows := cursor.fetchmany(EXPORT_BATCH_ROWS):
+            features = separator.join(export_feature(row) for row in rows)
+            chunk += features if first else separator + features
+            first = False
+            yield chunk
+            chunk = b""
+        if fmt == "geojson" or not first:
+            yield chunk + suffix
+    except Exception:
+        # Headers are already sent; all that is left is to cut the stream short
+        logger.exception("Export failed mid-stream", extra={"format": fmt})
+        raise
+    finally:
+        cursor.connection.close()
+
+
+class ExportResponse(StreamingResponse):
+    """Streamed export that closes its cursor's connection however the response ends."""
+
+    def __init__(self, cursor: sqlite3.Cursor, fmt: str, **kwargs: Any):
+        super().__init__(export_chunks(cursor, fmt), media_type=EXPORT_FORMATS[fmt][0], **kwargs)
+        self.cursor = cursor
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        # A client that disconnects before the first chunk never starts export_chunks
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cursor.connection.close()
+
+
+@app.get("/api/export.{fmt}")
+async def export_locations(request: Request, fmt: str) -> Any:
+    """
+    Stream every resolved location with its story metadata.
+
+    Formats:
+        - geojson: one FeatureCollection (application/geo+json)
+        - ndjson: one GeoJSON Feature per line (application/x-ndjson)
+
+    Each Feature is a Point with story_id, loc_idx, place_name, address, precision,
+    confidence, title, summary, date, parsed_date and themes as properties. Rows are
+    read from a server-side cursor and encoded in batches, so the full list is never
+    built in memory. The ETag is the database version: unchanged exports answer 304.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown export format {fmt!r} (use geojson or ndjson)")
+
+    deadline = request_deadline()
+    snapshot = await current_snapshot(deadline)
+    etag = etag_for(snapshot.version, "export", fmt)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Content-Disposition": f'inline; filename="locations-{snapshot.version}.{fmt}"',
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    # Opening and starting the query on the io pool surfaces errors as a proper status, before streaming starts
+    try:
+        cursor = await io_executor.run(open_export_cursor, snapshot.version, deadline=deadline)
+    except sqlite3.Error as e:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return ExportResponse(cursor, fmt, headers=headers)
 
 
 if __name__ == "__main__":
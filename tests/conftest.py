@@ -0,0 +1,99 @@
+"""Shared fixtures: a small geocoded story database for map and cluster tests."""
+
+import importlib
+import json
+import os
+
+import pytest
+
+from abx.db import init_db
+
+# (story_id, title, parsed_date, themes, [(place_name, lat, lon, precision, confidence), ...])
+SAMPLE_STORIES = [
+    ("s1", "Apple moves to Infinite Loop", "1993-04", ["campus"], [
+        ("One Infinite Loop, Cupertino", 37.3318, -122.0312, "address", 0.95),
+    ]),
+    ("s2", "Mac team offsite", "1984-01-24", ["design"], [
+        ("Infinite Loop campus, Cupertino", 37.3319, -122.0311, "address", 0.9),
+    ]),
+    ("s3", "iPhone unveiled", "2007-01-09", ["launch"], [
+        ("Cupertino", 37.3230, -122.0322, "city", 0.8),
+    ]),
+    ("s4", "Foxconn ramps up", "2010-05", ["manufacturing", "labor"], [
+        ("Longhua, Shenzhen", 22.6567, 114.0290, "address", 0.85),
+    ]),
+    ("s5", "Shenzhen suppliers", "2012", ["manufacturing"], [
+        ("Shenzhen", 22.5431, 114.0579, "city", 0.7),
+    ]),
+    ("s6", "China strategy", "2016-XX", ["strategy"], [
+        ("China", 35.8617, 104.1954, "country", 0.5),
+    ]),
+    ("s7", "Supply chain tour", "2009-06-01", ["manufacturing"], [
+        ("Zhengzhou plant", 34.7466, 113.6253, "address", 0.88),
+        ("One Infinite Loop, Cupertino", 37.3318, -122.0312, "address", 0.6),
+    ]),
+]
+
+
+def _populate(conn):
+    conn.execute("INSERT INTO books (book_id, sha256, title) VALUES ('book_1', 'sha', 'Apple in China')")
+    conn.execute("INSERT INTO chapters (chapter_id, book_id, idx, title) VALUES ('ch_1', 'book_1', 0, 'One')")
+    for story_id, title, parsed_date, themes, locations in SAMPLE_STORIES:
+        conn.execute(
+            """
+            INSERT INTO stories (story_id, chapter_id, story_json, title, summary, themes_json, confidence, parsed_date)
+            VALUES (?, 'ch_1', '{}', ?, ?, ?, 0.9, ?)
+            """,
+            (story_id, title, f"{title} - a story about {', '.join(themes)}. " * 5, json.dumps(themes), parsed_date),
+        )
+        for loc_idx, (place_name, lat, lon, precision, confidence) in enumerate(locations):
+            conn.execute(
+                """
+                INSERT INTO story_locations (
+                    story_id, loc_idx, place_name, resolved_address, resolved_lat, resolved_lon,
+                    resolved_precision, resolution_confidence
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (story_id, loc_idx, place_name, place_name, lat, lon, precision, confidence),
+            )
+    conn.execute(
+        "INSERT INTO story_people (story_id, person_idx, name, role_at_time) VALUES ('s4', 0, 'Terry Gou', 'Founder')"
+    )
+    conn.execute(
+        "INSERT INTO story_people (story_id, person_idx, name, role_at_time) VALUES ('s7', 0, 'Tim Cook', 'COO')"
+    )
+    conn.executemany(
+        "INSERT INTO story_companies (story_id, company_idx, name, relationship) VALUES (?, 0, 'Foxconn', 'supplier')",
+        [("s4",), ("s7",)],
+    )
+    conn.execute(
+        "INSERT INTO story_products (story_id, product_idx, product_line, model) VALUES ('s3', 0, 'iPhone', 'iPhone')"
+    )
+    conn.commit()
+
+
+@pytest.fixture(scope="session")
+def sample_db(tmp_path_factory):
+    """Path to a populated story database (without a cluster pyramid)."""
+    db_path = tmp_path_factory.mktemp("db") / "sample.sqlite"
+    conn = init_db(db_path)
+    _populate(conn)
+    conn.close()
+    return db_path
+
+
+@pytest.fixture(scope="session")
+def server(sample_db, tmp_path_factory):
+    """The map server module, bound to the sample database."""
+    pytest.importorskip("fastapi")
+    os.environ["DB_PATH"] = str(sample_db)
+    os.environ["SNAPSHOT_INDEX_DIR"] = str(tmp_path_factory.mktemp("index"))
+    return importlib.import_module("map.server")
+
+
+@pytest.fixture
+def client(server):
+    """HTTP test client for the map API."""
+    from fastapi.testclient import TestClient
+
+    return TestClient(server.app)
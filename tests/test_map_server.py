@@ -0,0 +1,558 @@
+"""Tests for the story map API."""
+
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from abxgeo.autocomplete import PrefixIndex
+from abxgeo.compact import expand_payload
+
+WORLD = {"sw_lat": -85, "sw_lon": -180, "ne_lat": 85, "ne_lon": 180}
+CUPERTINO = {"sw_lat": 37.3, "sw_lon": -122.1, "ne_lat": 37.4, "ne_lon": -122.0}
+
+
+def test_locations_without_pyramid_cluster_dynamically(client):
+    """Databases without a pyramid fall back to per-request DBSCAN."""
+    response = client.get("/api/locations", params={"zoom": 2, **WORLD})
+    assert response.status_code == 200
+    data = response.json()
+
+    assert all(cluster["cluster_id"].startswith("dynamic_2_") for cluster in data["clusters"])
+    assert all("stories" not in cluster for cluster in data["clusters"])
+    story_ids = {loc["story_id"] for loc in data["locations"]}
+    for cluster in data["clusters"]:
+        details = client.get(f"/api/cluster/{cluster['cluster_id']}").json()
+        assert details["story_count"] == cluster["story_count"] == len(details["stories"])
+        story_ids |= {story["story_id"] for story in details["stories"]}
+    assert story_ids == {"s1", "s2", "s3", "s4", "s5", "s6", "s7"}
+
+
+def test_dynamic_cluster_ids_are_stable(client):
+    """Dynamic cluster IDs derive from their members and resolve through /api/cluster."""
+    params = {"zoom": 10, **CUPERTINO}
+    first = client.get("/api/locations", params=params).json()["clusters"]
+    again = client.get("/api/locations", params={**params, "sw_lat": 37.25}).json()["clusters"]
+    assert [c["cluster_id"] for c in first] == [c["cluster_id"] for c in again]
+
+    (cluster,) = first
+    details = client.get(f"/api/cluster/{cluster['cluster_id']}").json()
+    assert details["date_range"] == "Jan 24, 1984–Jun 1, 2009"
+    assert [story["story_id"] for story in details["stories"]] == ["s1", "s2", "s3", "s7"]
+
+    assert client.get("/api/cluster/dynamic_10_163_396_0000000000000000").status_code == 404
+    assert client.get("/api/cluster/pyr7_missing").status_code == 404
+
+
+def test_individual_markers_at_street_zoom(client):
+    """Zoom 17+ returns unclustered markers, ordered by confidence."""
+    response = client.get("/api/locations", params={"zoom": 18, **CUPERTINO})
+    data = response.json()
+
+    assert data["clusters"] == []
+    assert [loc["confidence"] for loc in data["locations"]] == [0.95, 0.9, 0.8, 0.6]
+    assert data["locations"][0]["date"] == "Apr 1993"
+
+
+def test_snapped_markers_keep_confidence_order(client, server):
+    """Markers from several tiles are merged into one most-confident-first list."""
+    bounds = {"sw_lat": 37.32, "sw_lon": -122.04, "ne_lat": 37.34, "ne_lon": -122.02}
+    assert 1 < server.count_tiles_covering(**bounds, zoom=17) <= server.MAX_VIEWPORT_TILES
+    data = client.get("/api/locations", params={"zoom": 17, **bounds}).json()
+    assert [loc["confidence"] for loc in data["locations"]] == [0.95, 0.9, 0.8, 0.6]
+
+
+def test_locations_etag_and_tile_cache(client, server):
+    """Repeat viewports hit the tile cache and revalidate with a 304."""
+    server.locations_cache.clear()
+    params = {"zoom": 5, "sw_lat": 20, "sw_lon": 110, "ne_lat": 25, "ne_lon": 118}
+
+    first = client.get("/api/locations", params=params)
+    etag = first.headers["etag"]
+    misses = server.locations_cache.misses
+
+    # A slightly different viewport covering the same tiles is served from cache
+    again = client.get("/api/locations", params={**params, "sw_lat": 20.5})
+    assert again.headers["etag"] == etag
+    assert again.json() == first.json()
+    assert server.locations_cache.misses == misses
+
+    not_modified = client.get("/api/locations", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    stats = client.get("/api/cache/stats").json()["locations"]
+    assert stats["hits"] > 0 and stats["size"] > 0
+
+
+def test_oversized_viewports_skip_tile_snapping(client, server):
+    """A world viewport at street zoom is served unsnapped without listing its tiles; zoom is bounded."""
+    assert server.count_tiles_covering(**WORLD, zoom=18) > server.MAX_VIEWPORT_TILES
+    response = client.get("/api/locations", params={"zoom": 18, **WORLD})
+    assert response.status_code == 200
+    assert len(response.json()["locations"]) == 7
+
+    assert client.get("/api/locations", params={"zoom": -3, **WORLD}).status_code == 422
+    assert client.get("/api/locations", params={"zoom": server.MAX_TILE_ZOOM + 1, **WORLD}).status_code == 422
+
+
+def test_oversized_viewport_clusters_resolve(client, server):
+    """Clusters of a viewport too large to snap to tiles carry its bounds and resolve through /api/cluster."""
+    assert server.count_tiles_covering(**WORLD, zoom=10) > server.MAX_VIEWPORT_TILES
+    (cluster,) = client.get("/api/locations", params={"zoom": 10, **WORLD}).json()["clusters"]
+    assert cluster["cluster_id"].startswith("dynamic_10_-85.0_-180.0_85.0_180.0_")
+
+    details = client.get(f"/api/cluster/{cluster['cluster_id']}").json()
+    assert details["story_count"] == cluster["story_count"]
+    assert [story["story_id"] for story in details["stories"]] == ["s1", "s2", "s3", "s7"]
+    assert client.get("/api/cluster/dynamic_10_-85.0_-180.0_85.0_999.0_0000000000000000").status_code == 404
+
+
+def test_tiles_are_versioned_and_immutable(client):
+    """Tiles live under the DB version; stale versions redirect to the current one."""
+    version = client.get("/api/version").json()["db_version"]
+
+    response = client.get(f"/api/tiles/{version}/2/3/1")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    tile = response.json()
+    assert (tile["z"], tile["x"], tile["y"]) == (2, 3, 1)
+    story_ids = {loc["story_id"] for loc in tile["locations"]}
+    for cluster in tile["clusters"]:
+        details = client.get(f"/api/cluster/{cluster['cluster_id']}").json()
+        story_ids |= {story["story_id"] for story in details["stories"]}
+    assert story_ids == {"s4", "s5", "s6", "s7"}
+
+    stale = client.get("/api/tiles/old/2/3/1", follow_redirects=False)
+    assert stale.status_code == 307
+    assert stale.headers["location"] == f"/api/tiles/{version}/2/3/1"
+
+    assert client.get(f"/api/tiles/{version}/2/4/0").status_code == 404
+
+
+def test_db_connection_is_pooled_read_only(server):
+    """get_db reuses one read-only connection per thread."""
+    with server.get_db() as first:
+        pass
+    with server.get_db() as second:
+        assert second is first
+        assert second.execute("SELECT * FROM stories WHERE story_id = ?", ("s1",)).fetchone()["title"]
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            second.execute("DELETE FROM stories")
+
+
+def test_saturated_pool_fails_fast(server):
+    """A full compute pool answers 503 with Retry-After; a missed deadline answers 504."""
+    executor = server.BoundedExecutor("test", max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        blocked = asyncio.create_task(executor.run(release.wait, deadline=loop.time() + 5))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(server.HTTPException) as busy:
+            await executor.run(lambda: None, deadline=loop.time() + 5)
+        assert busy.value.status_code == 503
+        assert busy.value.headers["Retry-After"] == str(server.RETRY_AFTER_SECONDS)
+
+        release.set()
+        assert await blocked is True
+
+        with pytest.raises(server.HTTPException) as late:
+            await executor.run(time.sleep, 0.5, deadline=loop.time() + 0.05)
+        assert late.value.status_code == 504
+
+    asyncio.run(scenario())
+    assert executor.stats()["rejected"] == 1
+
+
+def test_single_flight_shares_one_computation(server):
+    """Concurrent calls with one key run fn once and share its result or error; a cancelled caller cancels nothing."""
+    flight = server.SingleFlight("test")
+    error = server.HTTPException(status_code=500)
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    async def scenario():
+        deadline = asyncio.get_running_loop().time() + 5
+        results = await asyncio.gather(*(flight.do("a", lambda: compute(1), deadline) for _ in range(5)))
+        assert results == [1] * 5
+
+        outcomes = await asyncio.gather(
+            *(flight.do("b", lambda: compute(error), deadline) for _ in range(3)), return_exceptions=True
+        )
+        assert outcomes == [error] * 3
+
+        leader = asyncio.create_task(flight.do("c", lambda: compute(2), deadline))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("c", lambda: compute(3), deadline))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == 2
+
+    asyncio.run(scenario())
+    assert calls == [1, error, 2]
+    stats = flight.stats()
+    assert (stats["leaders"], stats["followers"], stats["in_flight"], stats["waiting"]) == (3, 7, 0, 0)
+    assert stats["hot_keys"][0]["key"] == "a" and stats["hot_keys"][0]["followers"] == 4
+
+
+def test_identical_viewports_are_computed_once(server, monkeypatch):
+    """A burst of identical /api/locations requests on a cold cache computes the viewport once."""
+    server.get_snapshot()
+    server.body_cache.clear()
+    server.locations_cache.clear()
+    tile_payloads = server.tile_payloads
+    calls = []
+
+    async def slow_tile_payloads(*args, **kwargs):
+        calls.append(args[1])
+        await asyncio.sleep(0.05)
+        return await tile_payloads(*args, **kwargs)
+
+    monkeypatch.setattr(server, "tile_payloads", slow_tile_payloads)
+    followers = server.viewport_flight.followers
+
+    async def burst():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://map") as client:
+            return await asyncio.gather(
+                *(client.get("/api/locations", params={"zoom": 10, **CUPERTINO}) for _ in range(6))
+            )
+
+    responses = asyncio.run(burst())
+    assert calls == [10]
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert server.viewport_flight.followers == followers + 5
+
+
+def test_concurrent_tile_requests_share_one_job(server, monkeypatch):
+    """A burst of uncached tile requests is computed as one job, even with no room to queue on the CPU pool."""
+    version = server.get_snapshot().version
+    server.body_cache.clear()
+    server.locations_cache.clear()
+    monkeypatch.setattr(server, "cpu_executor", server.BoundedExecutor("test", max_workers=1, max_queue=0))
+    batches = server.tile_batcher.batches
+
+    async def burst():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://map") as client:
+            return await asyncio.gather(
+                *(client.get(f"/api/tiles/{version}/2/{x}/{y}") for x in range(4) for y in range(4))
+            )
+
+    responses = asyncio.run(burst())
+    assert {response.status_code for response in responses} == {200}
+    assert server.cpu_executor.rejected == 0
+    assert server.tile_batcher.batches - batches < len(responses)
+
+
+def test_story_detail(client):
+    """Story detail folds locations, people, companies and products into one response."""
+    story = client.get("/api/story/s7").json()
+
+    assert story["parsed_date"] == "Jun 1, 2009"
+    assert [loc["place_name"] for loc in story["locations"]] == ["Zhengzhou plant", "One Infinite Loop, Cupertino"]
+    assert story["locations"][0]["lat"] == 34.7466
+    assert story["people"] == [{"name": "Tim Cook", "role": "COO", "team": None, "affiliation": None}]
+    assert story["companies"] == [{"name": "Foxconn", "relationship": "supplier"}]
+    assert story["products"] == []
+
+    assert client.get("/api/story/nope").status_code == 404
+
+
+def test_batch_stories_keep_request_order(client):
+    """/api/stories returns many stories in one response, in request order."""
+    data = client.get("/api/stories", params={"ids": "s3,nope,s1,s3"}).json()
+
+    assert [story["story_id"] for story in data["stories"]] == ["s3", "s1"]
+    assert data["stories"][0] == client.get("/api/story/s3").json()
+    assert data["missing"] == ["nope"]
+    assert client.get("/api/stories", params={"ids": ","}).status_code == 400
+
+
+def test_compact_format_round_trips(client):
+    """?format=compact carries the same markers and clusters as parallel arrays."""
+    params = {"zoom": 2, **WORLD}
+    full = client.get("/api/locations", params=params)
+    compact = client.get("/api/locations", params={**params, "format": "compact"})
+
+    assert compact.headers["etag"] != full.headers["etag"]
+    assert "Accept" in compact.headers["vary"]
+    data = compact.json()
+    assert data["format"] == "compact"
+    assert len(data["locations"]["lat"]) == len(full.json()["locations"])
+
+    expanded = expand_payload(data)
+    assert expanded["clusters"] == full.json()["clusters"]
+    fields = ("story_id", "lat", "lon", "precision", "confidence", "title", "place_name", "date")
+    assert expanded["locations"] == [{k: loc[k] for k in fields} for loc in full.json()["locations"]]
+
+    assert client.get("/api/locations", params={**params, "format": "xml"}).status_code == 422
+
+
+def test_msgpack_negotiation(client):
+    """Accept: application/msgpack returns the same payload as MessagePack."""
+    msgpack = pytest.importorskip("msgpack")
+    version = client.get("/api/version").json()["db_version"]
+    url = f"/api/tiles/{version}/2/3/1"
+
+    packed = client.get(url, params={"format": "compact"}, headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == client.get(url, params={"format": "compact"}).json()
+
+
+def test_metrics_endpoint(client):
+    """/metrics exposes latency histograms per route and the server counters."""
+    client.get("/api/locations", params={"zoom": 10, **CUPERTINO})
+    client.get("/api/story/s1")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'map_request_duration_seconds_count{endpoint="/api/story/{story_id}",method="GET",status="200"}' in body
+    assert 'map_request_duration_seconds_bucket{endpoint="/api/locations",method="GET",status="200",le="+Inf"}' in body
+    assert 'map_rows_scanned_total{source="snapshot"}' in body
+    assert 'map_clusters_computed_total{method="dbscan"}' in body
+    assert 'map_cache_hit_ratio{cache="locations"}' in body
+    assert "map_db_opens_total" in body
+
+
+def test_locations_time_window(client):
+    """from/to filter markers and clusters to stories dated inside the window."""
+    markers = client.get("/api/locations", params={"zoom": 18, "from": "2007", "to": "2010", **CUPERTINO}).json()
+    assert [loc["story_id"] for loc in markers["locations"]] == ["s3", "s7"]
+
+    (cluster,) = client.get("/api/locations", params={"zoom": 10, "from": "2007", **CUPERTINO}).json()["clusters"]
+    assert cluster["story_count"] == 2
+    details = client.get(f"/api/cluster/{cluster['cluster_id']}", params={"from": "2007"}).json()
+    assert [story["story_id"] for story in details["stories"]] == ["s3", "s7"]
+
+    assert client.get("/api/locations", params={"zoom": 10, "from": "soon", **CUPERTINO}).status_code == 422
+
+
+def test_locations_facet_filters(client):
+    """Facet parameters filter markers and clusters; /api/facets lists the values."""
+    markers = client.get("/api/locations", params={"zoom": 18, "company": "Foxconn", **CUPERTINO}).json()
+    assert [loc["story_id"] for loc in markers["locations"]] == ["s7"]
+
+    themes = [("theme", "campus"), ("theme", "launch")]
+    themed = client.get("/api/locations", params=[("zoom", 18), *CUPERTINO.items(), *themes]).json()
+    assert sorted(loc["story_id"] for loc in themed["locations"]) == ["s1", "s3"]
+
+    (cluster,) = client.get("/api/locations", params=[("zoom", 10), *CUPERTINO.items(), *themes]).json()["clusters"]
+    assert cluster["story_count"] == 2
+    details = client.get(f"/api/cluster/{cluster['cluster_id']}", params=themes).json()
+    assert [story["story_id"] for story in details["stories"]] == ["s1", "s3"]
+
+    facets = client.get("/api/facets").json()
+    assert facets["company"] == [{"value": "Foxconn", "story_count": 2}]
+    assert facets["theme"][0] == {"value": "manufacturing", "story_count": 3}
+    assert list(client.get("/api/facets", params={"kind": "person"}).json()) == ["person"]
+
+
+def test_search_ranks_prefix_matches(client, server):
+    """Search matches word prefixes, ranks by bm25, highlights safely and caches by DB version."""
+    server.search_cache.clear()
+    data = client.get("/api/search", params={"q": "infin"}).json()
+    assert [result["story_id"] for result in data["results"]] == ["s1"]
+    (result,) = data["results"]
+    assert result["title_highlight"] == "Apple moves to <mark>Infinite</mark> Loop"
+    assert result["locations"][0]["place_name"] == "One Infinite Loop, Cupertino"
+    assert data["bounds"] == [37.3318, -122.0312, 37.3318, -122.0312]
+
+    # FTS5 syntax in the query is taken literally: OR is one more word to match
+    assert [r["story_id"] for r in client.get("/api/search", params={"q": 'shenzhen "'}).json()["results"]] == ["s5"]
+    assert client.get("/api/search", params={"q": "shenzhen OR foxconn"}).json()["results"] == []
+    assert client.get("/api/search", params={"q": "<b>"}).json()["results"] == []
+
+    client.get("/api/search", params={"q": "infin"})
+    assert server.search_cache.stats()["hits"] >= 1
+    assert client.get("/api/search", params={"q": "?!"}).json()["results"] == []
+
+
+@pytest.fixture
+def live_db(server, sample_db, tmp_path, monkeypatch):
+    """Copy of the sample database served by the map server, switched back to the sample afterwards."""
+    db_path = tmp_path / "live.sqlite"
+    shutil.copy(sample_db, db_path)
+    monkeypatch.setattr(server, "DB_PATH", db_path)
+    monkeypatch.setattr(server, "DB_WATCH_SECONDS", 0.01)
+    server.swap_database()
+    yield db_path
+    monkeypatch.undo()
+    server.swap_database()
+
+
+def test_database_hot_swap(server, sample_db, live_db, tmp_path):
+    """A replaced database file is loaded and warmed in the background, then swapped in."""
+    old = server.get_snapshot()
+
+    replacement = tmp_path / "replacement.sqlite"
+    shutil.copy(sample_db, replacement)
+    conn = sqlite3.connect(replacement)
+    conn.execute("DELETE FROM story_locations WHERE story_id = 's6'")
+    conn.commit()
+    conn.close()
+    os.replace(replacement, live_db)
+    assert server.get_snapshot() is old
+
+    async def watch_until_swapped():
+        watcher = asyncio.create_task(server.watch_database())
+        for _ in range(500):
+            await asyncio.sleep(0.01)
+            if server.get_snapshot() is not old:
+                break
+        watcher.cancel()
+
+    asyncio.run(watch_until_swapped())
+    new = server.get_snapshot()
+    assert new.version != old.version
+    assert len(new) == len(old) - 1
+    # Served from the shared memory-mapped index
+    assert not new.lat.flags.writeable
+    assert (server.index_path(server.SNAPSHOT_INDEX_DIR, new.version) / "meta.json").exists()
+    # World tiles of the new version were cached before the cutover
+    assert server.locations_cache.get((new.version, 0, 0, 0, None, None, None)) is not None
+
+    # Requests still holding the old snapshot keep reading the old file
+    with server.get_db(old.version) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM story_locations WHERE story_id = 's6'").fetchone()[0] == 1
+    with server.get_db() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM story_locations WHERE story_id = 's6'").fetchone()[0] == 0
+
+    # ...also from threads that had no connection to it before the file was replaced
+    def count_old():
+        with server.get_db(old.version) as conn:
+            return conn.execute("SELECT COUNT(*) FROM story_locations WHERE story_id = 's6'").fetchone()[0]
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(count_old).result() == 1
+
+
+def test_warmed_tiles_serve_the_map_view(client, server):
+    """Warming fills the ?lod=3 tiles MapView requests, down to their serialized bodies."""
+    snapshot = server.get_snapshot()
+    server.body_cache.clear()
+    server.locations_cache.clear()
+    server.warm_caches(snapshot)
+    assert server.locations_cache.get((snapshot.version, 1, 1, 0, None, None, (3, 8))) is not None
+
+    hits, misses = server.body_cache.hits, server.body_cache.misses
+    response = client.get(f"/api/tiles/{snapshot.version}/1/1/0", params={"lod": 3})
+    assert response.status_code == 200
+    assert response.headers["etag"] == server.tile_etag(snapshot.version, 1, 1, 0, lod=(3, 8))
+    assert (server.body_cache.hits, server.body_cache.misses) == (hits + 1, misses)
+
+
+def test_locations_lod_keeps_top_markers_per_cell(client):
+    """?lod=K keeps the K most confident markers per grid cell and counts the rest."""
+    params = {"zoom": 18, **CUPERTINO}
+    full = client.get("/api/locations", params=params).json()
+    assert "hidden" not in full
+
+    sampled = client.get("/api/locations", params={**params, "lod": 1, "lod_grid": 1}).json()
+    # s1 and s7 share One Infinite Loop; the more confident s1 is kept
+    assert len(sampled["locations"]) < len(full["locations"])
+    assert sampled["locations"][0] == full["locations"][0]
+    hidden = sum(cell["count"] for cell in sampled["hidden"])
+    assert hidden + len(sampled["locations"]) == len(full["locations"])
+
+
+def test_export_streams_every_location(client, server, monkeypatch):
+    """Both export formats hold one Point feature per resolved location, across several batches."""
+    monkeypatch.setattr(server, "EXPORT_BATCH_ROWS", 3)
+
+    response = client.get("/api/export.geojson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    collection = response.json()
+    assert collection["type"] == "FeatureCollection"
+    features = collection["features"]
+    assert [feature["id"] for feature in features] == ["s1/0", "s2/0", "s3/0", "s4/0", "s5/0", "s6/0", "s7/0", "s7/1"]
+    assert features[3]["geometry"] == {"type": "Point", "coordinates": [114.0290, 22.6567]}
+    assert features[3]["properties"]["themes"] == ["manufacturing", "labor"]
+    assert features[3]["properties"]["date"] == "May 2010"
+
+    response = client.get("/api/export.ndjson")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == features
+
+    assert client.get("/api/export.ndjson", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get("/api/export.csv").status_code == 404
+
+    # An export never reads a different file than the version it is tagged with
+    with pytest.raises(server.HTTPException) as replaced:
+        server.open_export_cursor("stale-version")
+    assert replaced.value.status_code == 503
+
+
+def test_bodies_are_compressed_once(client, server):
+    """Hot responses are served pre-compressed per Accept-Encoding and compressed only on first use."""
+    params = {"zoom": 17, **CUPERTINO}
+    server.body_cache.clear()
+    compressed = server.BODIES_COMPRESSED.value(coding="gzip")
+
+    plain = client.get("/api/locations", params=params, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"].startswith("Accept, Accept-Encoding")
+    assert len(plain.content) >= 1024
+
+    for _ in range(2):
+        response = client.get("/api/locations", params=params, headers={"Accept-Encoding": "gzip;q=0.8, br;q=0"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+        assert response.content == plain.content
+    assert server.BODIES_COMPRESSED.value(coding="gzip") == compressed + 1
+
+    # Either ETag revalidates
+    revalidated = client.get("/api/locations", params=params, headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+    # Small bodies are not worth compressing
+    small = client.get("/api/locations", params={**params, "ne_lat": 37.325})
+    assert "content-encoding" not in small.headers
+
+
+def test_autocomplete(client):
+    """Suggestions come from the facet tables, with their story counts."""
+    data = client.get("/api/autocomplete", params={"q": "fox"}).json()
+    assert data["suggestions"] == [{"kind": "company", "value": "Foxconn", "story_count": 2}]
+
+    values = [s["value"] for s in client.get("/api/autocomplete", params={"q": "T"}).json()["suggestions"]]
+    assert values == ["Terry Gou", "Tim Cook"]
+    assert client.get("/api/autocomplete", params={"q": "t", "kind": "company"}).json()["suggestions"] == []
+    assert client.get("/api/autocomplete", params={"q": "iph"}).json()["suggestions"][0]["kind"] == "product_line"
+
+
+def test_autocomplete_includes_unlocated_stories(sample_db, tmp_path):
+    """Names from stories without resolved locations are suggested and counted too."""
+    db_path = tmp_path / "unlocated.sqlite"
+    shutil.copy(sample_db, db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO stories (story_id, chapter_id, story_json, title) VALUES ('s8', 'ch_1', '{}', 'Board meeting')"
+    )
+    conn.executemany(
+        "INSERT INTO story_people (story_id, person_idx, name) VALUES ('s8', ?, ?)", [(0, "Tim Cook"), (1, "Jony Ive")]
+    )
+    index = PrefixIndex.load(conn)
+    conn.close()
+
+    assert index.search("jony") == [{"kind": "person", "value": "Jony Ive", "story_count": 1}]
+    assert index.search("cook") == [{"kind": "person", "value": "Tim Cook", "story_count": 2}]
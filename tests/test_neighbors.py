@@ -0,0 +1,66 @@
+"""Tests for the precomputed related-stories table."""
+
+import shutil
+import sqlite3
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from abxgeo import neighbors
+from abxgeo.neighbors import build_story_neighbors, top_neighbors
+
+
+@pytest.fixture
+def related_server(server, sample_db, tmp_path, monkeypatch):
+    """The map server swapped over to a copy of the sample database with related stories built."""
+    db_path = tmp_path / "related.sqlite"
+    shutil.copy(sample_db, db_path)
+    conn = sqlite3.connect(db_path)
+    build_story_neighbors(conn)
+    conn.close()
+
+    monkeypatch.setattr(server, "DB_PATH", db_path)
+    server.swap_database()
+    yield server
+    monkeypatch.undo()
+    server.swap_database()
+
+
+def test_top_neighbors_match_brute_force(monkeypatch):
+    """Blocked top-k equals ranking a dense cosine matrix, skipping self and dissimilar rows."""
+    rng = np.random.default_rng(0)
+    dense = (rng.random((40, 12)) < 0.2).astype(np.float32)
+    dense[7] = 0  # a story without features has no neighbors
+    vectors = sparse.csr_matrix(dense / np.maximum(np.linalg.norm(dense, axis=1, keepdims=True), 1e-12))
+    monkeypatch.setattr(neighbors, "BLOCK_CELLS", 3 * 40)
+
+    found, scores = top_neighbors(vectors, k=4)
+
+    similarity = (vectors @ vectors.T).toarray()
+    np.fill_diagonal(similarity, 0)
+    for row in range(40):
+        expected = [i for i in np.lexsort((np.arange(40), -similarity[row]))[:4] if similarity[row, i] > 0]
+        assert found[row][: len(expected)].tolist() == expected
+        assert (found[row][len(expected) :] == -1).all()
+        np.testing.assert_allclose(scores[row][: len(expected)], similarity[row, expected], rtol=1e-5)
+    assert (found[7] == -1).all()
+
+
+def test_related_endpoint(client, related_server):
+    """Stories sharing Foxconn and a theme rank first; stories without shared features have none."""
+    data = client.get("/api/story/s4/related").json()
+    assert [story["story_id"] for story in data["related"]] == ["s7", "s5"]
+    assert data["related"][0]["title"] == "Supply chain tour"
+    assert data["related"][0]["date"] == "Jun 1, 2009"
+    assert data["related"][0]["score"] > data["related"][1]["score"] > 0
+
+    (top,) = client.get("/api/story/s4/related", params={"limit": 1}).json()["related"]
+    assert top["story_id"] == "s7"
+    assert client.get("/api/story/s1/related").json()["related"] == []
+    assert client.get("/api/story/nope/related").status_code == 404
+
+
+def test_related_without_table(client):
+    """Databases without related stories answer 404."""
+    assert client.get("/api/story/s4/related").status_code == 404
@@ -0,0 +1,100 @@
+"""Tests for the serving-optimized published database."""
+
+import shutil
+import sqlite3
+
+import numpy as np
+import pytest
+
+from abxgeo.neighbors import build_story_neighbors
+from abxgeo.publish import publish_db
+from abxgeo.pyramid import build_cluster_pyramid
+from abxgeo.snapshot import LocationSnapshot
+
+WORLD = {"sw_lat": -85, "sw_lon": -180, "ne_lat": 85, "ne_lon": 180}
+
+
+@pytest.fixture
+def ingest_db(sample_db, tmp_path):
+    """Copy of the sample database with the cluster pyramid and related stories built."""
+    db_path = tmp_path / "ingest.sqlite"
+    shutil.copy(sample_db, db_path)
+    conn = sqlite3.connect(db_path)
+    build_cluster_pyramid(conn)
+    build_story_neighbors(conn)
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def published_db(ingest_db, tmp_path):
+    out = tmp_path / "serve.sqlite"
+    stats = publish_db(ingest_db, out)
+    assert stats["map_points"] == 8
+    return out
+
+
+def test_publish_keeps_only_what_the_server_reads(server, published_db):
+    """Ingest-only tables, triggers and columns are gone; the file is tuned and analyzed."""
+    conn = sqlite3.connect(published_db)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"stories", "story_locations", "story_fts", "location_clusters", "story_neighbors", "map_points"} <= tables
+    assert not tables & {"chapter_fts", "geocode_cache", "llm_runs", "chapter_llm"}
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone() == (0,)
+    story_columns = {row[1] for row in conn.execute("PRAGMA table_info(stories)")}
+    assert "story_json" not in story_columns and "summary" in story_columns
+
+    assert conn.execute("PRAGMA page_size").fetchone() == (16384,)
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {server.PYRAMID_LEVEL_SQL[True]}", (3,) * 5))
+    assert "COVERING INDEX idx_clusters_pyramid_covering" in plan
+
+    # Pre-formatted popup fields
+    preview, date = conn.execute("SELECT summary_preview, date FROM map_points WHERE story_id = 's3'").fetchone()
+    assert preview.endswith("...") and len(preview) == 103
+    assert date == "Jan 9, 2007"
+    conn.close()
+
+
+def test_published_snapshot_matches_source(ingest_db, published_db):
+    """Loading from map_points gives the same snapshot as joining the ingest tables."""
+    snapshots = []
+    for path in (ingest_db, published_db):
+        conn = sqlite3.connect(path)
+        snapshots.append(LocationSnapshot.load(conn, "v"))
+        conn.close()
+    source, published = snapshots
+
+    for name in ("story_ids", "titles", "summary_previews", "dates", "parsed_dates", "precision_names"):
+        assert getattr(published, name) == getattr(source, name)
+    for name in ("lat", "lon", "rank", "confidence", "story_idx", "day_start", "loc_idx", "place_names", "addresses"):
+        np.testing.assert_array_equal(getattr(published, name), getattr(source, name))
+    assert published.has_pyramid and published.facet_values == source.facet_values
+
+
+def test_server_runs_on_published_db(server, client, published_db, monkeypatch):
+    """Every read path works against the published copy."""
+    monkeypatch.setattr(server, "DB_PATH", published_db)
+    server.swap_database()
+    try:
+        data = client.get("/api/locations", params={"zoom": 2, **WORLD}).json()
+        assert all(cluster["cluster_id"].startswith("pyr") for cluster in data["clusters"])
+        story_ids = {loc["story_id"] for loc in data["locations"]}
+        for cluster in data["clusters"]:
+            details = client.get(f"/api/cluster/{cluster['cluster_id']}").json()
+            story_ids |= {story["story_id"] for story in details["stories"]}
+        assert story_ids == {"s1", "s2", "s3", "s4", "s5", "s6", "s7"}
+        assert client.get("/api/story/s1").json()["locations"][0]["place_name"] == "One Infinite Loop, Cupertino"
+        assert [r["story_id"] for r in client.get("/api/search", params={"q": "infin"}).json()["results"]] == ["s1"]
+        assert client.get("/api/story/s4/related").status_code == 200
+    finally:
+        monkeypatch.undo()
+        server.swap_database()
+
+
+def test_publish_rejects_its_source(ingest_db):
+    with pytest.raises(ValueError):
+        publish_db(ingest_db, ingest_db)
+    with pytest.raises(ValueError):
+        publish_db(ingest_db, ingest_db.with_name("out.sqlite"), page_size=1000)
@@ -0,0 +1,191 @@
+"""Tests for the zoom-banded cluster pyramid."""
+
+import shutil
+import sqlite3
+
+import numpy as np
+import pytest
+
+from abxgeo.heatmap import HEATMAP_MAX_ZOOM, build_heatmap, build_location_heatmap, cell_centers, slice_heatmap
+from abxgeo.pyramid import build_cluster_pyramid, build_pyramid, load_resolved_locations
+from abxgeo.zoom import count_tiles_covering, tiles_covering, zoom_band, zoom_bands
+
+
+@pytest.fixture
+def pyramid_db(sample_db, tmp_path):
+    """Copy of the sample database with the cluster pyramid and heatmap built."""
+    db_path = tmp_path / "pyramid.sqlite"
+    shutil.copy(sample_db, db_path)
+    conn = sqlite3.connect(db_path)
+    build_cluster_pyramid(conn)
+    build_location_heatmap(conn)
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def pyramid_server(server, pyramid_db, monkeypatch):
+    """The map server swapped over to the pyramid database, and back to the sample database afterwards."""
+    monkeypatch.setattr(server, "DB_PATH", pyramid_db)
+    server.swap_database()
+    yield server
+    monkeypatch.undo()
+    server.swap_database()
+
+
+def test_zoom_bands_follow_epsilon():
+    """Each band ends where zoom_to_epsilon changes; zoom 17+ is unclustered."""
+    assert [band for band, _ in zoom_bands()] == [3, 4, 7, 9, 11, 13, 14, 15, 16]
+    assert zoom_band(1) == 3
+    assert zoom_band(6) == 7
+    assert zoom_band(17) is None
+
+
+def test_tile_count_matches_covering_tiles():
+    """Covering tiles are counted without listing them, including across the antimeridian."""
+    for viewport, zoom in [((20, 110, 25, 118), 5), ((-10, 170, 10, -170), 6), ((-85, -180, 85, 180), 3)]:
+        assert count_tiles_covering(*viewport, zoom) == len(tiles_covering(*viewport, zoom))
+    assert count_tiles_covering(-90, -180, 90, 180, 18) == 4**18
+
+
+def test_every_level_covers_visible_locations(sample_db):
+    """Each band partitions exactly the locations visible at that zoom, and links to its parent band."""
+    conn = sqlite3.connect(sample_db)
+    locations = load_resolved_locations(conn)
+    conn.close()
+
+    nodes = build_pyramid(locations)
+    by_id = {node["cluster_id"]: node for node in nodes}
+    bands = [band for band, _ in zoom_bands()]
+
+    for band in bands:
+        level = [node for node in nodes if node["zoom_level"] == band]
+        expected = len(locations) if band <= 3 else len(locations) - 1  # country pin only at world view
+        assert sum(node["point_count"] for node in level) == expected
+
+        for node in level:
+            if band == bands[0]:
+                assert node["parent_cluster_id"] is None
+            else:
+                parent = by_id[node["parent_cluster_id"]]
+                assert parent["zoom_level"] == bands[bands.index(band) - 1]
+                assert {tuple(k) for k in node["location_keys"]} <= {tuple(k) for k in parent["location_keys"]}
+
+
+def test_cluster_ids_are_content_derived(sample_db):
+    """Rebuilding the pyramid yields identical cluster IDs."""
+    conn = sqlite3.connect(sample_db)
+    locations = load_resolved_locations(conn)
+    conn.close()
+
+    first = sorted(node["cluster_id"] for node in build_pyramid(locations))
+    second = sorted(node["cluster_id"] for node in build_pyramid(locations))
+    assert first == second
+
+
+def test_locations_served_from_pyramid(client, pyramid_server):
+    """/api/locations answers from the stored level for the zoom band."""
+    response = client.get("/api/locations", params={"zoom": 12, "sw_lat": 37, "sw_lon": -123, "ne_lat": 38, "ne_lon": -121})
+    assert response.status_code == 200
+    data = response.json()
+
+    (cluster,) = data["clusters"]
+    assert cluster["cluster_id"].startswith("pyr13_")
+    assert cluster["story_count"] == 4
+    assert "stories" not in cluster
+    assert data["locations"] == []
+
+    details = client.get(f"/api/cluster/{cluster['cluster_id']}").json()
+    assert details["point_count"] == 4
+    assert [story["story_id"] for story in details["stories"]] == ["s1", "s2", "s3", "s7"]
+
+
+def test_pyramid_clusters_shrink_to_time_window(client, pyramid_server):
+    """A time window keeps the pyramid layout and narrows each cluster to stories inside it."""
+    params = {"zoom": 12, "sw_lat": 37, "sw_lon": -123, "ne_lat": 38, "ne_lon": -121}
+
+    (full,) = client.get("/api/locations", params=params).json()["clusters"]
+    (windowed,) = client.get("/api/locations", params={**params, "from": "1990", "to": "2008"}).json()["clusters"]
+    assert windowed["cluster_id"] == full["cluster_id"]
+    assert windowed["story_count"] == 2
+    assert windowed["date_range"] == "Apr 1993–Jan 9, 2007"
+
+    # Only one location left: shown as a marker instead of a cluster
+    data = client.get("/api/locations", params={**params, "from": "2009"}).json()
+    assert data["clusters"] == []
+    assert [loc["story_id"] for loc in data["locations"]] == ["s7"]
+
+
+def test_heatmap_slices_across_the_antimeridian():
+    """Sliced cells match a brute-force filter of the level, including bounds wrapping at 180°."""
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-60, 60, 500)
+    lon = rng.uniform(-180, 180, 500)
+    zoom, resolution, cells, counts = build_heatmap(lat, lon, ["city"] * 500, max_zoom=3)[-1]
+    assert (zoom, resolution) == (3, 128)
+    assert counts.sum() == 500
+
+    cell_lat, cell_lon = cell_centers(resolution, cells)
+    half = 180.0 / resolution
+    for bounds, inside_lon in [
+        ((-20, -40, 30, 50), lambda lon: (lon >= -40 - half) & (lon <= 50 + half)),
+        ((-20, 150, 30, -160), lambda lon: (lon >= 150 - half) | (lon <= -160 + half)),
+    ]:
+        found, found_counts = slice_heatmap(resolution, cells, counts, bounds)
+        _, found_lon = cell_centers(resolution, found)
+        assert inside_lon(found_lon).all()
+        expected = cells[inside_lon(cell_lon) & (cell_lat > -21) & (cell_lat < 31)]
+        assert set(expected.tolist()) <= set(found.tolist())
+        stored = dict(zip(cells.tolist(), counts.tolist()))
+        assert all(stored[cell] == count for cell, count in zip(found.tolist(), found_counts.tolist()))
+
+
+def test_heatmap_endpoint(client, pyramid_server):
+    """/api/heatmap sums the visible locations, reuses the finest level past it, and 404s without a heatmap."""
+    world = {"bbox": "-180,-85,180,85"}
+
+    data = client.get("/api/heatmap", params={"z": 0, **world}).json()
+    assert (data["level"], data["resolution"]) == (0, 16)
+    assert sum(data["cells"]["count"]) == 8
+
+    # The country pin is hidden past world view
+    assert sum(client.get("/api/heatmap", params={"z": 4, **world}).json()["cells"]["count"]) == 7
+
+    data = client.get("/api/heatmap", params={"z": 12, "bbox": "-123,37,-121,38"}).json()
+    assert data["level"] == HEATMAP_MAX_ZOOM
+    assert data["cells"]["count"] == [4]
+    assert data["max_count"] == 4
+    assert 37 < data["cells"]["lat"][0] < 38
+
+    assert client.get("/api/heatmap", params={"z": 3, "bbox": "1,2,3"}).status_code == 422
+    assert client.get("/api/heatmap", params={"z": 3, "bbox": "0,10,5,-10"}).status_code == 422
+
+
+def test_heatmap_missing(client):
+    """Databases without a built heatmap answer 404."""
+    assert client.get("/api/heatmap", params={"z": 3, "bbox": "-180,-85,180,85"}).status_code == 404
+
+
+def test_cluster_timeline_pages_stories_by_date(client, pyramid_server):
+    """The timeline histogram covers the whole cluster while story headers come a page at a time, by date."""
+    params = {"zoom": 12, "sw_lat": 37, "sw_lon": -123, "ne_lat": 38, "ne_lon": -121}
+    (cluster,) = client.get("/api/locations", params=params).json()["clusters"]
+    url = f"/api/cluster/{cluster['cluster_id']}/timeline"
+
+    first = client.get(url, params={"limit": 3}).json()
+    assert (first["story_count"], first["point_count"], first["dated_count"]) == (4, 4, 4)
+    histogram = first["histogram"]
+    assert (histogram["bin"], histogram["start"], len(histogram["counts"])) == ("year", "1984", 26)
+    assert [i for i, count in enumerate(histogram["counts"]) if count] == [0, 9, 23, 25]
+    assert [story["story_id"] for story in first["stories"]] == ["s2", "s1", "s3"]
+    assert first["next_offset"] == 3
+
+    second = client.get(url, params={"limit": 3, "offset": first["next_offset"]}).json()
+    assert [story["story_id"] for story in second["stories"]] == ["s7"]
+    assert second["next_offset"] is None
+
+    months = client.get(url, params={"bin": "month", "from": "2000"}).json()
+    assert months["story_count"] == 2
+    assert (months["histogram"]["start"], sum(months["histogram"]["counts"])) == ("2007-01", 2)
+
+    assert client.get("/api/cluster/pyr13_missing/timeline").status_code == 404
@@ -0,0 +1,155 @@
+"""Tests for the columnar location snapshot."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from abxgeo.autocomplete import PrefixIndex
+from abxgeo.dates import day_range, window_days
+from abxgeo.snapshot import LocationSnapshot, facet_filter
+
+
+@pytest.fixture
+def snapshot(sample_db):
+    conn = sqlite3.connect(sample_db)
+    snap = LocationSnapshot.load(conn, "v1")
+    conn.close()
+    return snap
+
+
+def test_viewport_matches_brute_force(snapshot):
+    """Binary search + masks select the same rows as a full scan; by_rank orders them by confidence."""
+    sw_lat, sw_lon, ne_lat, ne_lon = 20, 100, 40, 120
+    indices = snapshot.viewport(sw_lat, sw_lon, ne_lat, ne_lon, zoom=2)
+
+    expected = {
+        i
+        for i in range(len(snapshot))
+        if sw_lat <= snapshot.lat[i] <= ne_lat and sw_lon <= snapshot.lon[i] <= ne_lon
+    }
+    assert set(indices.tolist()) == expected
+    assert np.all(np.diff(snapshot.lat[indices]) >= 0)
+    confidences = snapshot.confidence[snapshot.by_rank(indices)]
+    assert np.all(confidences[:-1] >= confidences[1:])
+
+
+def test_country_pins_hidden_past_world_view(snapshot):
+    """Country-level locations only show at zoom 1-3."""
+    world = [snapshot.location(i)["story_id"] for i in snapshot.viewport(-85, -180, 85, 180, zoom=3)]
+    regional = [snapshot.location(i)["story_id"] for i in snapshot.viewport(-85, -180, 85, 180, zoom=4)]
+    assert "s6" in world
+    assert "s6" not in regional
+
+
+def test_viewport_across_antimeridian(snapshot):
+    """A viewport with sw_lon > ne_lon wraps around 180 degrees."""
+    indices = snapshot.viewport(-85, 170, 85, -100, zoom=10)
+    assert {snapshot.location(i)["place_name"] for i in indices} >= {"Cupertino"}
+    assert "Shenzhen" not in {snapshot.location(i)["place_name"] for i in indices}
+
+
+def test_locations_preformatted(snapshot):
+    """Marker dicts carry the formatted date and truncated summary."""
+    (i,) = [i for i in range(len(snapshot)) if snapshot.location(i)["story_id"] == "s1"]
+    loc = snapshot.location(i)
+    assert loc["date"] == "Apr 1993"
+    assert loc["summary_preview"].endswith("...") and len(loc["summary_preview"]) == 103
+    assert snapshot.index_of("s1", 0) == i
+
+
+def test_day_range_parsing():
+    """Parsed dates become inclusive day spans; unknown years have none."""
+    assert day_range("1970-01-02") == (1, 1)
+    assert day_range("1984-02") == (day_range("1984-02-01")[0], day_range("1984-02-29")[0])
+    assert day_range("2016-XX") == (day_range("2016-01-01")[0], day_range("2016-12-31")[0])
+    assert day_range("1998/2001") == (day_range("1998")[0], day_range("2001")[1])
+    assert day_range("1990~") == day_range("1990")
+    assert day_range("XXXX") is None
+    assert window_days("2007", "2009-06") == (day_range("2007")[0], day_range("2009-06")[1])
+
+
+def test_viewport_time_window(snapshot):
+    """A time window keeps only locations whose story date overlaps it."""
+    cupertino = (37.3, -122.1, 37.4, -122.0)
+    window = window_days("2007", "2010")
+
+    indices = snapshot.viewport(*cupertino, zoom=18, window=window)
+    assert [snapshot.key(i)[0] for i in indices] == ["s3", "s7"]
+    # The undated-month story (2016-XX) overlaps any window that covers 2016
+    world = snapshot.viewport(-90, -180, 90, 180, zoom=2, window=window_days("2016-06", None))
+    assert [snapshot.key(i)[0] for i in world] == ["s6"]
+
+
+def test_viewport_facet_filters(snapshot):
+    """Facet bitsets: values of one facet are alternatives, different facets must all match."""
+    world = (-90, -180, 90, 180)
+
+    def stories(**selected):
+        return sorted({snapshot.key(i)[0] for i in snapshot.viewport(*world, zoom=2, facets=facet_filter(selected))})
+
+    assert stories(company=["foxconn"]) == ["s4", "s7"]
+    assert stories(company=["Foxconn"], person=["Tim  Cook"]) == ["s7"]
+    assert stories(person=["Tim Cook", "Terry Gou"]) == ["s4", "s7"]
+    assert stories(theme=["manufacturing"], product_line=["iPhone"]) == []
+    assert stories(company=["Pegatron"]) == []
+    assert facet_filter({"person": None, "theme": [" "]}) is None
+    assert snapshot.facet_values["theme"]["manufacturing"] == ("manufacturing", 3)
+
+
+def test_saved_index_reopens_memory_mapped(snapshot, tmp_path):
+    """A saved snapshot reopens from mapped files and answers exactly like the original."""
+    path = tmp_path / "v1-index"
+    snapshot.save(path)
+    snapshot.save(path)  # already saved: kept as is
+    mapped = LocationSnapshot.open(path)
+
+    assert isinstance(np.load(path / "lat.npy", mmap_mode="r"), np.memmap)
+    assert not mapped.lat.flags.writeable
+    assert mapped.version == "v1" and len(mapped) == len(snapshot)
+    world = (-90, -180, 90, 180)
+    facets = facet_filter({"company": ["Foxconn"]})
+    for kwargs in ({"zoom": 2}, {"zoom": 18, "window": window_days("2007", None)}, {"zoom": 2, "facets": facets}):
+        indices = snapshot.viewport(*world, **kwargs)
+        assert mapped.viewport(*world, **kwargs).tolist() == indices.tolist()
+        assert mapped.locations(indices) == snapshot.locations(indices)
+    assert mapped.index_of("s7", 1) == snapshot.index_of("s7", 1)
+    assert mapped.story_rows("s7").tolist() == snapshot.story_rows("s7").tolist()
+    assert mapped.facet_values == snapshot.facet_values
+
+
+def test_top_per_cell(snapshot):
+    """LOD sampling keeps the most confident rows per grid cell and summarizes the rest."""
+    world = (-85, -180, 85, 180)
+    indices = snapshot.by_rank(snapshot.viewport(*world, zoom=2))
+
+    kept, hidden = snapshot.top_per_cell(indices, world, grid=1, per_cell=2)
+    assert kept.tolist() == indices[:2].tolist()
+    (cell,) = hidden
+    assert cell["count"] == len(indices) - 2
+    assert cell["lat"] == pytest.approx(snapshot.lat[indices[2:]].mean())
+
+    # A 2x2 grid separates the Americas from Asia: each keeps its best row
+    kept, hidden = snapshot.top_per_cell(indices, world, grid=2, per_cell=1)
+    assert sorted(snapshot.key(i)[0] for i in kept) == ["s1", "s7"]
+    assert sum(cell["count"] for cell in hidden) == len(indices) - 2
+
+
+def test_prefix_index_matches_any_word():
+    """Prefixes match the start of any word, case-insensitively, most stories first."""
+    index = PrefixIndex(
+        [
+            ("person", "Tim Cook", 40),
+            ("person", "Timothy  Donald", 2),
+            ("company", "Cook Industries", 2),
+            ("product_line", "iPhone", 90),
+            ("person", "Steve Jobs", 80),
+        ]
+    )
+    assert [s["value"] for s in index.search("tim")] == ["Tim Cook", "Timothy  Donald"]
+    assert [s["value"] for s in index.search("COOK")] == ["Tim Cook", "Cook Industries"]
+    assert [s["value"] for s in index.search("tim co")] == ["Tim Cook"]
+    assert index.search("cook", kind="company") == [{"kind": "company", "value": "Cook Industries", "story_count": 2}]
+    assert [s["value"] for s in index.search("i", limit=1)] == ["iPhone"]
+    assert index.search("  ") == []
+    assert index.search("zz") == []